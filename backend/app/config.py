@@ -1,5 +1,5 @@
 import os
-from google.cloud import storage, firestore
+import threading
 from dotenv import load_dotenv
 
 load_dotenv()
@@ -8,10 +8,70 @@ BUCKET_NAME = "slugsei-baseball-coach-videos"
 
 GCP_PROJECT_ID = "poetic-planet-449502-i0"
 if not GCP_PROJECT_ID:
-    raise ValueError("Missing GCP_PROJECT environment variable.") 
+    raise ValueError("Missing GCP_PROJECT environment variable.")
 
-storage_client = storage.Client()
-firestore_client = firestore.Client()  
+_resources = {}
+# Reentrant so a factory may itself use other resources
+_resources_lock = threading.RLock()
+
+def get_resource(name: str, factory):
+    """
+    Returns the process-wide resource registered under name, creating it with
+    factory() on first use. Clients and other expensive objects are built
+    lazily so importing the app stays cheap.
+    """
+    resource = _resources.get(name)
+    if resource is None:
+        with _resources_lock:
+            resource = _resources.get(name)
+            if resource is None:
+                resource = _resources[name] = factory()
+    return resource
+
+def set_resource(name: str, resource):
+    """Registers resource under name, replacing any existing one (e.g. a stand-in)."""
+    with _resources_lock:
+        _resources[name] = resource
+
+def reset_resources():
+    """Drops every registered resource; the next use creates it again."""
+    with _resources_lock:
+        _resources.clear()
+
+def _create_storage_client():
+    from google.cloud import storage
+    return storage.Client()
+
+def _create_firestore_client():
+    from google.cloud import firestore
+    return firestore.Client()
+
+def get_storage_client():
+    return get_resource("storage_client", _create_storage_client)
+
+def get_firestore_client():
+    return get_resource("firestore_client", _create_firestore_client)
+
+class LazyResource:
+    """Stands in for a shared client and creates it on first attribute access."""
+    def __init__(self, getter):
+        self._getter = getter
+
+    def __getattr__(self, name):
+        return getattr(self._getter(), name)
+
+storage_client = LazyResource(get_storage_client)
+firestore_client = LazyResource(get_firestore_client)
+
+def server_timestamp():
+    """Firestore's SERVER_TIMESTAMP sentinel, imported on first use."""
+    from google.cloud.firestore import SERVER_TIMESTAMP
+    return SERVER_TIMESTAMP
+
+def delete_field():
+    """Firestore's DELETE_FIELD sentinel, imported on first use."""
+    from google.cloud.firestore import DELETE_FIELD
+    return DELETE_FIELD
 
 def get_videos_bucket(bucket_name: str = BUCKET_NAME):
     return storage_client.bucket(BUCKET_NAME)
@@ -1,9 +1,9 @@
 import os
 import uvicorn
-from fastapi import FastAPI, WebSocket
+from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.staticfiles import StaticFiles
-from .routers import video, analysis, coaching
+from .routers import video, analysis, coaching, progress, live
 
 def create_app() -> FastAPI:
     app = FastAPI(title="Slugger Sensei: Virtual Baseball Coach Backend")
@@ -27,13 +27,25 @@ def create_app() -> FastAPI:
     app.include_router(video.router, prefix="/video", tags=["video"])
     app.include_router(analysis.router, prefix="/analysis", tags=["analysis"])
     app.include_router(coaching.router, prefix="/coaching", tags=["coaching"])
-
-    @app.websocket("/ws")
-    async def websocket_endpoint(websocket: WebSocket):
-        await websocket.accept()
-        while True:
-            data = await websocket.receive_text()
-            await websocket.send_text(f"Message text was: {data}")
+    app.include_router(progress.router, tags=["progress"])
+    app.include_router(live.router, prefix="/live", tags=["live"])
+
+    @app.on_event("startup")
+    def start_analysis_workers():
+        from .services.job_queue import get_job_queue
+        get_job_queue()
+
+    @app.on_event("startup")
+    def warm_up_resources():
+        # Clients, reference data and heavy imports load in the background
+        if os.getenv("WARM_UP", "1") != "0":
+            from .warmup import start_warm_up
+            start_warm_up()
+
+    @app.on_event("shutdown")
+    def stop_analysis_workers():
+        from .services.job_queue import shutdown_job_queue
+        shutdown_job_queue()
 
     return app
 
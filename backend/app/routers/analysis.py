@@ -1,18 +1,38 @@
 import sys
 import os
+import time
+import asyncio
 import logging
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
 
 from fastapi import APIRouter, HTTPException
+from fastapi.responses import JSONResponse, StreamingResponse
+from starlette.concurrency import run_in_threadpool
 from pydantic import BaseModel
-from google.cloud import firestore
-from utils.image_generator import generate_and_upload_images
-from ..services.analysis_service import analyze_video
-from ..services.coaching_service import ask_gemini  
+from typing import List, Optional
+from ..services.referenceData import get_reference_data
+from ..services.analysis_service import analyze_video_background
+from ..services.job_queue import LANES, get_job_queue
+from ..config import firestore_client
+from ..services.analysis_cache import get_cached_analysis, store_cached_analysis, invalidate_analysis_cache
+from ..services.coaching_service import ask_gemini, stream_answer
+from ..services.llm_service import format_sse
+from ..services.video_service import get_video_documents, MAX_BATCH_VIDEOS
+from ..services.trajectory_store import refit_videos
+from ..services.advancedTracker import BaseballTracker
 
-firestore_client = firestore.Client()
 router = APIRouter()
 
+# How long /process waits for the analysis job before answering 202
+PROCESS_WAIT_SECONDS = float(os.getenv("PROCESS_WAIT_SECONDS", "240"))
+JOB_POLL_SECONDS = 0.5
+
+def generate_and_upload_images(*args, **kwargs):
+    # Charting pulls in matplotlib, seaborn and pandas, so it is imported on
+    # first use (or by the startup warm-up) rather than with the app
+    from utils.image_generator import generate_and_upload_images as generate
+    return generate(*args, **kwargs)
+
 class AnalysisRequest(BaseModel):
     video_id: str
 
@@ -20,11 +40,29 @@ class ImageGenerationRequest(BaseModel):
     video_id: str
     launch_angle: float
     exit_velocity: float
+    image_format: Optional[str] = None  # png, webp or svg; CHART_IMAGE_FORMAT by default
+    dpi: Optional[int] = None
 
 class QuestionRequest(BaseModel):
     video_id: str
     question: str
 
+class BatchAnalysisRequest(BaseModel):
+    video_ids: List[str]
+
+class EnqueueRequest(BaseModel):
+    video_ids: List[str]
+    lane: str = "bulk"
+
+class CacheInvalidationRequest(BaseModel):
+    content_hash: Optional[str] = None
+    stale_only: bool = True
+
+class RefitRequest(BaseModel):
+    video_ids: Optional[List[str]] = None  # Every video with a stored trajectory by default
+    velocity_conversion: float = BaseballTracker.VELOCITY_CONVERSION
+    write: bool = False
+
 @router.post("/ask")
 def ask_ai(request: QuestionRequest):
     """Handles AI-generated responses based on user questions."""
@@ -39,12 +77,46 @@ def ask_ai(request: QuestionRequest):
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error processing question: {str(e)}")
 
+@router.post("/ask/stream")
+async def ask_ai_stream(request: QuestionRequest):
+    """Server-Sent Events version of /ask: "token" events, an optional "fallback" and "done"."""
+    if not request.video_id or not request.question:
+        raise HTTPException(status_code=400, detail="Invalid request. Video ID and question are required.")
+
+    async def body():
+        async for event, data in stream_answer(request.video_id, request.question):
+            yield format_sse(event, data)
+
+    return StreamingResponse(body(), media_type="text/event-stream",
+                             headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+
+async def wait_for_job(job_id: str, timeout: float = None):
+    """
+    Polls the job store until the job succeeds or fails; returns it, or None
+    after timeout (PROCESS_WAIT_SECONDS by default).
+    """
+    store = get_job_queue().store
+    deadline = time.monotonic() + (PROCESS_WAIT_SECONDS if timeout is None else timeout)
+    while True:
+        job = await run_in_threadpool(store.get, job_id)
+        if job is None or job["status"] in ("succeeded", "failed"):
+            return job
+        if time.monotonic() >= deadline:
+            return None
+        await asyncio.sleep(JOB_POLL_SECONDS)
+
 @router.post("/process")
 async def process_video(request: AnalysisRequest):
-    """Processes the video and generates feedback."""
+    """
+    Processes the video and generates feedback. Tracking runs on the shared
+    worker pool: the video's queued or running job is reused (moved up to
+    the interactive lane), or a new interactive job is queued, and the
+    request waits for it. If the job outlasts PROCESS_WAIT_SECONDS, a 202
+    with the job is returned instead; progress is also pushed on /ws.
+    """
     try:
         doc_ref = firestore_client.collection("videos").document(request.video_id)
-        doc = doc_ref.get()
+        doc = await run_in_threadpool(doc_ref.get)
         
         if not doc.exists:
             raise HTTPException(status_code=404, detail="Video not found")
@@ -56,7 +128,33 @@ async def process_video(request: AnalysisRequest):
                 detail=f"Previous analysis failed: {data.get('error', 'Unknown error')}"
             )
 
-        result = analyze_video(request.video_id)
+        content_hash = data.get("content_hash")
+        cached = await run_in_threadpool(get_cached_analysis, content_hash)
+        if cached and cached.get("images"):
+            await run_in_threadpool(doc_ref.update, {
+                "analysis_results": cached["analysis"],
+                "status": "completed"
+            })
+            return {
+                "video_id": request.video_id,
+                "analysis": cached["analysis"],
+                "images": cached["images"]
+            }
+
+        result = data.get("analysis_results") if data.get("status") == "completed" else None
+        if not result:
+            job = await run_in_threadpool(get_job_queue().ensure_job, request.video_id, "interactive")
+            finished = await wait_for_job(job["job_id"])
+            if finished is None:
+                return JSONResponse(status_code=202, content={
+                    "video_id": request.video_id,
+                    "job_id": job["job_id"],
+                    "status": "processing"
+                })
+            if finished["status"] == "failed":
+                raise HTTPException(status_code=400, detail=f"Analysis failed: {finished.get('error') or 'Unknown error'}")
+            doc = await run_in_threadpool(doc_ref.get)
+            result = (doc.to_dict() or {}).get("analysis_results")
         
         if not result:
             raise HTTPException(status_code=404, detail="No analysis data found")
@@ -65,7 +163,8 @@ async def process_video(request: AnalysisRequest):
         exit_velocity = float(result.get("exit_velocity", 0))
         
         try:
-            images = generate_and_upload_images(
+            images = await run_in_threadpool(
+                generate_and_upload_images,
                 video_id=request.video_id,
                 launch_angle=launch_angle,
                 exit_velocity=exit_velocity
@@ -73,17 +172,103 @@ async def process_video(request: AnalysisRequest):
         except Exception as img_error:
             logging.error(f"Error generating images: {str(img_error)}")
             images = {}   
+
+        if images:
+            await run_in_threadpool(store_cached_analysis, content_hash, result, images)
         return {
             "video_id": request.video_id,
             "analysis": result,
             "images": images
         }
+    except HTTPException:
+        raise
     except ValueError as e:
         raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         logging.error(f"Error in process_video: {str(e)}", exc_info=True)
         raise HTTPException(status_code=500, detail=f"Error processing video: {str(e)}")
 
+@router.post("/batch")
+def get_analyses(request: BatchAnalysisRequest):
+    """Fetch analysis results for many videos with one Firestore read."""
+    if len(request.video_ids) > MAX_BATCH_VIDEOS:
+        raise HTTPException(status_code=400, detail=f"At most {MAX_BATCH_VIDEOS} videos per batch.")
+    try:
+        documents = get_video_documents(request.video_ids)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error fetching analyses: {str(e)}")
+
+    results = []
+    for video_id in dict.fromkeys(request.video_ids):
+        data = documents.get(video_id)
+        if data is None:
+            results.append({"video_id": video_id, "error": "Video not found"})
+        elif not data.get("analysis_results"):
+            results.append({"video_id": video_id, "status": data.get("status", "unknown"),
+                            "error": "Analysis not available yet"})
+        else:
+            results.append({"video_id": video_id, "status": data.get("status", "unknown"),
+                            "analysis": data["analysis_results"]})
+    return {"results": results}
+
+@router.post("/enqueue")
+def enqueue_analysis(request: EnqueueRequest):
+    """Queues videos for (re)analysis, by default in the bulk lane."""
+    if request.lane not in LANES:
+        raise HTTPException(status_code=400, detail=f"Unknown lane. Use one of: {', '.join(LANES)}")
+    try:
+        jobs = [analyze_video_background(video_id, request.lane) for video_id in request.video_ids]
+        return {"jobs": [{"job_id": job["job_id"], "video_id": job["video_id"]} for job in jobs]}
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error queueing analysis: {str(e)}")
+
+@router.get("/jobs/{job_id}")
+def get_job(job_id: str):
+    """Fetch the status and timings of an analysis job."""
+    job = get_job_queue().store.get(job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job
+
+@router.post("/cache/invalidate")
+def invalidate_cache(request: CacheInvalidationRequest):
+    """Deletes cached analyses, by default only those from older tracker versions."""
+    try:
+        deleted = invalidate_analysis_cache(request.content_hash, request.stale_only)
+        return {"deleted": deleted}
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error invalidating cache: {str(e)}")
+
+@router.post("/refit")
+def refit(request: RefitRequest):
+    """
+    Recomputes launch angle and exit velocity from the stored ball
+    trajectories instead of decoding the videos again. With write, the
+    results replace the stored analyses and their cached charts; writing
+    needs the tracker's own velocity_conversion.
+    """
+    if request.velocity_conversion <= 0:
+        raise HTTPException(status_code=400, detail="velocity_conversion must be positive.")
+    try:
+        return refit_videos(request.video_ids, request.velocity_conversion, request.write)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error refitting trajectories: {str(e)}")
+
+@router.get("/percentiles")
+def get_percentiles(launch_angle: float, exit_velocity: float, hit_distance: Optional[float] = None,
+                    season: Optional[str] = None):
+    """
+    Where a swing ranks among MLB home runs: per-metric percentile and rank,
+    plus the joint (launch angle, exit velocity) percentile. Defaults to the
+    latest season; pass season=all to compare against every season.
+    """
+    try:
+        return get_reference_data().percentiles.describe(launch_angle, exit_velocity, hit_distance, season)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
 @router.get("/{video_id}")
 def get_analysis(video_id: str):
     """Fetch analysis results."""
@@ -108,10 +293,17 @@ def get_analysis(video_id: str):
 @router.post("/generate-images")
 def generate_images(request: ImageGenerationRequest):
     """Generate analysis images based on launch angle & exit velocity."""
+    options = {}
+    if request.image_format:
+        options["image_format"] = request.image_format
+    if request.dpi:
+        options["dpi"] = request.dpi
     try:
         image_urls = generate_and_upload_images(
-            request.video_id, request.launch_angle, request.exit_velocity
+            request.video_id, request.launch_angle, request.exit_velocity, **options
         )
         return {"video_id": request.video_id, "images": image_urls}
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error generating images: {str(e)}")
\ No newline at end of file
@@ -1,12 +1,20 @@
 from fastapi import APIRouter, HTTPException
+from fastapi.responses import StreamingResponse
 from pydantic import BaseModel
-from ..services.coaching_service import generate_coaching_feedback
+import json
+from typing import List
+from ..services.coaching_service import generate_coaching_feedback, stream_coaching_feedback, batch_coaching_feedback
+from ..services.video_service import MAX_BATCH_VIDEOS
+from ..services.llm_service import format_sse
 
 router = APIRouter()
 
 class CoachingRequest(BaseModel):
     video_id: str
 
+class BatchCoachingRequest(BaseModel):
+    video_ids: List[str]
+
 @router.post("/feedback")
 def get_feedback(request: CoachingRequest):
     try:
@@ -14,3 +22,44 @@ def get_feedback(request: CoachingRequest):
         return {"video_id": request.video_id, "feedback": feedback}
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
+
+@router.post("/feedback/stream")
+async def stream_feedback(request: CoachingRequest):
+    """
+    Server-Sent Events version of /feedback: "meta", then "token" events as
+    the model writes, an optional "fallback" and a final "done" event.
+    """
+    events = stream_coaching_feedback(request.video_id)
+    try:
+        # Fail with a normal HTTP error if the video or its analysis is missing
+        first = await events.__anext__()
+    except ValueError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+    async def body():
+        yield format_sse(*first)
+        async for event, data in events:
+            yield format_sse(event, data)
+
+    return StreamingResponse(body(), media_type="text/event-stream",
+                             headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+
+@router.post("/feedback/batch")
+async def batch_feedback(request: BatchCoachingRequest):
+    """
+    Coaching feedback for many videos, streamed as newline-delimited JSON in
+    the order the responses finish. Each line carries a video_id and either
+    feedback or error.
+    """
+    if not request.video_ids:
+        raise HTTPException(status_code=400, detail="No video IDs given.")
+    if len(request.video_ids) > MAX_BATCH_VIDEOS:
+        raise HTTPException(status_code=400, detail=f"At most {MAX_BATCH_VIDEOS} videos per batch.")
+
+    async def body():
+        async for result in batch_coaching_feedback(request.video_ids):
+            yield json.dumps(result) + "\n"
+
+    return StreamingResponse(body(), media_type="application/x-ndjson")
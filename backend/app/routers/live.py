@@ -0,0 +1,121 @@
+import asyncio
+import json
+import logging
+from fastapi import APIRouter, WebSocket, WebSocketDisconnect
+from starlette.concurrency import run_in_threadpool
+from ..services.liveTracker import LiveSwingTracker
+
+router = APIRouter()
+
+# Close code for an unexpected server-side failure
+INTERNAL_ERROR_CLOSE = 1011
+
+class LatestFrame:
+    """
+    Holds the newest frame not yet processed. A frame that arrives while
+    another is waiting replaces it, so a client sending faster than frames
+    can be analyzed loses frames instead of building up a backlog.
+    """
+    def __init__(self):
+        self.item = None
+        self.ready = asyncio.Event()
+        self.dropped = 0
+
+    def put(self, item):
+        if self.item is not None:
+            self.dropped += 1
+        self.item = item
+        self.ready.set()
+
+    def clear(self):
+        self.item = None
+        self.ready.clear()
+
+    async def take(self):
+        while self.item is None:
+            await self.ready.wait()
+            self.ready.clear()
+        item, self.item = self.item, None
+        return item
+
+async def process_frames(websocket: WebSocket, session: dict, frames: LatestFrame, lock: asyncio.Lock):
+    while True:
+        frame_index, data = await frames.take()
+        async with lock:
+            tracker = session.get("tracker")
+            if tracker is None:
+                continue  # Stopped while the frame was waiting
+            try:
+                update = await run_in_threadpool(tracker.process_bytes, data, frame_index)
+            except ValueError as e:
+                update = {"event": "error", "frame": frame_index, "error": str(e)}
+            except Exception as e:  # cv2.error and other failures end the session
+                logging.error(f"Error analyzing live frame {frame_index}: {str(e)}", exc_info=True)
+                session.pop("tracker", None)
+                await websocket.close(code=INTERNAL_ERROR_CLOSE, reason=f"Error analyzing frame {frame_index}")
+                return
+            else:
+                update.update(event="frame", provisional=True, dropped=frames.dropped)
+        await websocket.send_text(json.dumps(update))
+
+@router.websocket("/ws")
+async def live_swing(websocket: WebSocket):
+    """
+    Live swing analysis from streamed frames. The client sends
+    {"action": "start", "fps": 60, "format": "jpeg" | "bgr", "width", "height"}
+    (width and height for raw BGR24 frames only), then one binary message
+    per frame. Each analyzed frame gets a "frame" event with the ball
+    position and the provisional result, and "dropped" counts the frames
+    skipped to keep up. A frame of a new size starts a new swing
+    ("restarted" is true). {"action": "reset"} starts a new swing and
+    {"action": "stop"} ends the session with a "final" event. Frames that
+    cannot be decoded get an "error" event; a failure while analyzing one
+    closes the socket with code 1011.
+    """
+    await websocket.accept()
+    session = {}
+    frames = LatestFrame()
+    lock = asyncio.Lock()
+    received = 0
+    worker = asyncio.create_task(process_frames(websocket, session, frames, lock))
+    try:
+        while True:
+            message = await websocket.receive()
+            if message["type"] == "websocket.disconnect" or worker.done():
+                break
+            if message.get("bytes") is not None:
+                if "tracker" not in session:
+                    await websocket.send_text(json.dumps({"event": "error", "error": "Send a start message first."}))
+                    continue
+                frames.put((received, message["bytes"]))
+                received += 1
+                continue
+
+            try:
+                request = json.loads(message.get("text") or "")
+                action = request.get("action") if isinstance(request, dict) else None
+                if action not in ("start", "reset", "stop"):
+                    raise ValueError("action must be start, reset or stop.")
+                async with lock:
+                    frames.clear()
+                    if action == "start":
+                        session["tracker"] = LiveSwingTracker.from_options(request)
+                        received = frames.dropped = 0
+                        reply = {"event": "started", "fps": session["tracker"].fps}
+                    elif "tracker" not in session:
+                        raise ValueError("No live session; send a start message first.")
+                    elif action == "reset":
+                        session["tracker"].reset()
+                        reply = {"event": "reset"}
+                    else:
+                        reply = {"event": "final", **session.pop("tracker").summary(), "dropped": frames.dropped}
+            except ValueError as e:  # Includes malformed JSON
+                reply = {"event": "error", "error": str(e)}
+            await websocket.send_text(json.dumps(reply))
+            if reply["event"] == "final":
+                await websocket.close()
+                break
+    except WebSocketDisconnect:
+        pass
+    finally:
+        worker.cancel()
@@ -0,0 +1,70 @@
+import asyncio
+import json
+import logging
+from fastapi import APIRouter, WebSocket, WebSocketDisconnect
+from ..services.progress_broker import Subscriber, get_progress_broker
+
+logger = logging.getLogger(__name__)
+
+router = APIRouter()
+
+# Videos one connection may follow at once
+MAX_SUBSCRIPTIONS = 50
+
+async def send_events(websocket: WebSocket, subscriber: Subscriber):
+    while True:
+        event = await subscriber.get()
+        await websocket.send_text(json.dumps(event, default=str))
+
+def parse_message(text: str):
+    """Returns (action, video_id) of a client message, or raises ValueError."""
+    try:
+        message = json.loads(text)
+    except json.JSONDecodeError:
+        raise ValueError("Messages must be JSON.")
+    if not isinstance(message, dict):
+        raise ValueError("Messages must be JSON objects.")
+    action, video_id = message.get("action"), message.get("video_id")
+    if action not in ("subscribe", "unsubscribe"):
+        raise ValueError("action must be subscribe or unsubscribe.")
+    if not isinstance(video_id, str) or not video_id:
+        raise ValueError("video_id is required.")
+    return action, video_id
+
+@router.websocket("/ws")
+async def progress_updates(websocket: WebSocket):
+    """
+    Live analysis progress. Clients send {"action": "subscribe", "video_id": ...}
+    (or "unsubscribe") and receive each stage event for that video as JSON,
+    starting with its latest one. Invalid messages get a {"error": ...} reply.
+    """
+    await websocket.accept()
+    broker = get_progress_broker()
+    subscriber = Subscriber()
+    video_ids = set()
+    sender = asyncio.create_task(send_events(websocket, subscriber))
+    try:
+        while True:
+            text = await websocket.receive_text()
+            try:
+                action, video_id = parse_message(text)
+                if action == "subscribe" and video_id not in video_ids and len(video_ids) >= MAX_SUBSCRIPTIONS:
+                    raise ValueError(f"At most {MAX_SUBSCRIPTIONS} subscriptions per connection.")
+            except ValueError as e:
+                await websocket.send_text(json.dumps({"error": str(e)}))
+                continue
+
+            if action == "subscribe":
+                video_ids.add(video_id)
+                broker.subscribe(video_id, subscriber)
+            else:
+                video_ids.discard(video_id)
+                broker.unsubscribe(video_id, subscriber)
+    except WebSocketDisconnect:
+        pass
+    finally:
+        for video_id in video_ids:
+            broker.unsubscribe(video_id, subscriber)
+        sender.cancel()
+        if subscriber.dropped:
+            logger.info(f"Progress connection dropped {subscriber.dropped} stale events")
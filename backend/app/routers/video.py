@@ -1,61 +1,106 @@
-from fastapi import APIRouter, UploadFile, File, HTTPException, BackgroundTasks
-from ..config import get_videos_bucket, firestore_client, BUCKET_NAME
+from fastapi import APIRouter, HTTPException, Query, Request
+from fastapi.responses import StreamingResponse
+from ..config import get_videos_bucket, firestore_client, server_timestamp, BUCKET_NAME
 from uuid import uuid4
-from google.cloud.firestore import SERVER_TIMESTAMP
-from google.api_core.exceptions import GoogleAPICallError 
+from google.api_core.exceptions import FailedPrecondition, GoogleAPICallError, InvalidArgument
+from fastapi.concurrency import run_in_threadpool
+from ..services.analysis_cache import get_cached_analysis
+from ..services.upload_service import (MultipartFileStream, StreamingUpload, UploadError, MAX_UPLOAD_BYTES,
+                                      SNIFF_BYTES, STAGING_PREFIX, STREAM_WRITE_SIZE)
+from ..services.video_service import (VideoPage, list_videos_page, parse_fields, DEFAULT_PAGE_SIZE,
+                                      MAX_PAGE_SIZE)
+from datetime import datetime
+from typing import Optional
+import itertools
+import json
 import os
 
 router = APIRouter()
 
 ALLOWED_MIME_TYPES = {"video/mp4", "video/mov", "video/avi", "video/mkv", "application/octet-stream"}
 
-@router.post("/upload")
-async def upload_video(background_tasks: BackgroundTasks, file: UploadFile = File(...)):
-    """Uploads a video to GCS and stores metadata in Firestore."""
-    print(f"📽️ Detected MIME type: {file.content_type}")
-
-    if file.content_type not in ALLOWED_MIME_TYPES:
-        raise HTTPException(status_code=400, detail="Invalid file type. Only videos are allowed.")
+# Room for the multipart boundaries and part headers around the file
+MULTIPART_OVERHEAD_BYTES = 64 * 1024
 
-    actual_content_type = file.content_type
-    if file.content_type == "application/octet-stream":
-        actual_content_type = "video/mp4"
+@router.post("/upload")
+async def upload_video(request: Request):
+    """
+    Streams a video to GCS and stores metadata in Firestore without blocking the event loop.
+    The multipart body is parsed as it arrives, so the file is never buffered whole and
+    oversized or non-video uploads are rejected before the rest of the body is read.
+    """
+    content_length = request.headers.get("content-length")
+    if content_length and content_length.isdigit() and int(content_length) > MAX_UPLOAD_BYTES + MULTIPART_OVERHEAD_BYTES:
+        raise HTTPException(status_code=413, detail=f"File too large. The limit is {MAX_UPLOAD_BYTES // (1024 * 1024)} MB.")
+    try:
+        form = MultipartFileStream(request.headers.get("content-type"))
+    except UploadError as e:
+        raise HTTPException(status_code=e.status_code, detail=str(e))
 
     video_id = str(uuid4())
-    extension = file.filename.split(".")[-1] if "." in file.filename else "mp4"
-    final_name = f"{video_id}.{extension}"
+    upload = None
+    extension = "mp4"
 
     try:
-        # ✅ Ensure we get the correct bucket
-        bucket = get_videos_bucket()
-        blob = bucket.blob(final_name)
-
-        if blob.exists():
-            raise HTTPException(status_code=409, detail="A video with this ID already exists.")
-
-        file.file.seek(0)  # ✅ Reset file pointer before uploading
-
-        # ✅ Upload to GCS
-        blob.upload_from_file(file.file, content_type=actual_content_type)
-        print(f"✅ Video uploaded successfully to GCS: {final_name}")
+        # ✅ Stream the file part into a resumable upload, hashing and sniffing it on the way
+        pending = bytearray()
+        async for data in request.stream():
+            pending.extend(b"".join(form.feed(data)))
+            if upload is None and form.found:
+                print(f"📽️ Detected MIME type: {form.content_type}")
+                if form.content_type not in ALLOWED_MIME_TYPES:
+                    raise UploadError("Invalid file type. Only videos are allowed.")
+                extension = form.filename.split(".")[-1] if "." in form.filename else "mp4"
+                # ✅ Ensure we get the correct bucket
+                upload = StreamingUpload(get_videos_bucket(), f"{STAGING_PREFIX}{video_id}.{extension}")
+            # The first write sniffs the content, so it goes out as soon as there is enough to check
+            if upload is not None and len(pending) >= (STREAM_WRITE_SIZE if upload.size else SNIFF_BYTES):
+                await run_in_threadpool(upload.write, bytes(pending))
+                pending.clear()
+        form.finish()
+        if pending:
+            await run_in_threadpool(upload.write, bytes(pending))
+
+        # ✅ Store videos by content hash so re-uploads of the same clip are deduplicated
+        final_name, content_hash, deduplicated = await run_in_threadpool(upload.finish, extension)
+        if deduplicated:
+            print(f"♻️ Identical video already stored in GCS: {final_name}")
+        else:
+            print(f"✅ Video uploaded successfully to GCS: {final_name} ({upload.size} bytes, {upload.content_type})")
 
         # ✅ Store metadata in Firestore
         doc_ref = firestore_client.collection("videos").document(video_id)
-        doc_ref.set({
+        metadata = {
             "video_id": video_id,
             "file_name": final_name,
+            "content_hash": content_hash,
+            "content_type": upload.content_type,
+            "size_bytes": upload.size,
             "bucket": BUCKET_NAME,
-            "uploaded_at": SERVER_TIMESTAMP
-        })
+            "uploaded_at": server_timestamp()
+        }
+
+        cached = await run_in_threadpool(get_cached_analysis, content_hash)
+        if cached:
+            metadata.update({"analysis_results": cached["analysis"], "status": "completed"})
+        await run_in_threadpool(doc_ref.set, metadata)
         print(f"✅ Metadata stored in Firestore for video: {video_id}")
 
         video_url = f"https://storage.googleapis.com/{BUCKET_NAME}/{final_name}"
 
-        # ✅ Add background analysis task
+        if cached:
+            print(f"♻️ Reusing cached analysis for video: {video_id}")
+            return {
+                "video_id": video_id,
+                "status": "completed",
+                "video_url": video_url
+            }
+
+        # ✅ Queue analysis on the shared worker pool
         try:
             from ..services.analysis_service import analyze_video_background
-            background_tasks.add_task(analyze_video_background, video_id)
-            print(f"🛠️ Analysis background task started for video: {video_id}")
+            job = await run_in_threadpool(analyze_video_background, video_id)
+            print(f"🛠️ Analysis job {job['job_id']} queued for video: {video_id}")
         except ImportError as e:
             print(f"⚠️ Could not import analyze_video_background: {e}")
 
@@ -65,10 +110,19 @@ async def upload_video(background_tasks: BackgroundTasks, file: UploadFile = Fil
             "video_url": video_url
         }
 
+    except UploadError as e:
+        if upload is not None:
+            await run_in_threadpool(upload.abort)
+        raise HTTPException(status_code=e.status_code, detail=str(e))
+
     except GoogleAPICallError as e:
+        if upload is not None:
+            await run_in_threadpool(upload.abort)
         raise HTTPException(status_code=500, detail=f"Firestore error: {str(e)}")
 
     except Exception as e:
+        if upload is not None:
+            await run_in_threadpool(upload.abort)
         raise HTTPException(status_code=500, detail=f"Error uploading video: {str(e)}")
 
 @router.get("/video/{video_id}")
@@ -85,12 +139,43 @@ async def get_video(video_id: str):
         "video_url": video_url
     }
 
+def _json_default(value):
+    if isinstance(value, datetime):
+        return value.isoformat()
+    raise TypeError(f"Not JSON serializable: {type(value).__name__}")
+
+def stream_video_page(page: VideoPage, videos=None):
+    """
+    Writes the page as one JSON object while the Firestore query streams.
+    videos is the page's iterator when the caller has already started it.
+    """
+    yield '{"videos": ['
+    for index, video in enumerate(page if videos is None else videos):
+        yield ("," if index else "") + json.dumps(video, default=_json_default)
+    yield '], "next_cursor": ' + json.dumps(page.next_cursor) + '}'
+
 @router.get("/videos")
-async def list_videos():
-    docs = firestore_client.collection("videos").stream()
-    videos = [{"video_id": doc.id, **doc.to_dict()} for doc in docs]
-    
-    if not videos:
-        return {"message": "No videos found.", "videos": []}
-    
-    return {"videos": videos}
+def list_videos(
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    cursor: Optional[str] = None,
+    status: Optional[str] = None,
+    uploaded_after: Optional[datetime] = None,
+    uploaded_before: Optional[datetime] = None,
+    fields: Optional[str] = Query(None, description="Comma-separated fields; status and uploaded_at by default")
+):
+    """Lists videos newest first, one page at a time; pass next_cursor back as cursor for the next page."""
+    try:
+        page = list_videos_page(limit, cursor, status, uploaded_after, uploaded_before, parse_fields(fields))
+        # Run the query before the 200 goes out, so its errors still get a status code
+        videos = iter(page)
+        first = next(videos, None)
+    except (ValueError, InvalidArgument) as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except FailedPrecondition as e:
+        # Most likely a filter combination without its composite index
+        raise HTTPException(status_code=500, detail=f"Video list query needs a Firestore index: {str(e)}")
+    except GoogleAPICallError as e:
+        raise HTTPException(status_code=500, detail=f"Firestore error: {str(e)}")
+    if first is not None:
+        videos = itertools.chain([first], videos)
+    return StreamingResponse(stream_video_page(page, videos), media_type="application/json")
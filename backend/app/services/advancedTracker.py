@@ -1,31 +1,77 @@
 import cv2
 import numpy as np
-import matplotlib.pyplot as plt
 import os 
-import matplotlib.pyplot as plt
+import queue
+import threading
+import time
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from .motionGate import MotionGate
+
+# Bump whenever detection or trajectory fitting changes, so cached analyses
+# computed by an older tracker are no longer served
+TRACKER_VERSION = "2"
 
 class BaseballTracker:
-    def __init__(self, video_path):
+    # Frames read per video by track_baseball
+    MAX_FRAMES = 300
+    # Ball contour area range in pixels at full resolution
+    MIN_BALL_AREA = 50
+    MAX_BALL_AREA = 1000
+    # Blank rows between stacked frame masks in batched detection, so
+    # contours never join across frames
+    BATCH_GAP = 2
+    # Frames between on_progress calls while reading
+    PROGRESS_INTERVAL = 15
+    # Calibrated conversion from ball speed in pixels per second to mph
+    VELOCITY_CONVERSION = 0.035
+
+    def __init__(self, video_path, batch_size=1, motion_gate=False, probe=True,
+                 capture_api=cv2.CAP_ANY, on_progress=None):
+        """
+        With probe=False the video is not opened up front, for inputs that can
+        only be read once (such as a pipe); its info is filled in on first read.
+        capture_api pins the VideoCapture backend; pipes should use CAP_FFMPEG
+        so a failed open does not fall through to backends that reopen the path.
+        on_progress(frames_read, total_frames) is called every PROGRESS_INTERVAL
+        frames of a tracking pass; total_frames is None when unknown.
+        """
         self.video_path = video_path
-        self.video_info = self.get_video_info()
+        self.capture_api = capture_api
+        self.on_progress = on_progress
+        self.batch_size = batch_size
+        self.motion_gate = motion_gate
+        if probe:
+            self.video_info = self.get_video_info()
+        else:
+            self.video_info = {'fps': 0, 'frame_width': 0, 'frame_height': 0, 'total_frames': 0}
         self.fps = self.video_info['fps']
+        self.frame_indices = []
+        self.pipeline_stats = {}
+        self.swing_window = None
 
     def get_video_info(self):
         """
         Retrieve video information such as FPS, frame width, frame height, and total frames.
         """
-        cap = cv2.VideoCapture(self.video_path)
+        cap = self._open_capture()
         if not cap.isOpened():
             print("Error: Unable to open video file.")
             return {'fps': 0, 'frame_width': 0, 'frame_height': 0, 'total_frames': 0}
 
+        video_info = self._capture_info(cap)
+        cap.release()
+        return video_info
+
+    def _open_capture(self):
+        return cv2.VideoCapture(self.video_path, self.capture_api)
+
+    def _capture_info(self, cap):
         fps = cap.get(cv2.CAP_PROP_FPS)
         frame_width = int(cap.get(cv2.CAP_PROP_FRAME_WIDTH))
         frame_height = int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT))
         total_frames = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
 
-        cap.release()
-
         return {
             'fps': fps,
             'frame_width': frame_width,
@@ -33,14 +79,22 @@ class BaseballTracker:
             'total_frames': total_frames
         }
 
-    def detect_baseball(self, frame):
+    def _area_bounds(self, scale):
+        return self.MIN_BALL_AREA * scale ** 2, self.MAX_BALL_AREA * scale ** 2
+
+    def detect_baseball(self, frame, motion_mask=None, scale=1.0):
         """
         Detects the baseball in a frame using color and contour filtering.
+        An optional motion_mask limits the search to moving pixels, and scale
+        is the frame's downscale factor, used to adjust the ball area range.
         """
+        min_area, max_area = self._area_bounds(scale)
         hsv = cv2.cvtColor(frame, cv2.COLOR_BGR2HSV)
         lower_white = np.array([0, 0, 200])
         upper_white = np.array([180, 30, 255])
         mask = cv2.inRange(hsv, lower_white, upper_white)
+        if motion_mask is not None:
+            mask = cv2.bitwise_and(mask, motion_mask)
 
         kernel = np.ones((5,5), np.uint8)
         mask = cv2.morphologyEx(mask, cv2.MORPH_OPEN, kernel)
@@ -53,7 +107,7 @@ class BaseballTracker:
             area = cv2.contourArea(cnt)
             x, y, w, h = cv2.boundingRect(cnt)
             aspect_ratio = float(w) / h
-            if 50 < area < 1000 and 0.7 < aspect_ratio < 1.3:
+            if min_area < area < max_area and 0.7 < aspect_ratio < 1.3:
                 valid_contours.append(cnt)
 
         if valid_contours:
@@ -63,35 +117,505 @@ class BaseballTracker:
 
         return None
 
-    def track_baseball(self):
-        cap = cv2.VideoCapture(self.video_path)
-        if not cap.isOpened():
-            print("Error: Unable to open video file.")
-            return {'launch_angle': 0, 'exit_velocity': 0}, []
+    def detect_baseball_batch(self, frames, motion_masks=None, scale=1.0):
+        """
+        Detects the baseball in a stack of frames shaped (N, H, W, 3).
+
+        Each frame is thresholded into its own band of one stacked mask, with
+        blank separator rows between bands, so contour extraction runs once
+        for the whole batch. Contour areas and bounding boxes are then computed
+        for all candidates at once from the concatenated contour points,
+        instead of a Python loop calling contourArea and boundingRect per
+        contour. Results match detect_baseball frame for frame. Optional
+        motion_masks (one per frame, or None) and scale work as in
+        detect_baseball.
+        Returns a list with the center coordinates (or None) for each frame.
+        """
+        n = len(frames)
+        h, w = frames[0].shape[:2]
+        stride = h + self.BATCH_GAP
 
-        ball_positions = []
-        frame_count = 0
+        lower_white = np.array([0, 0, 200])
+        upper_white = np.array([180, 30, 255])
+        kernel = np.ones((5,5), np.uint8)
+
+        # Thresholding stays per frame so the working set fits in cache,
+        # writing into preallocated buffers instead of allocating per frame
+        hsv = np.empty((h, w, 3), dtype=np.uint8)
+        mask = np.zeros((n * stride, w), dtype=np.uint8)
+        for i, frame in enumerate(frames):
+            band = mask[i * stride:i * stride + h]
+            cv2.cvtColor(frame, cv2.COLOR_BGR2HSV, dst=hsv)
+            cv2.inRange(hsv, lower_white, upper_white, dst=band)
+            if motion_masks is not None and motion_masks[i] is not None:
+                cv2.bitwise_and(band, motion_masks[i], dst=band)
+            cv2.morphologyEx(band, cv2.MORPH_OPEN, kernel, dst=band)
+            cv2.morphologyEx(band, cv2.MORPH_CLOSE, kernel, dst=band)
+
+        detections = [None] * n
+        contours, _ = cv2.findContours(mask, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
+        if not contours:
+            return detections
+
+        lengths = np.fromiter(map(len, contours), dtype=np.int64, count=len(contours))
+        points = np.concatenate(contours).reshape(-1, 2).astype(np.int64)
+        starts = np.concatenate(([0], np.cumsum(lengths)[:-1]))
+        px, py = points[:, 0], points[:, 1]
+
+        # Shoelace area per contour, wrapping each contour's last point to its first
+        following = np.arange(len(points)) + 1
+        following[starts + lengths - 1] = starts
+        cross = px * py[following] - px[following] * py
+        area = np.abs(np.add.reduceat(cross, starts)) / 2
+
+        x = np.minimum.reduceat(px, starts)
+        y = np.minimum.reduceat(py, starts)
+        bw = np.maximum.reduceat(px, starts) - x + 1
+        bh = np.maximum.reduceat(py, starts) - y + 1
+        aspect_ratio = bw / bh
+
+        min_area, max_area = self._area_bounds(scale)
+        valid = (area > min_area) & (area < max_area) & (aspect_ratio > 0.7) & (aspect_ratio < 1.3)
+        if not valid.any():
+            return detections
+
+        x, y, bw, bh, area = x[valid], y[valid], bw[valid], bh[valid], area[valid]
+        frame_idx = y // stride
+
+        # Sort candidates by frame, then by area; the last one per frame is the largest
+        order = np.lexsort((area, frame_idx))
+        frame_idx = frame_idx[order]
+        largest = order[np.append(frame_idx[1:] != frame_idx[:-1], True)]
+
+        frame_idx = y[largest] // stride
+        cx = x[largest] + bw[largest] / 2
+        cy = y[largest] - frame_idx * stride + bh[largest] / 2
+
+        for i, px, py in zip(frame_idx, cx, cy):
+            detections[i] = [float(px), float(py)]
+        return detections
+
+    def _seek(self, cap, start):
+        """
+        Positions an open capture on frame start. Seeking lands on the nearest
+        decodable frame, so the position is checked and the gap is grabbed.
+        """
+        if start <= 0:
+            return
+        cap.set(cv2.CAP_PROP_POS_FRAMES, start)
+        position = int(cap.get(cv2.CAP_PROP_POS_FRAMES))
+        if position > start:
+            cap.set(cv2.CAP_PROP_POS_FRAMES, 0)
+            position = 0
+        while position < start and cap.grab():
+            position += 1
 
-        while cap.isOpened():
+    def _read_frames(self, cap, start=0, stop=None):
+        """
+        Yields (frame_index, frame) pairs for frames [start, stop) of an open capture.
+        """
+        self._seek(cap, start)
+        total = self._pass_length(start, stop)
+        frame_index = start
+        while cap.isOpened() and (stop is None or frame_index < stop):
             ret, frame = cap.read()
             if not ret:
                 break
 
-            detection = self.detect_baseball(frame)
+            yield frame_index, frame
+            frame_index += 1
+            if self.on_progress and (frame_index - start) % self.PROGRESS_INTERVAL == 0:
+                self.on_progress(frame_index - start, total)
+
+    def _pass_length(self, start, stop):
+        """Number of frames a read of [start, stop) will return, or None if unknown."""
+        total_frames = self.video_info['total_frames']
+        if total_frames > 0:
+            stop = total_frames if stop is None else min(stop, total_frames)
+        return max(stop - start, 0) if stop is not None else None
+
+    def _gate_frames(self, frames, gate):
+        """
+        Drops static frames. Yields (frame_index, frame, region) for moving ones.
+        """
+        for frame_index, frame in frames:
+            region = gate.update(frame)
+            if region is not None:
+                yield frame_index, frame, region
+
+    def _detect_items(self, items, batch_size, scale=1.0):
+        """
+        Runs detection over (frame_index, frame, region) items, feeding the
+        batched engine chunks of batch_size frames. Items with a motion region
+        from MotionGate are searched only in their moving tiles.
+        Yields (frame_index, center).
+        """
+        if batch_size <= 1:
+            for frame_index, frame, region in items:
+                detection = self._detect_region(frame, region, scale)
+                if detection:
+                    yield frame_index, detection
+            return
+
+        chunk = []
+        for item in items:
+            chunk.append(item)
+            if len(chunk) == batch_size:
+                yield from self._detect_chunk(chunk, scale)
+                chunk = []
+
+        if chunk:
+            yield from self._detect_chunk(chunk, scale)
+
+    def _detect_region(self, frame, region, scale=1.0):
+        if region is None:
+            return self.detect_baseball(frame, scale=scale)
+
+        (x0, y0, x1, y1), motion_mask = region
+        detection = self.detect_baseball(frame[y0:y1, x0:x1], motion_mask[y0:y1, x0:x1], scale)
+        if detection:
+            return [detection[0] + x0, detection[1] + y0]
+        return None
+
+    def _detect_chunk(self, chunk, scale=1.0):
+        indices, frames, regions = zip(*chunk)
+        motion_masks = [region[1] if region else None for region in regions]
+        detections = self.detect_baseball_batch(frames, motion_masks, scale)
+        for frame_index, detection in zip(indices, detections):
             if detection:
-                ball_positions.append(detection)
+                yield frame_index, detection
 
-            frame_count += 1
-            if frame_count > 300:
-                break
+    def track_range(self, start=0, stop=None, batch_size=None, motion_gate=None):
+        """
+        Detects the ball in frames [start, stop) of the video (stop=None reads
+        to the end). Returns a list of (frame_index, center) pairs.
+        """
+        batch_size = batch_size or self.batch_size
+        motion_gate = self.motion_gate if motion_gate is None else motion_gate
 
-        cap.release()
+        cap = self._open_capture()
+        if not cap.isOpened():
+            print("Error: Unable to open video file.")
+            return []
+
+        try:
+            if motion_gate:
+                # Start one frame early so the gate has a previous frame for start
+                frames = self._read_frames(cap, max(start - 1, 0), stop)
+                items = self._gate_frames(frames, MotionGate())
+            else:
+                frames = self._read_frames(cap, start, stop)
+                items = ((frame_index, frame, None) for frame_index, frame in frames)
+
+            return list(self._detect_items(items, batch_size))
+        finally:
+            cap.release()
+
+    def track_baseball(self, batch_size=None, motion_gate=None):
+        """
+        Tracks the ball over the first MAX_FRAMES frames of the video.
+        With batch_size > 1 frames are detected in chunks by detect_baseball_batch.
+        With motion_gate, only frames and tiles with motion are searched.
+        The frame index of each returned position is kept in self.frame_indices.
+        """
+        detections = self.track_range(0, self.MAX_FRAMES + 1, batch_size, motion_gate)
+        return self._summarize(detections)
+
+    def _summarize(self, detections):
+        """
+        Splits (frame_index, center) pairs into self.frame_indices and ball
+        positions, and fits the trajectory when there are enough of them.
+        """
+        self.frame_indices = [frame_index for frame_index, _ in detections]
+        ball_positions = [position for _, position in detections]
 
         if len(ball_positions) > 3:
             return self._analyze_trajectory(ball_positions), ball_positions
 
         return {'launch_angle': 0, 'exit_velocity': 0}, ball_positions
 
+    def find_swing_window(self, window_seconds=1.0, sample_fps=30, scale=0.125):
+        """
+        Cheap first pass that locates the swing. Frames are skipped with grab(),
+        which avoids the color conversion and copy of a full read, and only
+        about sample_fps frames per second are retrieved, shrunk by scale and
+        scored by motion energy (mean absolute difference to the previous
+        sample). Returns the (start, stop) frame range of window_seconds of
+        video with the most motion energy.
+        """
+        fps = self.fps if self.fps > 0 else sample_fps
+        window = max(int(round(window_seconds * fps)), 1)
+        step = max(int(round(fps / sample_fps)), 1)
+
+        cap = self._open_capture()
+        if not cap.isOpened():
+            print("Error: Unable to open video file.")
+            return 0, window
+
+        sample_frames, energies = [], []
+        previous = None
+        frame_index = 0
+        while cap.grab():
+            if frame_index % step == 0:
+                ret, frame = cap.retrieve()
+                if not ret:
+                    break
+                small = cv2.resize(frame, None, fx=scale, fy=scale, interpolation=cv2.INTER_AREA)
+                small = cv2.cvtColor(small, cv2.COLOR_BGR2GRAY)
+                if previous is not None:
+                    sample_frames.append(frame_index)
+                    energies.append(cv2.absdiff(small, previous).mean())
+                previous = small
+            frame_index += 1
+        cap.release()
+
+        total_frames = frame_index
+        if total_frames <= window or not energies:
+            return 0, max(total_frames, window)
+
+        best = self._best_window(energies, max(window // step, 1))
+        start = max(sample_frames[best] - step, 0)
+        start = min(start, total_frames - window)
+        return start, start + window
+
+    def track_swing(self, window_seconds=1.0, batch_size=None, motion_gate=None):
+        """
+        Tracks the ball only inside the swing window found by find_swing_window,
+        at full resolution, instead of the first MAX_FRAMES frames. The window is
+        kept in self.swing_window.
+        """
+        self.swing_window = self.find_swing_window(window_seconds)
+        start, stop = self.swing_window
+        detections = self.track_range(start, stop, batch_size, motion_gate)
+        return self._summarize(detections)
+
+    def track_swing_stream(self, window_seconds=1.0, batch_size=None):
+        """
+        Single-pass variant of track_swing for inputs that cannot be reopened or
+        seeked, such as a pipe fed while the video is still downloading. Every
+        frame goes through the motion gate once: gated detection runs as frames
+        arrive, the gate's motion energy is recorded per frame, and at the end
+        only the detections inside the highest-energy window are kept.
+        """
+        batch_size = batch_size or self.batch_size
+        self.frame_indices = []
+
+        cap = self._open_capture()
+        if not cap.isOpened():
+            print("Error: Unable to open video file.")
+            return {'launch_angle': 0, 'exit_velocity': 0}, []
+
+        if self.fps <= 0:
+            self.video_info = self._capture_info(cap)
+            self.fps = self.video_info['fps']
+
+        gate = MotionGate()
+        energies = []
+
+        def gated_frames():
+            for frame_index, frame in self._read_frames(cap):
+                region = gate.update(frame)
+                energies.append(gate.energy)
+                if region is not None:
+                    yield frame_index, frame, region
+
+        try:
+            detections = list(self._detect_items(gated_frames(), batch_size))
+        finally:
+            cap.release()
+
+        window = max(int(round(window_seconds * (self.fps if self.fps > 0 else 30))), 1)
+        start = self._best_window(energies, window) if energies else 0
+        self.swing_window = (start, start + window)
+
+        return self._summarize([
+            (frame_index, position) for frame_index, position in detections
+            if start <= frame_index < start + window
+        ])
+
+    def _best_window(self, energies, length):
+        """
+        Returns the index where a run of length consecutive energies has the
+        largest sum.
+        """
+        length = min(length, len(energies))
+        scores = np.convolve(energies, np.ones(length), mode='valid')
+        return int(np.argmax(scores))
+
+    def track_baseball_segmented(self, workers=None, segment_frames=None, max_frames=None,
+                                 batch_size=None, motion_gate=None):
+        """
+        Tracks the whole video (or its first max_frames frames) by splitting it
+        into frame ranges that are tracked in parallel worker processes, each
+        with its own VideoCapture. Range boundaries are aligned to whole seconds
+        of video, where encoders usually place keyframes, so seeks stay cheap.
+        Positions are merged in frame order with their frame indices intact.
+        """
+        batch_size = batch_size or self.batch_size
+        motion_gate = self.motion_gate if motion_gate is None else motion_gate
+        self.frame_indices = []
+
+        total_frames = self.video_info['total_frames']
+        if max_frames is not None:
+            total_frames = min(total_frames, max_frames) if total_frames > 0 else max_frames
+        if total_frames <= 0:
+            print("Error: Unable to determine video length.")
+            return {'launch_angle': 0, 'exit_velocity': 0}, []
+
+        ranges = self.segment_ranges(total_frames, workers, segment_frames)
+        pool = get_segment_pool(workers)
+        futures = [
+            pool.submit(_track_segment, self.video_path, start, stop, batch_size, motion_gate)
+            for start, stop in ranges
+        ]
+
+        detections = []
+        for future in futures:
+            detections.extend(future.result())
+        return self._summarize(detections)
+
+    def segment_ranges(self, total_frames, workers=None, segment_frames=None):
+        """
+        Splits [0, total_frames) into contiguous ranges, one per worker unless
+        segment_frames is given, with boundaries rounded to whole seconds.
+        """
+        workers = workers or os.cpu_count() or 1
+        if segment_frames is None:
+            segment_frames = -(-total_frames // workers)
+
+        keyframe_interval = max(int(round(self.fps)), 1)
+        segment_frames = max(keyframe_interval, -(-segment_frames // keyframe_interval) * keyframe_interval)
+
+        return [
+            (start, min(start + segment_frames, total_frames))
+            for start in range(0, total_frames, segment_frames)
+        ]
+
+    def track_baseball_pipelined(self, decoders=1, queue_size=32, scale=1.0,
+                                 batch_size=None, motion_gate=None):
+        """
+        Pipelined variant of track_baseball. Decoder threads read frames (each
+        from its own slice of the first MAX_FRAMES frames), optionally downscale
+        them by scale and run the motion gate, and fill a bounded queue that the
+        detection stage drains. OpenCV releases the GIL while decoding and
+        detecting, so the stages overlap.
+        Queue depth and per-stage timings are kept in self.pipeline_stats.
+        """
+        batch_size = batch_size or self.batch_size
+        motion_gate = self.motion_gate if motion_gate is None else motion_gate
+        self.frame_indices = []
+        started = time.perf_counter()
+
+        total_frames = self.MAX_FRAMES + 1
+        if self.video_info['total_frames'] > 0:
+            total_frames = min(total_frames, self.video_info['total_frames'])
+        else:
+            decoders = 1  # Unknown length: one decoder reads to the end
+
+        decoders = max(1, min(decoders, total_frames))
+        bounds = np.linspace(0, total_frames, decoders + 1).astype(int)
+
+        frame_queue = queue.Queue(maxsize=queue_size)
+        timings = [{'decode': 0.0, 'resize': 0.0, 'gate': 0.0, 'frames': 0} for _ in range(decoders)]
+        errors = []
+        threads = [
+            threading.Thread(
+                target=self._decode_range,
+                args=(bounds[i], bounds[i + 1], frame_queue, scale, motion_gate, timings[i], errors),
+                daemon=True
+            )
+            for i in range(decoders)
+        ]
+        for thread in threads:
+            thread.start()
+
+        depths = []
+        wait_time = 0.0
+
+        def drain():
+            nonlocal wait_time
+            finished = 0
+            while finished < decoders:
+                depths.append(frame_queue.qsize())
+                wait_started = time.perf_counter()
+                item = frame_queue.get()
+                wait_time += time.perf_counter() - wait_started
+                if item is None:
+                    finished += 1
+                    continue
+                yield item
+
+        detect_started = time.perf_counter()
+        detections = sorted(self._detect_items(drain(), batch_size, scale))
+        detect_time = time.perf_counter() - detect_started - wait_time
+
+        for thread in threads:
+            thread.join()
+        if errors:
+            raise errors[0]
+
+        self.pipeline_stats = {
+            'decoders': decoders,
+            'frames': sum(t['frames'] for t in timings),
+            'decode_seconds': sum(t['decode'] for t in timings),
+            'resize_seconds': sum(t['resize'] for t in timings),
+            'gate_seconds': sum(t['gate'] for t in timings),
+            'detect_seconds': detect_time,
+            'detect_wait_seconds': wait_time,
+            'wall_seconds': time.perf_counter() - started,
+            'queue_size': queue_size,
+            'max_queue_depth': max(depths, default=0),
+            'mean_queue_depth': float(np.mean(depths)) if depths else 0.0
+        }
+
+        return self._summarize([
+            (frame_index, [x / scale, y / scale]) for frame_index, (x, y) in detections
+        ])
+
+    def _decode_range(self, start, stop, frame_queue, scale, motion_gate, timings, errors):
+        """
+        Decoder stage: reads frames [start, stop) into frame_queue as
+        (frame_index, frame, region) items and ends with a None sentinel.
+        With the motion gate, the frame before start is read first to seed
+        the gate, so the slice's first frame is not reported as static.
+        """
+        cap = self._open_capture()
+        gate = MotionGate() if motion_gate else None
+        first = max(start - 1, 0) if gate is not None else start
+        try:
+            if not cap.isOpened():
+                raise ValueError("Unable to open video file.")
+            self._seek(cap, first)
+
+            for frame_index in range(first, stop):
+                stage_started = time.perf_counter()
+                ret, frame = cap.read()
+                timings['decode'] += time.perf_counter() - stage_started
+                if not ret:
+                    break
+                if frame_index >= start:
+                    timings['frames'] += 1
+
+                if scale != 1.0:
+                    stage_started = time.perf_counter()
+                    frame = cv2.resize(frame, None, fx=scale, fy=scale, interpolation=cv2.INTER_AREA)
+                    timings['resize'] += time.perf_counter() - stage_started
+
+                region = None
+                if gate is not None:
+                    stage_started = time.perf_counter()
+                    region = gate.update(frame)
+                    timings['gate'] += time.perf_counter() - stage_started
+                    if region is None or frame_index < start:
+                        continue
+
+                frame_queue.put((frame_index, frame, region))
+        except Exception as e:
+            errors.append(e)
+        finally:
+            cap.release()
+            frame_queue.put(None)
+
     def _analyze_trajectory(self, positions):
         positions = np.array(positions)
         x_vals = positions[:, 0]
@@ -103,10 +627,7 @@ class BaseballTracker:
 
         distances = np.sqrt(np.sum(np.diff(positions, axis=0)**2, axis=1))
         avg_pixel_velocity = np.mean(distances) * self.fps
-
-        # Calibrated conversion factor
-        conversion_factor = 0.035
-        exit_velocity = avg_pixel_velocity * conversion_factor
+        exit_velocity = avg_pixel_velocity * self.VELOCITY_CONVERSION
 
         return {'launch_angle': launch_angle, 'exit_velocity': exit_velocity}
 
@@ -114,6 +635,8 @@ class BaseballTracker:
         """
         Comprehensive visualization of tracking process
         """
+        import matplotlib.pyplot as plt
+
         plt.figure(figsize=(15, 10))
         
         if (ball_positions):
@@ -131,6 +654,36 @@ class BaseballTracker:
         plt.show()
 
 
+
+
+_segment_pool = None
+_segment_pool_workers = None
+_segment_pool_lock = threading.Lock()
+
+def get_segment_pool(workers=None):
+    """
+    Returns the process pool shared by segmented tracking, created on first use.
+    Workers are spawned rather than forked so they do not inherit OpenCV's
+    thread state.
+    """
+    global _segment_pool, _segment_pool_workers
+    workers = workers or os.cpu_count() or 1
+    with _segment_pool_lock:
+        if _segment_pool is None or _segment_pool_workers != workers:
+            if _segment_pool is not None:
+                _segment_pool.shutdown(wait=False)
+            _segment_pool = ProcessPoolExecutor(
+                max_workers=workers,
+                mp_context=multiprocessing.get_context("spawn")
+            )
+            _segment_pool_workers = workers
+        return _segment_pool
+
+def _track_segment(video_path, start, stop, batch_size, motion_gate):
+    """Worker entry point for track_baseball_segmented."""
+    tracker = BaseballTracker(video_path, batch_size=batch_size, motion_gate=motion_gate)
+    return tracker.track_range(start, stop)
+
 # Usage
 if __name__ == "__main__":
     video_file = "../datasets/videos/video_0.mp4"  
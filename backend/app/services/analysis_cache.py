@@ -0,0 +1,65 @@
+import logging
+from ..config import firestore_client, server_timestamp, delete_field
+from .advancedTracker import TRACKER_VERSION
+
+logger = logging.getLogger(__name__)
+
+ANALYSIS_CACHE_COLLECTION = "analysis_cache"
+
+def cache_key(content_hash: str, tracker_version: str = None) -> str:
+    """Entries are keyed by content and tracker version (the current one by default)."""
+    return f"{content_hash}-v{tracker_version or TRACKER_VERSION}"
+
+def get_cached_analysis(content_hash: str):
+    """Returns the cached entry for this content and tracker version, or None."""
+    if not content_hash:
+        return None
+    doc = firestore_client.collection(ANALYSIS_CACHE_COLLECTION).document(cache_key(content_hash)).get()
+    if not doc.exists:
+        return None
+    logger.info(f"Analysis cache hit for {content_hash[:12]} (tracker v{TRACKER_VERSION})")
+    return doc.to_dict()
+
+def store_cached_analysis(content_hash: str, analysis: dict, images: dict = None, trajectory: dict = None,
+                          clear_images: bool = False):
+    """
+    Stores analysis results (and chart URLs and the stored trajectory, when
+    available) for this content. With clear_images, charts cached for earlier
+    results are dropped so they are drawn again for the new ones.
+    """
+    if not content_hash:
+        return
+    entry = {
+        "content_hash": content_hash,
+        "tracker_version": TRACKER_VERSION,
+        "analysis": analysis,
+        "updated_at": server_timestamp()
+    }
+    if images:
+        entry["images"] = images
+    elif clear_images:
+        entry["images"] = delete_field()
+    if trajectory:
+        entry["trajectory"] = trajectory
+    firestore_client.collection(ANALYSIS_CACHE_COLLECTION).document(cache_key(content_hash)).set(entry, merge=True)
+
+def invalidate_analysis_cache(content_hash: str = None, stale_only: bool = True) -> int:
+    """
+    Deletes cache entries. By default only entries written by an older tracker
+    version are removed; with stale_only=False every matching entry goes.
+    Limited to one video's content when content_hash is given.
+    Returns the number of deleted entries.
+    """
+    query = firestore_client.collection(ANALYSIS_CACHE_COLLECTION)
+    if content_hash:
+        query = query.where("content_hash", "==", content_hash)
+
+    deleted = 0
+    for doc in query.stream():
+        if stale_only and doc.to_dict().get("tracker_version") == TRACKER_VERSION:
+            continue
+        doc.reference.delete()
+        deleted += 1
+
+    logger.info(f"Invalidated {deleted} analysis cache entries")
+    return deleted
@@ -1,17 +1,104 @@
-import tempfile
 import logging
-from google.cloud import storage, firestore
+import cv2
 from ..config import get_videos_bucket, firestore_client
 from .advancedTracker import BaseballTracker
-import threading 
+from .ingest_service import BlobPipe, is_streamable
+from .analysis_cache import get_cached_analysis, store_cached_analysis
+from .blob_cache import get_blob_cache
+from .progress_broker import publish_progress
+from .trajectory_store import Trajectory, store_trajectory
 import os
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# Smallest change in tracking percentage worth publishing
+PROGRESS_STEP_PERCENT = 5
+
+class TrackingProgress:
+    """Turns tracker frame counts into throttled tracking events for one video."""
+    def __init__(self, video_id: str, fallback=None):
+        self.video_id = video_id
+        self.fallback = fallback  # () -> fraction done, for passes of unknown length
+        self.reported = -PROGRESS_STEP_PERCENT
+
+    def __call__(self, frames_read: int, total_frames: int = None):
+        if total_frames:
+            fraction = frames_read / total_frames
+        elif self.fallback:
+            fraction = self.fallback()
+        else:
+            return
+        percent = int(min(max(fraction, 0.0), 1.0) * 100)
+        if percent - self.reported >= PROGRESS_STEP_PERCENT:
+            self.reported = percent
+            publish_progress(self.video_id, "tracking", percent=percent)
+
+def _track_file(local_video_path: str, video_id: str = None):
+    on_progress = TrackingProgress(video_id) if video_id else None
+    tracker = BaseballTracker(local_video_path, on_progress=on_progress)
+    results, ball_positions = tracker.track_swing()
+    logger.info(f"Tracked swing window {tracker.swing_window} at {tracker.fps} fps")
+    return results, Trajectory.from_tracker(tracker, ball_positions)
+
+def _track_video(blob, file_name: str, video_id: str = None):
+    """
+    Tracks the swing from the local blob cache when the video was seen
+    before; otherwise streams the blob when its container allows it, keeping
+    a copy for the cache if the cache is on disk, or downloads it into the
+    cache first. Returns the tracking results and the ball's trajectory.
+    """
+    blob.reload()
+    cache = get_blob_cache()
+    with cache.lookup(blob) as cached_path:
+        if cached_path:
+            logger.info(f"Tracking cached copy of {file_name}: {cached_path}")
+            if video_id:
+                publish_progress(video_id, "downloaded", bytes=blob.size, cached=True)
+            return _track_file(cached_path, video_id)
+
+    if is_streamable(blob, file_name):
+        logger.info(f"Streaming video for tracking: {file_name} ({blob.size} bytes)")
+        # A memory-backed cache would hold a second full copy in RAM
+        copy_path = cache.temp_path() if cache.copy_streams else None
+        try:
+            pipe = BlobPipe(blob, copy_to=copy_path)
+            # A pipe has no frame count, so progress follows the bytes decoded
+            on_progress = TrackingProgress(video_id, lambda: pipe.bytes_written / blob.size) if video_id else None
+            with pipe as pipe_path:
+                tracker = BaseballTracker(pipe_path, probe=False, capture_api=cv2.CAP_FFMPEG,
+                                          on_progress=on_progress)
+                results, ball_positions = tracker.track_swing_stream()
+            if video_id:
+                publish_progress(video_id, "downloaded", bytes=pipe.bytes_written, cached=False)
+            if pipe.complete:
+                cache.put_file(blob, copy_path)
+        finally:
+            if copy_path and os.path.exists(copy_path):
+                os.remove(copy_path)
+        logger.info(f"Tracked swing window {tracker.swing_window} at {tracker.fps} fps")
+        return results, Trajectory.from_tracker(tracker, ball_positions)
+
+    # The container needs random access (e.g. MP4 with moov at the end)
+    with cache.fill(blob) as local_video_path:
+        logger.info(f"Video downloaded to: {local_video_path}")
+        if video_id:
+            publish_progress(video_id, "downloaded", bytes=blob.size, cached=False)
+        return _track_file(local_video_path, video_id)
+
+def _store_trajectory(bucket, file_name: str, trajectory: Trajectory):
+    """Saves the trajectory next to the video; a failed upload does not fail the analysis."""
+    try:
+        return store_trajectory(bucket, file_name, trajectory)
+    except Exception as e:
+        logger.error(f"Error storing trajectory for {file_name}: {str(e)}")
+        return None
+
 def analyze_video(video_id: str):
+    doc_ref = None
     try:
         logger.info(f"Starting analysis for video_id: {video_id}")
+        publish_progress(video_id, "started")
         doc_ref = firestore_client.collection("videos").document(video_id)
         doc = doc_ref.get()
 
@@ -22,50 +109,66 @@ def analyze_video(video_id: str):
         data = doc.to_dict()
         bucket_name = data.get("bucket")
         file_name = data.get("file_name")
+        content_hash = data.get("content_hash")
 
         if not bucket_name or not file_name:
             logger.error(f"Invalid metadata for video ID: {video_id}")
             raise ValueError(f"Invalid metadata for video ID: {video_id}")
 
-        logger.info(f"Downloading video from bucket: {bucket_name}, file: {file_name}")
-        bucket = get_videos_bucket(bucket_name)
-        blob = bucket.blob(file_name)
-
-        with tempfile.NamedTemporaryFile(suffix=".mp4", delete=False) as temp_video:
-            blob.download_to_filename(temp_video.name)
-            local_video_path = temp_video.name
-            logger.info(f"Video downloaded to: {local_video_path}")
-
-            logger.info("Starting baseball tracking")
-            tracker = BaseballTracker(local_video_path)
-            results, _ = tracker.track_baseball()
-            
-            if not results:
-                logger.error("No results returned from tracker")
-                raise ValueError("No tracking results available")
-
-            launch_angle = results.get('launch_angle')
-            exit_velocity = results.get('exit_velocity')
-            
-            if launch_angle is None or exit_velocity is None:
-                logger.error("Missing launch angle or exit velocity in results")
-                raise ValueError("Error analyzing ball motion.")
-
-            analysis_results = {
-                "launch_angle": float(launch_angle),
-                "exit_velocity": float(exit_velocity)
+        cached = get_cached_analysis(content_hash)
+        if cached:
+            update = {
+                "analysis_results": cached["analysis"],
+                "status": "completed"
             }
+            if cached.get("trajectory"):
+                update["trajectory"] = cached["trajectory"]
+            doc_ref.update(update)
+            publish_progress(video_id, "completed", analysis=cached["analysis"], cached=True)
+            return cached["analysis"]
 
-            logger.info(f"Analysis completed successfully: {analysis_results}")
-            doc_ref.update({
-                "analysis_results": analysis_results, 
-                "status": "completed"
-            })
+        logger.info(f"Fetching video from bucket: {bucket_name}, file: {file_name}")
+        bucket = get_videos_bucket(bucket_name)
+        blob = bucket.blob(file_name)
 
-            return analysis_results
+        logger.info("Starting baseball tracking")
+        results, trajectory = _track_video(blob, file_name, video_id)
+
+        if not results:
+            logger.error("No results returned from tracker")
+            raise ValueError("No tracking results available")
+
+        launch_angle = results.get('launch_angle')
+        exit_velocity = results.get('exit_velocity')
+
+        if launch_angle is None or exit_velocity is None:
+            logger.error("Missing launch angle or exit velocity in results")
+            raise ValueError("Error analyzing ball motion.")
+
+        analysis_results = {
+            "launch_angle": float(launch_angle),
+            "exit_velocity": float(exit_velocity)
+        }
+        publish_progress(video_id, "fitted", **analysis_results)
+
+        logger.info(f"Analysis completed successfully: {analysis_results}")
+        update = {
+            "analysis_results": analysis_results, 
+            "status": "completed"
+        }
+        # Kept so later fitting or calibration changes can refit without decoding
+        trajectory_ref = _store_trajectory(bucket, file_name, trajectory)
+        if trajectory_ref:
+            update["trajectory"] = trajectory_ref
+        doc_ref.update(update)
+        store_cached_analysis(content_hash, analysis_results, trajectory=trajectory_ref)
+        publish_progress(video_id, "completed", analysis=analysis_results, cached=False)
+
+        return analysis_results
 
     except Exception as e:
         logger.error(f"Error in analyze_video: {str(e)}", exc_info=True)
+        publish_progress(video_id, "failed", error=str(e))
         if doc_ref:
             doc_ref.update({
                 "status": "failed",
@@ -73,17 +176,8 @@ def analyze_video(video_id: str):
             })
         raise ValueError(f"Error analyzing video: {str(e)}")
 
-    finally:
-        try:
-            if 'local_video_path' in locals():
-                os.remove(local_video_path)
-                logger.info(f"Cleaned up temporary file: {local_video_path}")
-        except Exception as e:
-            logger.error(f"Error cleaning up temporary file: {str(e)}")
-
-def analyze_video_background(video_id: str):
-    thread = threading.Thread(target=analyze_video, args=(video_id,))
-    thread.daemon = True  
-    thread.start()
-    return thread
+def analyze_video_background(video_id: str, lane: str = "interactive"):
+    """Queues the video for analysis by the shared worker pool."""
+    from .job_queue import get_job_queue
+    return get_job_queue().enqueue(video_id, lane)
 
@@ -0,0 +1,287 @@
+import hashlib
+import logging
+import os
+import shutil
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+from ..config import get_resource
+
+logger = logging.getLogger(__name__)
+
+# On Cloud Run the writable filesystem (the temp dir included) lives in the
+# instance's memory, so every cached byte counts against its memory limit.
+# There, point BLOB_CACHE_DIR at a mounted disk volume and set
+# BLOB_CACHE_ON_DISK=1, or keep BLOB_CACHE_MAX_BYTES well below the limit.
+BLOB_CACHE_DIR = os.getenv("BLOB_CACHE_DIR", os.path.join(tempfile.gettempdir(), "slugsei-blob-cache"))
+BLOB_CACHE_MAX_BYTES = os.getenv("BLOB_CACHE_MAX_BYTES")
+# Default caps when BLOB_CACHE_MAX_BYTES is unset
+DISK_CACHE_MAX_BYTES = 2 * 1024 ** 3
+MEMORY_CACHE_MAX_BYTES = 256 * 1024 ** 2
+MEMORY_FILESYSTEMS = ("tmpfs", "ramfs")
+
+ENTRY_SUFFIX = ".blob"
+TMP_PREFIX = ".tmp-"
+# Partial downloads older than this were left behind by a crashed process
+STALE_TMP_SECONDS = 3600
+
+def is_memory_backed(directory: str) -> bool:
+    """
+    Whether files under directory are held in RAM: BLOB_CACHE_ON_DISK when
+    set, otherwise always on Cloud Run, otherwise when the directory's mount
+    is a tmpfs or ramfs.
+    """
+    setting = os.getenv("BLOB_CACHE_ON_DISK")
+    if setting is not None:
+        return setting.strip().lower() in ("0", "false", "no")
+    if os.getenv("K_SERVICE"):
+        return True
+    directory = os.path.realpath(directory)
+    mount_point, fs_type = "", None
+    try:
+        with open("/proc/mounts") as mounts:
+            for line in mounts:
+                fields = line.split()
+                if len(fields) < 3:
+                    continue
+                point = fields[1]
+                inside = directory == point or directory.startswith(point.rstrip("/") + "/")
+                if inside and len(point) >= len(mount_point):
+                    mount_point, fs_type = point, fields[2]
+    except OSError:
+        return False  # Not Linux; assume a disk
+    return fs_type in MEMORY_FILESYSTEMS
+
+def blob_cache_key(bucket_name: str, blob_name: str, generation) -> str:
+    """Entries are keyed by generation, so an overwritten object is a new entry."""
+    return hashlib.sha256(f"{bucket_name}/{blob_name}#{generation}".encode()).hexdigest()
+
+class LocalBlob:
+    """Filesystem stand-in for a GCS blob; the object is a file under the bucket's root."""
+    def __init__(self, bucket, name: str):
+        self.bucket = bucket
+        self.name = name
+        self.path = os.path.join(bucket.root, name)
+        self.size = None
+        self.generation = None
+
+    def exists(self) -> bool:
+        return os.path.isfile(self.path)
+
+    def reload(self):
+        stat = os.stat(self.path)
+        self.size = stat.st_size
+        self.generation = stat.st_mtime_ns
+
+    def download_to_filename(self, filename: str):
+        self.bucket.downloads += 1
+        shutil.copyfile(self.path, filename)
+
+    def download_as_bytes(self, start: int = 0, end: int = None) -> bytes:
+        self.bucket.downloads += 1
+        with open(self.path, "rb") as f:
+            f.seek(start)
+            return f.read() if end is None else f.read(end + 1 - start)
+
+    def upload_from_filename(self, filename: str, content_type: str = None):
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        shutil.copyfile(filename, self.path)
+        self.reload()
+
+    def upload_from_string(self, data, content_type: str = None):
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        with open(self.path, "wb") as f:
+            f.write(data.encode() if isinstance(data, str) else data)
+        self.reload()
+
+class LocalBucket:
+    """Filesystem stand-in for a GCS bucket, for running the blob cache offline."""
+    def __init__(self, root: str, name: str = None):
+        self.root = root
+        self.name = name or os.path.basename(os.path.normpath(root))
+        self.downloads = 0
+
+    def blob(self, name: str) -> LocalBlob:
+        return LocalBlob(self, name)
+
+class BlobCache:
+    """
+    Size-bounded on-disk cache of downloaded blobs, keyed by bucket, name and
+    generation, with least-recently-used eviction.
+
+    Files are downloaded to a temp file in the cache directory and renamed
+    into place, so readers (in this or another process) never see a partial
+    entry. Entries handed out by lookup/fetch/fill are pinned until the
+    context exits and are not evicted meanwhile. Concurrent misses for the
+    same blob share one download.
+
+    A cache whose directory is memory-backed (see is_memory_backed) defaults
+    to a small cap, and copy_streams is False so streamed videos are not
+    copied into it.
+    """
+    def __init__(self, directory: str = BLOB_CACHE_DIR, max_bytes: int = None, memory_backed: bool = None):
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+        self.memory_backed = is_memory_backed(directory) if memory_backed is None else memory_backed
+        if max_bytes is None:
+            max_bytes = int(BLOB_CACHE_MAX_BYTES) if BLOB_CACHE_MAX_BYTES else (
+                MEMORY_CACHE_MAX_BYTES if self.memory_backed else DISK_CACHE_MAX_BYTES)
+        self.max_bytes = max_bytes
+        self.copy_streams = not self.memory_backed
+        self._entries = OrderedDict()  # key -> size, least recently used first
+        self._pins = {}
+        self._fill_locks = {}
+        self._lock = threading.Lock()
+        self.stats = {"hits": 0, "misses": 0, "fills": 0, "evictions": 0, "bytes": 0}
+        self._scan()
+        with self._lock:
+            self._evict()  # The cap may have shrunk since the entries were written
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.directory, key + ENTRY_SUFFIX)
+
+    def _scan(self):
+        """Indexes the entries left on disk by earlier processes, oldest use first."""
+        entries = []
+        now = time.time()
+        for entry in os.scandir(self.directory):
+            try:
+                stat = entry.stat()
+                if entry.name.startswith(TMP_PREFIX):
+                    if now - stat.st_mtime > STALE_TMP_SECONDS:
+                        os.remove(entry.path)
+                elif entry.name.endswith(ENTRY_SUFFIX):
+                    entries.append((stat.st_mtime, entry.name[:-len(ENTRY_SUFFIX)], stat.st_size))
+            except OSError:
+                continue
+        for _, key, size in sorted(entries):
+            self._entries[key] = size
+        self.stats["bytes"] = sum(self._entries.values())
+
+    def key(self, blob) -> str:
+        if blob.generation is None:
+            blob.reload()
+        return blob_cache_key(blob.bucket.name, blob.name, blob.generation)
+
+    def temp_path(self) -> str:
+        """A new temp file inside the cache directory, for put_file."""
+        fd, path = tempfile.mkstemp(prefix=TMP_PREFIX, dir=self.directory)
+        os.close(fd)
+        return path
+
+    def _pin_existing(self, key: str) -> bool:
+        """Pins key if its file exists, indexing files written by other processes."""
+        path = self._path(key)
+        with self._lock:
+            try:
+                size = os.path.getsize(path)
+            except OSError:
+                if key in self._entries:
+                    self.stats["bytes"] -= self._entries.pop(key)
+                return False
+            if key not in self._entries:
+                self._entries[key] = size
+                self.stats["bytes"] += size
+            self._entries.move_to_end(key)
+            self._pins[key] = self._pins.get(key, 0) + 1
+        try:
+            os.utime(path)  # Recency survives a restart through the mtime
+        except OSError:
+            pass
+        return True
+
+    def _unpin(self, key: str):
+        with self._lock:
+            self._pins[key] -= 1
+            if not self._pins[key]:
+                del self._pins[key]
+            self._evict()
+
+    def _evict(self):
+        """Drops least recently used, unpinned entries until the cache fits. Caller holds the lock."""
+        for key in list(self._entries):
+            if self.stats["bytes"] <= self.max_bytes:
+                break
+            if key in self._pins:
+                continue
+            size = self._entries.pop(key)
+            self.stats["bytes"] -= size
+            self.stats["evictions"] += 1
+            try:
+                os.remove(self._path(key))
+            except OSError:
+                pass
+
+    def _insert(self, key: str, source_path: str):
+        """Atomically moves a complete file into the cache and pins it."""
+        os.chmod(source_path, 0o644)
+        os.replace(source_path, self._path(key))
+        size = os.path.getsize(self._path(key))
+        with self._lock:
+            self.stats["bytes"] += size - self._entries.get(key, 0)
+            self._entries[key] = size
+            self._entries.move_to_end(key)
+            self._pins[key] = self._pins.get(key, 0) + 1
+            self.stats["fills"] += 1
+
+    @contextmanager
+    def lookup(self, blob):
+        """Yields the cached file for blob, or None on a miss, without downloading."""
+        key = self.key(blob)
+        hit = self._pin_existing(key)
+        with self._lock:
+            self.stats["hits" if hit else "misses"] += 1
+        if not hit:
+            yield None
+            return
+        try:
+            yield self._path(key)
+        finally:
+            self._unpin(key)
+
+    @contextmanager
+    def fill(self, blob):
+        """Downloads blob into the cache unless it is already there, and yields its path."""
+        key = self.key(blob)
+        with self._lock:
+            fill_lock = self._fill_locks.setdefault(key, threading.Lock())
+        try:
+            with fill_lock:
+                if not self._pin_existing(key):
+                    temp_path = self.temp_path()
+                    try:
+                        blob.download_to_filename(temp_path)
+                        self._insert(key, temp_path)
+                    finally:
+                        if os.path.exists(temp_path):
+                            os.remove(temp_path)
+                    logger.info(f"Cached {blob.bucket.name}/{blob.name} ({self._entries.get(key, 0)} bytes)")
+        finally:
+            # Failed downloads included, or every failing key would keep its lock
+            with self._lock:
+                self._fill_locks.pop(key, None)
+        try:
+            yield self._path(key)
+        finally:
+            self._unpin(key)
+
+    @contextmanager
+    def fetch(self, blob):
+        """Yields a local path for blob: the cached copy, or a fresh download on a miss."""
+        with self.lookup(blob) as path:
+            if path is not None:
+                yield path
+                return
+        with self.fill(blob) as path:
+            yield path
+
+    def put_file(self, blob, source_path: str):
+        """Adopts a complete copy of blob written to temp_path() (e.g. while streaming it)."""
+        key = self.key(blob)
+        self._insert(key, source_path)
+        self._unpin(key)
+
+def get_blob_cache() -> BlobCache:
+    return get_resource("blob_cache", BlobCache)
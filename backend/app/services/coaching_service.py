@@ -1,23 +1,53 @@
 import os
-import google.generativeai as genai
-from google.cloud import firestore
+import asyncio
+import logging
+from starlette.concurrency import run_in_threadpool
 from ..config import firestore_client
-from .playerData import PlayerData
+from .referenceData import get_reference_data
+from .video_service import get_video_documents
+from .progress_broker import publish_progress
+from .llm_service import MODEL_NAME, ResponseCache, generate_text, stream_text, stream_with_budget
 
-genai.configure(api_key=os.getenv("GOOGLE_API_KEY"))
+logger = logging.getLogger(__name__)
 
-filePath = os.path.join(os.path.dirname(__file__), '../../datasets/2024-mlb-homeruns.csv')
-player_service = PlayerData(filePath)
+# Number of similar pro hits returned as "Pro Comparisons"
+PRO_COMPARISONS = 3
 
-def generate_coaching_feedback(video_id: str):
+# Bump when the coaching prompt changes so cached responses are not reused
+PROMPT_VERSION = "2"
 
-    doc_ref = firestore_client.collection("videos").document(video_id)
-    doc = doc_ref.get()
-    
-    if not doc.exists:
-        raise ValueError(f"No video found for ID: {video_id}")
+# Swings are bucketed to this resolution for the prompt and the response cache
+LAUNCH_ANGLE_STEP = 1.0
+EXIT_VELOCITY_STEP = 1.0
+
+feedback_cache = ResponseCache()
+
+# Latency budget for streamed responses: time to the first token, and in total
+FIRST_TOKEN_SECONDS = float(os.getenv("COACHING_FIRST_TOKEN_SECONDS", "8"))
+STREAM_BUDGET_SECONDS = float(os.getenv("COACHING_STREAM_BUDGET_SECONDS", "30"))
+
+# Coaching responses generated at once for a batch
+BATCH_CONCURRENCY = int(os.getenv("COACHING_BATCH_CONCURRENCY", "8"))
+
+def quantize(value: float, step: float) -> float:
+    return round(round(float(value) / step) * step, 6)
+
+def build_coaching_context(video_id: str, data: dict = None) -> dict:
+    """
+    Loads the video's analysis and prepares everything a coaching response
+    needs: the pro comparisons, the model prompt and its cache key, and the
+    statistics section appended to every answer. Pass the video document's
+    data when it was already fetched (e.g. in bulk) to skip the read.
+    """
+    if data is None:
+        doc_ref = firestore_client.collection("videos").document(video_id)
+        doc = doc_ref.get()
+
+        if not doc.exists:
+            raise ValueError(f"No video found for ID: {video_id}")
+
+        data = doc.to_dict()
 
-    data = doc.to_dict()
     analysis = data.get("analysis_results")
 
     if not analysis:
@@ -29,39 +59,63 @@ def generate_coaching_feedback(video_id: str):
     if launch_angle is None or exit_velocity is None:
         raise ValueError(f"Incomplete analysis data for video ID: {video_id}")
 
-    closest_match = None
-    smallest_diff = float('inf')
-    for player_id, player_data in player_service.get_all_players().items():
-        try:
-            launch_angle_diff = abs(float(player_data['LaunchAngle']) - launch_angle)
-            exit_velocity_diff = abs(float(player_data['ExitVelocity']) - exit_velocity)
-            total_diff = launch_angle_diff + exit_velocity_diff
+    # The prompt only sees bucketed metrics, so swings in the same bucket
+    # share one cached response
+    prompt_launch_angle = quantize(launch_angle, LAUNCH_ANGLE_STEP)
+    prompt_exit_velocity = quantize(exit_velocity, EXIT_VELOCITY_STEP)
 
-            if total_diff < smallest_diff:
-                smallest_diff = total_diff
-                closest_match = player_data
-        except ValueError:
-            continue
+    # Every season in datasets/, shared with the chart generator
+    reference = get_reference_data()
+    player_service = reference.players
+    matches = player_service.nearest_players(
+        prompt_launch_angle, prompt_exit_velocity, k=PRO_COMPARISONS, hit_distance=analysis.get("hit_distance")
+    )
+    closest_match = matches[0] if matches else None
+    pro_comparisons = [
+        {
+            "title": match["title"],
+            "video": match["video"],
+            "launch_angle": match["LaunchAngle"],
+            "exit_velocity": match["ExitVelocity"],
+            "hit_distance": match["HitDistance"],
+            "distance": match["distance"]
+        }
+        for match in matches
+    ]
 
     if closest_match:
         player_reference = f"Your performance is similar to {closest_match['title']}."
         player_video = closest_match['video']
-        outstanding_features = f"Launch Angle: {closest_match['LaunchAngle']}°, Exit Velocity: {closest_match['ExitVelocity']} mph"
+        outstanding_features = f"Launch Angle: {closest_match['LaunchAngle']:g}°, Exit Velocity: {closest_match['ExitVelocity']:g} mph"
     else:
         player_reference = "No close match found in the dataset."
         player_video = ""
         outstanding_features = ""
 
+    ranking = reference.percentiles.describe(prompt_launch_angle, prompt_exit_velocity)
+    mlb_percentiles = (
+        f"Exit velocity percentile {ranking['metrics']['ExitVelocity']['percentile']:.0f}, "
+        f"launch angle percentile {ranking['metrics']['LaunchAngle']['percentile']:.0f} "
+        f"among {ranking['season']} MLB home runs"
+    )
+
+    other_comparisons = "; ".join(
+        f"{match['title']} (Launch Angle: {match['LaunchAngle']:g}°, Exit Velocity: {match['ExitVelocity']:g} mph)"
+        for match in matches[1:]
+    ) or "None"
+
     prompt = f"""
     You are a professional baseball coach specializing in advanced swing mechanics and player development.
     You will provide **scientific and resource-backed feedback** based on reference materials like **MLB guidelines, biomechanics research, and professional coaching techniques**.
 
     ### Player Analysis:
-    - **Launch Angle**: {launch_angle}° (Recommended: 20°-35° for line drives & home runs)
-    - **Exit Velocity**: {exit_velocity} mph (Higher is better for power hitters)
+    - **Launch Angle**: {prompt_launch_angle:g}° (Recommended: 20°-35° for line drives & home runs)
+    - **Exit Velocity**: {prompt_exit_velocity:g} mph (Higher is better for power hitters)
     - **Reference Player**: {player_reference}
     - **Reference Player Video**: {player_video}
     - **Outstanding Features**: {outstanding_features}
+    - **Other Similar Players**: {other_comparisons}
+    - **MLB Percentiles**: {mlb_percentiles}
 
     ### Your Task:
     Provide detailed feedback on **how to improve** using references from **biomechanics studies, pro player case studies, and scientific analysis**.
@@ -109,53 +163,179 @@ def generate_coaching_feedback(video_id: str):
 These metrics together help determine the quality of contact and potential outcomes of your hits.
 """.format(exit_velocity=exit_velocity, launch_angle=launch_angle)
 
+    cache_key = (
+        PROMPT_VERSION, MODEL_NAME, prompt_launch_angle, prompt_exit_velocity,
+        tuple(match["play_id"] for match in matches)
+    )
+
+    return {
+        "video_id": video_id,
+        "launch_angle": launch_angle,
+        "exit_velocity": exit_velocity,
+        "player_reference": player_reference,
+        "player_video": player_video,
+        "outstanding_features": outstanding_features,
+        "pro_comparisons": pro_comparisons,
+        "percentiles": ranking,
+        "prompt": prompt,
+        "cache_key": cache_key,
+        "stats_explanation": stats_explanation
+    }
+
+def rule_based_feedback(context: dict) -> str:
+    """Feedback written without the model, used when it fails or runs out of time."""
+    launch_angle = context["launch_angle"]
+    exit_velocity = context["exit_velocity"]
+
+    fallback_feedback = f"**Coaching Feedback**\n\n"
+
+    if launch_angle < 10:
+        fallback_feedback += "- Your launch angle is too low. Adjust your bat angle and follow through to generate better loft.\n"
+    elif launch_angle > 40:
+        fallback_feedback += "- Your launch angle is too high, which may reduce your exit velocity. Focus on a controlled, flatter swing.\n"
+    else:
+        fallback_feedback += "- Your launch angle is within the optimal range. Keep working on consistency.\n"
+
+    if exit_velocity < 50:
+        fallback_feedback += "- Your exit velocity is low. Focus on improving your bat speed and lower-body drive for more power.\n"
+    else:
+        fallback_feedback += "- Your exit velocity is strong! Maintain good mechanics to ensure consistent results.\n"
+
+    fallback_feedback += f"\n- **Track your metrics using tools like Rapsodo or Statcast and work on incremental improvements.**\n"
+    fallback_feedback += f"\n- **{context['player_reference']}**\n"
+    fallback_feedback += f"\n- **Reference Player Video**: {context['player_video']}\n"
+    fallback_feedback += f"\n- **Outstanding Features**: {context['outstanding_features']}\n"
+    return fallback_feedback
+
+def _feedback_response(context: dict, feedback: str) -> dict:
+    return {
+        "video_id": context["video_id"],
+        "feedback": f"{feedback}\n\n{context['stats_explanation']}",
+        "reference_video": context["player_video"] if context["player_video"] else None,
+        "pro_comparisons": context["pro_comparisons"],
+        "percentiles": context["percentiles"]
+    }
+
+def generate_coaching_feedback(video_id: str, data: dict = None):
+    context = build_coaching_context(video_id, data)
     try:
-        model = genai.GenerativeModel("gemini-pro")
-        response = model.generate_content(prompt)
+        response_text = feedback_cache.get_or_compute(context["cache_key"], lambda: generate_text(context["prompt"]))
+        source = "model"
+    except Exception as e:
+        response_text = rule_based_feedback(context)
+        source = "fallback"
+    publish_progress(video_id, "feedback_ready", source=source)
+    return _feedback_response(context, response_text)
 
-        complete_feedback = f"{response.text}\n\n{stats_explanation}"
+async def stream_coaching_feedback(video_id: str, first_token_seconds: float = FIRST_TOKEN_SECONDS,
+                                   budget_seconds: float = STREAM_BUDGET_SECONDS):
+    """
+    Async generator of (event, data) pairs for a streamed coaching response:
+    "meta" with the pro comparisons, "token" for each piece of model text,
+    "fallback" with the rule-based feedback if the model fails or misses its
+    latency budget (clients replace any partial text with it), and "done"
+    with the complete response. Cached responses are sent as one token.
+    """
+    context = await run_in_threadpool(build_coaching_context, video_id)
+    yield "meta", {
+        "video_id": video_id,
+        "reference_video": context["player_video"] if context["player_video"] else None,
+        "pro_comparisons": context["pro_comparisons"]
+    }
 
-        return {
-            "video_id": video_id,
-            "feedback": complete_feedback,
-            "reference_video": player_video if player_video else None
-        }
+    cached = feedback_cache.get(context["cache_key"])
+    if cached is not None:
+        yield "token", {"text": cached}
+        publish_progress(video_id, "feedback_ready", source="cache")
+        yield "done", {**_feedback_response(context, cached), "source": "cache"}
+        return
 
+    parts = []
+    try:
+        async for text in stream_with_budget(stream_text(context["prompt"]), first_token_seconds, budget_seconds):
+            parts.append(text)
+            yield "token", {"text": text}
     except Exception as e:
-        fallback_feedback = f"**Coaching Feedback**\n\n"
-        
-        if launch_angle < 10:
-            fallback_feedback += "- Your launch angle is too low. Adjust your bat angle and follow through to generate better loft.\n"
-        elif launch_angle > 40:
-            fallback_feedback += "- Your launch angle is too high, which may reduce your exit velocity. Focus on a controlled, flatter swing.\n"
-        else:
-            fallback_feedback += "- Your launch angle is within the optimal range. Keep working on consistency.\n"
-
-        if exit_velocity < 50:
-            fallback_feedback += "- Your exit velocity is low. Focus on improving your bat speed and lower-body drive for more power.\n"
-        else:
-            fallback_feedback += "- Your exit velocity is strong! Maintain good mechanics to ensure consistent results.\n"
-
-        fallback_feedback += f"\n- **Track your metrics using tools like Rapsodo or Statcast and work on incremental improvements.**\n"
-        fallback_feedback += f"\n- **{player_reference}**\n"
-        fallback_feedback += f"\n- **Reference Player Video**: {player_video}\n"
-        fallback_feedback += f"\n- **Outstanding Features**: {outstanding_features}\n"
-
-        complete_fallback = f"{fallback_feedback}\n\n{stats_explanation}"
-
-        return {
-            "video_id": video_id,
-            "feedback": complete_fallback,
-            "reference_video": player_video if player_video else None
-        }
+        reason = "timeout" if isinstance(e, asyncio.TimeoutError) else "error"
+        logger.warning(f"Streaming coaching for {video_id} fell back ({reason}): {str(e)}")
+        fallback = rule_based_feedback(context)
+        yield "fallback", {"text": fallback, "reason": reason}
+        publish_progress(video_id, "feedback_ready", source="fallback")
+        yield "done", {**_feedback_response(context, fallback), "source": "fallback"}
+        return
+
+    response_text = "".join(parts)
+    feedback_cache.put(context["cache_key"], response_text)
+    publish_progress(video_id, "feedback_ready", source="model")
+    yield "done", {**_feedback_response(context, response_text), "source": "model"}
+
+async def batch_coaching_feedback(video_ids: list, concurrency: int = BATCH_CONCURRENCY):
+    """
+    Async generator of per-video results for a batch, in completion order.
+    All video documents are read in one round trip, then at most
+    concurrency responses are generated at a time. Each result is
+    {"video_id", "feedback"} or {"video_id", "error"}.
+    """
+    video_ids = list(dict.fromkeys(video_ids))
+    documents = await run_in_threadpool(get_video_documents, video_ids)
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def coach(video_id):
+        data = documents.get(video_id)
+        if data is None:
+            return {"video_id": video_id, "error": f"No video found for ID: {video_id}"}
+        async with semaphore:
+            try:
+                feedback = await run_in_threadpool(generate_coaching_feedback, video_id, data)
+                return {"video_id": video_id, "feedback": feedback}
+            except Exception as e:
+                return {"video_id": video_id, "error": str(e)}
+
+    tasks = [asyncio.create_task(coach(video_id)) for video_id in video_ids]
+    try:
+        for finished in asyncio.as_completed(tasks):
+            yield await finished
+    finally:
+        for task in tasks:
+            task.cancel()
+
+def _question_prompt(video_id: str, question: str) -> str:
+    return f"Video ID: {video_id}\nQuestion: {question}\nRespond as a professional baseball coach with references to biomechanics, MLB guidelines, and professional coaching techniques."
 
 def ask_gemini(video_id: str, question: str) -> str:
     """Uses Gemini API to provide AI-based coaching insights."""
-    prompt = f"Video ID: {video_id}\nQuestion: {question}\nRespond as a professional baseball coach with references to biomechanics, MLB guidelines, and professional coaching techniques."
+    prompt = _question_prompt(video_id, question)
     
     try:
-        model = genai.GenerativeModel("gemini-pro")
-        response = model.generate_content(prompt)
-        return response.text
+        return generate_text(prompt)
     except Exception as e:
-        return f"An error occurred while processing your question: {str(e)}"
\ No newline at end of file
+        return f"An error occurred while processing your question: {str(e)}"
+
+def _question_fallback(video_id: str) -> str:
+    try:
+        return rule_based_feedback(build_coaching_context(video_id))
+    except ValueError:
+        return "The coach could not answer in time. Please try again in a moment."
+
+async def stream_answer(video_id: str, question: str, first_token_seconds: float = FIRST_TOKEN_SECONDS,
+                        budget_seconds: float = STREAM_BUDGET_SECONDS):
+    """
+    Async generator of (event, data) pairs for a streamed answer, with the
+    same "token" / "fallback" / "done" events as stream_coaching_feedback.
+    The fallback is the video's rule-based feedback when it has an analysis.
+    """
+    parts = []
+    try:
+        chunks = stream_text(_question_prompt(video_id, question))
+        async for text in stream_with_budget(chunks, first_token_seconds, budget_seconds):
+            parts.append(text)
+            yield "token", {"text": text}
+    except Exception as e:
+        reason = "timeout" if isinstance(e, asyncio.TimeoutError) else "error"
+        logger.warning(f"Streaming answer for {video_id} fell back ({reason}): {str(e)}")
+        fallback = await run_in_threadpool(_question_fallback, video_id)
+        yield "fallback", {"text": fallback, "reason": reason}
+        yield "done", {"answer": fallback, "source": "fallback"}
+        return
+
+    yield "done", {"answer": "".join(parts), "source": "model"}
@@ -0,0 +1,165 @@
+import os
+import queue
+import shutil
+import struct
+import tempfile
+import threading
+import time
+import logging
+
+logger = logging.getLogger(__name__)
+
+CHUNK_SIZE = 8 * 1024 * 1024
+PREFETCH_CHUNKS = 2
+
+# Containers that can be demuxed front to back without seeking
+STREAMABLE_EXTENSIONS = {"avi", "mkv", "webm"}
+# MP4/MOV are only streamable when the moov atom precedes mdat ("faststart")
+ISO_BMFF_EXTENSIONS = {"mp4", "mov", "m4v"}
+
+def read_range(blob, start: int, end: int) -> bytes:
+    """Reads bytes [start, end) of a blob with a ranged request."""
+    return blob.download_as_bytes(start=start, end=end - 1)
+
+def has_faststart(blob, size: int) -> bool:
+    """Walks the top-level ISO-BMFF boxes with ranged reads of their headers."""
+    offset = 0
+    while offset + 8 <= size:
+        header = read_range(blob, offset, min(offset + 16, size))
+        box_size, box_type = struct.unpack(">I4s", header[:8])
+        if box_type == b"moov":
+            return True
+        if box_type == b"mdat":
+            return False
+
+        if box_size == 1 and len(header) >= 16:
+            box_size = struct.unpack(">Q", header[8:16])[0]
+        if box_size < 8:
+            return False  # Size 0 runs to the end of the file; anything else is malformed
+        offset += box_size
+    return False
+
+def is_streamable(blob, file_name: str) -> bool:
+    """Checks whether the video can be decoded while it is still downloading."""
+    extension = file_name.rsplit(".", 1)[-1].lower() if "." in file_name else ""
+    if extension in STREAMABLE_EXTENSIONS:
+        return True
+    if extension in ISO_BMFF_EXTENSIONS:
+        return has_faststart(blob, blob.size or 0)
+    return False
+
+class BlobPipe:
+    """
+    Streams a blob into a named pipe so a VideoCapture can decode it while the
+    rest of the file is still downloading, without a temp copy of the file.
+
+    A fetcher thread reads the blob in ranged chunks into a small bounded queue
+    and a writer thread drains it into the pipe. Use as a context manager; it
+    yields the pipe path and raises on exit if the download failed. With
+    copy_to, the writer also saves the bytes to that file; complete tells
+    whether the whole blob made it there.
+    """
+    def __init__(self, blob, chunk_size: int = CHUNK_SIZE, prefetch: int = PREFETCH_CHUNKS, copy_to: str = None):
+        self.blob = blob
+        self.copy_to = copy_to
+        self.chunk_size = chunk_size
+        self.chunks = queue.Queue(maxsize=prefetch)
+        self.closed = threading.Event()
+        self.error = None
+        self.bytes_written = 0
+        self.bytes_copied = 0
+
+    @property
+    def complete(self) -> bool:
+        return self.copy_to is not None and self.error is None and self.bytes_copied == self.blob.size
+
+    def __enter__(self) -> str:
+        if self.blob.size is None:
+            self.blob.reload()
+        self.tmp_dir = tempfile.mkdtemp(prefix="blobpipe-")
+        self.path = os.path.join(self.tmp_dir, "video")
+        os.mkfifo(self.path)
+
+        self.fetcher = threading.Thread(target=self._fetch, daemon=True)
+        self.writer = threading.Thread(target=self._write, daemon=True)
+        self.fetcher.start()
+        self.writer.start()
+        return self.path
+
+    def __exit__(self, exc_type, exc, tb):
+        self.closed.set()
+        self._drain()
+        self.fetcher.join(timeout=5)
+        self.writer.join(timeout=5)
+        shutil.rmtree(self.tmp_dir, ignore_errors=True)
+
+        if exc_type is None and self.error is not None:
+            raise ValueError(f"Error streaming video: {str(self.error)}")
+        return False
+
+    def _fetch(self):
+        try:
+            for start in range(0, self.blob.size, self.chunk_size):
+                if self.closed.is_set():
+                    break
+                end = min(start + self.chunk_size, self.blob.size)
+                self._put(read_range(self.blob, start, end))
+        except Exception as e:
+            logger.error(f"Error fetching {self.blob.name}: {str(e)}")
+            self.error = e
+        finally:
+            self._put(None)
+
+    def _put(self, item):
+        while not self.closed.is_set():
+            try:
+                self.chunks.put(item, timeout=0.1)
+                return
+            except queue.Full:
+                continue
+
+    def _drain(self):
+        try:
+            while True:
+                self.chunks.get_nowait()
+        except queue.Empty:
+            pass
+
+    def _open_writer(self):
+        # A non-blocking open fails until the reader has opened the pipe
+        while not self.closed.is_set():
+            try:
+                fd = os.open(self.path, os.O_WRONLY | os.O_NONBLOCK)
+                os.set_blocking(fd, True)
+                return fd
+            except OSError:
+                time.sleep(0.05)
+        return None
+
+    def _write(self):
+        fd = self._open_writer()
+        if fd is None:
+            return
+        copy = open(self.copy_to, "wb") if self.copy_to else None
+        try:
+            with os.fdopen(fd, "wb") as pipe:
+                while True:
+                    try:
+                        data = self.chunks.get(timeout=0.1)
+                    except queue.Empty:
+                        if self.closed.is_set():
+                            break
+                        continue
+                    if data is None:
+                        break
+                    if copy:
+                        copy.write(data)
+                        self.bytes_copied += len(data)
+                    pipe.write(data)
+                    self.bytes_written += len(data)
+        except BrokenPipeError:
+            pass  # The reader stopped before the end of the video
+        finally:
+            if copy:
+                copy.close()
+            self.closed.set()
@@ -0,0 +1,512 @@
+import json
+import logging
+import os
+import random
+import socket
+import sqlite3
+import threading
+import time
+from uuid import uuid4
+
+logger = logging.getLogger(__name__)
+
+# Lower value is claimed first
+LANES = {"interactive": 0, "bulk": 1}
+
+JOB_COLLECTION = "analysis_jobs"
+DEFAULT_WORKERS = int(os.getenv("ANALYSIS_WORKERS", "2"))
+DEFAULT_MAX_ATTEMPTS = 3
+LEASE_SECONDS = 15 * 60
+
+def new_job(video_id: str, lane: str = "interactive", max_attempts: int = DEFAULT_MAX_ATTEMPTS) -> dict:
+    if lane not in LANES:
+        raise ValueError(f"Unknown job lane: {lane}")
+    now = time.time()
+    return {
+        "job_id": str(uuid4()),
+        "video_id": video_id,
+        "lane": lane,
+        "priority": LANES[lane],
+        "status": "queued",
+        "attempts": 0,
+        "max_attempts": max_attempts,
+        "next_run_at": now,
+        "queued_at": now,
+        "started_at": None,
+        "finished_at": None,
+        "lease_until": None,
+        "worker": None,
+        "error": None
+    }
+
+class SQLiteJobStore:
+    """
+    Job store backed by SQLite, the local stand-in for FirestoreJobStore.
+    Use ":memory:" for a throwaway queue or a file path to survive restarts.
+    """
+    def __init__(self, path: str = ":memory:"):
+        self.lock = threading.Lock()
+        self.db = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self.db.execute("""
+            CREATE TABLE IF NOT EXISTS jobs (
+                job_id TEXT PRIMARY KEY,
+                status TEXT,
+                priority INTEGER,
+                next_run_at REAL,
+                lease_until REAL,
+                data TEXT
+            )
+        """)
+        self.db.execute("CREATE INDEX IF NOT EXISTS jobs_ready ON jobs (status, priority, next_run_at)")
+
+    def _save(self, job: dict):
+        self.db.execute(
+            "INSERT OR REPLACE INTO jobs VALUES (?, ?, ?, ?, ?, ?)",
+            (job["job_id"], job["status"], job["priority"], job["next_run_at"],
+             job["lease_until"], json.dumps(job))
+        )
+
+    def enqueue(self, job: dict):
+        with self.lock:
+            self._save(job)
+
+    def claim(self, lease_seconds: float = LEASE_SECONDS, worker: str = None):
+        """
+        Atomically takes the next ready job: queued jobs whose retry time has
+        come, or running jobs whose lease expired because their worker died.
+        The job's lease is held by worker until it is renewed or released.
+        """
+        now = time.time()
+        with self.lock:
+            self.db.execute("BEGIN IMMEDIATE")
+            try:
+                row = self.db.execute(
+                    """
+                    SELECT data FROM jobs
+                    WHERE (status = 'queued' AND next_run_at <= ?)
+                       OR (status = 'running' AND lease_until < ?)
+                    ORDER BY priority, next_run_at
+                    LIMIT 1
+                    """,
+                    (now, now)
+                ).fetchone()
+                if row is None:
+                    self.db.execute("COMMIT")
+                    return None
+
+                job = json.loads(row[0])
+                job.update({
+                    "status": "running",
+                    "attempts": job["attempts"] + 1,
+                    "started_at": now,
+                    "lease_until": now + lease_seconds,
+                    "worker": worker
+                })
+                self._save(job)
+                self.db.execute("COMMIT")
+                return job
+            except Exception:
+                self.db.execute("ROLLBACK")
+                raise
+
+    def update(self, job: dict):
+        with self.lock:
+            self._save(job)
+
+    def renew(self, job_id: str, worker: str, lease_until: float) -> bool:
+        """
+        Extends a running job's lease so other workers do not reclaim it.
+        Returns False if the worker no longer holds the lease.
+        """
+        with self.lock:
+            cursor = self.db.execute(
+                """
+                UPDATE jobs SET lease_until = ?, data = json_set(data, '$.lease_until', ?)
+                WHERE job_id = ? AND status = 'running' AND json_extract(data, '$.worker') IS ?
+                """,
+                (lease_until, lease_until, job_id, worker)
+            )
+        return cursor.rowcount == 1
+
+    def _release(self, job: dict) -> bool:
+        with self.lock:
+            cursor = self.db.execute(
+                """
+                UPDATE jobs SET status = ?, priority = ?, next_run_at = ?, lease_until = ?, data = ?
+                WHERE job_id = ? AND status = 'running' AND json_extract(data, '$.worker') IS ?
+                """,
+                (job["status"], job["priority"], job["next_run_at"], job["lease_until"], json.dumps(job),
+                 job["job_id"], job["worker"])
+            )
+        return cursor.rowcount == 1
+
+    def complete(self, job: dict) -> bool:
+        """Writes a finished job, unless its worker lost the lease to another; returns whether it did."""
+        return self._release(job)
+
+    def fail(self, job: dict) -> bool:
+        """Writes a failed (or requeued) job, unless its worker lost the lease to another."""
+        return self._release(job)
+
+    def promote(self, job_id: str, lane: str) -> bool:
+        """Moves a still queued job up to a faster lane; returns False if it was claimed or is already there."""
+        priority = LANES[lane]
+        with self.lock:
+            cursor = self.db.execute(
+                """
+                UPDATE jobs SET priority = ?, data = json_set(data, '$.lane', ?, '$.priority', ?)
+                WHERE job_id = ? AND status = 'queued' AND priority > ?
+                """,
+                (priority, lane, priority, job_id, priority)
+            )
+        return cursor.rowcount == 1
+
+    def get(self, job_id: str):
+        with self.lock:
+            row = self.db.execute("SELECT data FROM jobs WHERE job_id = ?", (job_id,)).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def find_active(self, video_id: str):
+        """Returns a queued or running job for the video, if there is one."""
+        with self.lock:
+            row = self.db.execute(
+                """
+                SELECT data FROM jobs
+                WHERE status IN ('queued', 'running') AND json_extract(data, '$.video_id') = ?
+                ORDER BY priority, next_run_at
+                LIMIT 1
+                """,
+                (video_id,)
+            ).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def counts(self) -> dict:
+        with self.lock:
+            rows = self.db.execute("SELECT status, COUNT(*) FROM jobs GROUP BY status").fetchall()
+        return dict(rows)
+
+class FirestoreJobStore:
+    """
+    Job store backed by a Firestore collection, so queued work survives the
+    instance scaling down. Claims run in a transaction; the ready-job query
+    needs a composite index on (status, priority, next_run_at).
+    """
+    def __init__(self, collection_name: str = JOB_COLLECTION):
+        from google.cloud import firestore
+        from ..config import firestore_client
+
+        self.firestore = firestore
+        self.client = firestore_client
+        self.collection = firestore_client.collection(collection_name)
+
+    def enqueue(self, job: dict):
+        self.collection.document(job["job_id"]).set(job)
+
+    def claim(self, lease_seconds: float = LEASE_SECONDS, worker: str = None):
+        now = time.time()
+        ready = (
+            self.collection
+            .where(filter=self.firestore.FieldFilter("status", "==", "queued"))
+            .where(filter=self.firestore.FieldFilter("next_run_at", "<=", now))
+            .order_by("priority")
+            .order_by("next_run_at")
+            .limit(5)
+        )
+        expired = (
+            self.collection
+            .where(filter=self.firestore.FieldFilter("status", "==", "running"))
+            .where(filter=self.firestore.FieldFilter("lease_until", "<", now))
+            .limit(5)
+        )
+
+        for doc in list(ready.stream()) + list(expired.stream()):
+            job = self._claim_doc(self.client.transaction(), doc.reference, now, lease_seconds, worker)
+            if job:
+                return job
+        return None
+
+    def _claim_doc(self, transaction, doc_ref, now, lease_seconds, worker):
+        @self.firestore.transactional
+        def claim_in_transaction(transaction):
+            snapshot = doc_ref.get(transaction=transaction)
+            job = snapshot.to_dict() if snapshot.exists else None
+            if not job:
+                return None
+
+            claimable = job["status"] == "queued" and job["next_run_at"] <= now
+            expired = job["status"] == "running" and (job.get("lease_until") or 0) < now
+            if not (claimable or expired):
+                return None  # Another worker got it first
+
+            job.update({
+                "status": "running",
+                "attempts": job["attempts"] + 1,
+                "started_at": now,
+                "lease_until": now + lease_seconds,
+                "worker": worker
+            })
+            transaction.set(doc_ref, job)
+            return job
+
+        return claim_in_transaction(transaction)
+
+    def update(self, job: dict):
+        self.collection.document(job["job_id"]).set(job)
+
+    def _update_if(self, job_id: str, check, fields) -> bool:
+        """Applies fields (a dict, or a function of the job) in a transaction if check(job) holds."""
+        doc_ref = self.collection.document(job_id)
+
+        @self.firestore.transactional
+        def update_in_transaction(transaction):
+            snapshot = doc_ref.get(transaction=transaction)
+            job = snapshot.to_dict() if snapshot.exists else None
+            if not job or not check(job):
+                return False
+            transaction.update(doc_ref, fields)
+            return True
+
+        return update_in_transaction(self.client.transaction())
+
+    def _owns(self, job: dict, worker: str) -> bool:
+        return job["status"] == "running" and job.get("worker") == worker
+
+    def renew(self, job_id: str, worker: str, lease_until: float) -> bool:
+        return self._update_if(job_id, lambda job: self._owns(job, worker), {"lease_until": lease_until})
+
+    def complete(self, job: dict) -> bool:
+        return self._update_if(job["job_id"], lambda stored: self._owns(stored, job["worker"]), job)
+
+    def fail(self, job: dict) -> bool:
+        return self._update_if(job["job_id"], lambda stored: self._owns(stored, job["worker"]), job)
+
+    def promote(self, job_id: str, lane: str) -> bool:
+        priority = LANES[lane]
+        return self._update_if(job_id, lambda job: job["status"] == "queued" and job["priority"] > priority,
+                               {"lane": lane, "priority": priority})
+
+    def get(self, job_id: str):
+        doc = self.collection.document(job_id).get()
+        return doc.to_dict() if doc.exists else None
+
+    def find_active(self, video_id: str):
+        query = (
+            self.collection
+            .where(filter=self.firestore.FieldFilter("video_id", "==", video_id))
+            .where(filter=self.firestore.FieldFilter("status", "in", ["queued", "running"]))
+            .limit(1)
+        )
+        for doc in query.stream():
+            return doc.to_dict()
+        return None
+
+    def counts(self) -> dict:
+        counts = {}
+        for status in ("queued", "running", "succeeded", "failed"):
+            query = self.collection.where(filter=self.firestore.FieldFilter("status", "==", status))
+            counts[status] = query.count().get()[0][0].value
+        return counts
+
+def update_video_job_fields(job: dict):
+    """Mirrors a job's status and timings onto its videos document."""
+    from ..config import firestore_client
+
+    fields = {
+        "job": {
+            "job_id": job["job_id"],
+            "lane": job["lane"],
+            "status": job["status"],
+            "attempts": job["attempts"],
+            "queued_at": job["queued_at"],
+            "started_at": job["started_at"],
+            "finished_at": job["finished_at"],
+            "queue_seconds": job["started_at"] - job["queued_at"] if job["started_at"] else None,
+            "run_seconds": job["finished_at"] - job["started_at"] if job["finished_at"] and job["started_at"] else None,
+            "error": job["error"]
+        }
+    }
+    if job["status"] in ("queued", "running"):
+        fields["status"] = "processing"
+    firestore_client.collection("videos").document(job["video_id"]).update(fields)
+
+def record_job_update(job: dict):
+    """Publishes queue transitions to progress subscribers, then mirrors the job onto its video."""
+    from .progress_broker import publish_progress
+
+    if job["status"] == "queued":
+        if job["error"]:
+            publish_progress(job["video_id"], "retrying", attempts=job["attempts"],
+                             next_run_at=job["next_run_at"], error=job["error"])
+        else:
+            publish_progress(job["video_id"], "queued", job_id=job["job_id"], lane=job["lane"])
+    update_video_job_fields(job)
+
+class JobQueue:
+    """
+    Durable analysis queue drained by a fixed-size pool of worker threads.
+
+    Workers claim jobs from the store by lane priority (interactive before
+    bulk). A failed job is retried with exponential backoff and jitter until
+    max_attempts, and every state change is passed to on_update, which by
+    default publishes queue progress and writes the job's status and timings
+    to its videos document. While a job runs, its worker renews the lease
+    every lease_seconds / 3, so long analyses are not claimed twice; a
+    worker that lost its lease anyway does not overwrite the new attempt.
+    """
+    def __init__(self, store, handler, workers: int = DEFAULT_WORKERS, poll_interval: float = 1.0,
+                 backoff_base: float = 5.0, backoff_max: float = 300.0, on_update=record_job_update,
+                 lease_seconds: float = LEASE_SECONDS):
+        self.store = store
+        self.lease_seconds = lease_seconds
+        self.handler = handler
+        self.workers = workers
+        self.poll_interval = poll_interval
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.on_update = on_update
+        self.threads = []
+        # Lease owner names are unique across instances sharing a Firestore store
+        self.worker_prefix = f"{socket.gethostname()}:{os.getpid()}"
+        self.stopping = threading.Event()
+        self.wakeup = threading.Event()
+        self.start_lock = threading.Lock()
+        self.enqueue_lock = threading.Lock()
+
+    def start(self):
+        with self.start_lock:
+            if self.threads:
+                return
+            self.stopping.clear()
+            for i in range(self.workers):
+                thread = threading.Thread(target=self._run, name=f"analysis-worker-{i}", daemon=True)
+                thread.start()
+                self.threads.append(thread)
+            logger.info(f"Started {self.workers} analysis workers")
+
+    def stop(self, timeout: float = None):
+        self.stopping.set()
+        self.wakeup.set()
+        for thread in self.threads:
+            thread.join(timeout)
+        self.threads = []
+
+    def enqueue(self, video_id: str, lane: str = "interactive", max_attempts: int = DEFAULT_MAX_ATTEMPTS) -> dict:
+        job = new_job(video_id, lane, max_attempts)
+        self.store.enqueue(job)
+        self._notify(job)
+        self.wakeup.set()
+        logger.info(f"Queued {lane} analysis job {job['job_id']} for video {video_id}")
+        return job
+
+    def ensure_job(self, video_id: str, lane: str = "interactive") -> dict:
+        """
+        Returns the video's queued or running job, enqueueing one when there is
+        none. A queued job in a slower lane is moved up to this one.
+        """
+        if lane not in LANES:
+            raise ValueError(f"Unknown job lane: {lane}")
+        with self.enqueue_lock:
+            job = self.store.find_active(video_id)
+            if job is None:
+                return self.enqueue(video_id, lane)
+            # Conditional on the job still being queued, so a worker claiming it meanwhile is not undone
+            if job["priority"] > LANES[lane] and self.store.promote(job["job_id"], lane):
+                job.update({"lane": lane, "priority": LANES[lane]})
+                self.wakeup.set()
+        return job
+
+    def _notify(self, job: dict):
+        if self.on_update is None:
+            return
+        try:
+            self.on_update(job)
+        except Exception as e:
+            logger.error(f"Error recording job status for {job['video_id']}: {str(e)}")
+
+    def _backoff(self, attempts: int) -> float:
+        delay = min(self.backoff_base * 2 ** (attempts - 1), self.backoff_max)
+        return delay * random.uniform(0.8, 1.2)
+
+    def _run(self):
+        worker = f"{self.worker_prefix}:{threading.current_thread().name}"
+        while not self.stopping.is_set():
+            try:
+                job = self.store.claim(self.lease_seconds, worker)
+            except Exception as e:
+                logger.error(f"Error claiming analysis job: {str(e)}")
+                job = None
+
+            if job is None:
+                self.wakeup.wait(self.poll_interval)
+                self.wakeup.clear()
+                continue
+
+            self._execute(job)
+
+    def _heartbeat(self, job: dict, finished: threading.Event):
+        while not finished.wait(self.lease_seconds / 3):
+            lease_until = time.time() + self.lease_seconds
+            try:
+                if not self.store.renew(job["job_id"], job["worker"], lease_until):
+                    logger.warning(f"Job {job['job_id']} lost its lease to another worker")
+                    return
+                job["lease_until"] = lease_until
+            except Exception as e:
+                logger.error(f"Error renewing lease of job {job['job_id']}: {str(e)}")
+
+    def _execute(self, job: dict):
+        self._notify(job)
+        finished = threading.Event()
+        heartbeat = threading.Thread(target=self._heartbeat, args=(job, finished),
+                                     name=f"lease-{job['job_id']}", daemon=True)
+        heartbeat.start()
+        try:
+            self.handler(job["video_id"])
+            job.update({"status": "succeeded", "error": None})
+        except Exception as e:
+            job["error"] = str(e)
+            if job["attempts"] < job["max_attempts"]:
+                delay = self._backoff(job["attempts"])
+                job.update({"status": "queued", "next_run_at": time.time() + delay})
+                logger.warning(f"Job {job['job_id']} failed (attempt {job['attempts']}), retrying in {delay:.1f}s: {str(e)}")
+            else:
+                job["status"] = "failed"
+                logger.error(f"Job {job['job_id']} failed after {job['attempts']} attempts: {str(e)}")
+
+        # Stop renewing before the final write, so a late renewal cannot follow it
+        finished.set()
+        heartbeat.join()
+        job["lease_until"] = None
+        if job["status"] != "queued":
+            job["finished_at"] = time.time()
+        release = self.store.complete if job["status"] == "succeeded" else self.store.fail
+        if not release(job):
+            # The lease expired and another worker reclaimed the job; its result stands
+            logger.warning(f"Job {job['job_id']} was reclaimed by another worker; dropping this attempt's result")
+            return
+        self._notify(job)
+
+_job_queue = None
+_job_queue_lock = threading.Lock()
+
+def create_job_store():
+    """Firestore on Cloud Run (or JOB_STORE=firestore), SQLite everywhere else."""
+    backend = os.getenv("JOB_STORE", "firestore" if os.getenv("K_SERVICE") else "sqlite")
+    if backend == "firestore":
+        return FirestoreJobStore()
+    return SQLiteJobStore(os.getenv("JOB_DB_PATH", ":memory:"))
+
+def get_job_queue() -> JobQueue:
+    """Returns the process-wide analysis queue, creating and starting it on first use."""
+    global _job_queue
+    with _job_queue_lock:
+        if _job_queue is None:
+            from .analysis_service import analyze_video
+            _job_queue = JobQueue(create_job_store(), analyze_video)
+        _job_queue.start()
+        return _job_queue
+
+def shutdown_job_queue(timeout: float = 5.0):
+    """Stops the workers of the process-wide queue, if it was started."""
+    if _job_queue is not None:
+        _job_queue.stop(timeout)
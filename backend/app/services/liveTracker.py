@@ -0,0 +1,201 @@
+import os
+import time
+import cv2
+import numpy as np
+from .advancedTracker import BaseballTracker
+from .motionGate import MotionGate
+
+# Processing time allowed per live frame; slower frames shrink the detection scale
+LIVE_FRAME_BUDGET_MS = float(os.getenv("LIVE_FRAME_BUDGET_MS", "33"))
+# Detection scales stepped through as frames run over or well under budget
+LIVE_SCALES = (1.0, 0.75, 0.5)
+# Weight of the newest frame in the smoothed processing time
+LATENCY_SMOOTHING = 0.2
+
+FRAME_FORMATS = ("jpeg", "bgr")
+MAX_FRAME_PIXELS = 1920 * 1080
+MAX_FPS = 1000
+
+class TrajectoryFit:
+    """
+    Least-squares quadratic fit of the ball path, updated in constant time
+    per point from running power sums. Matches _analyze_trajectory on the
+    same points: the fit is taken relative to the first point, so its
+    linear coefficient is the initial slope, and exit velocity comes from
+    the running mean of the distance between consecutive points.
+    """
+    def __init__(self, fps: float):
+        self.fps = fps
+        self.count = 0
+        self.origin = None
+        self.previous = None
+        self.distance = 0.0
+        self.power_sums = np.zeros(5)   # sum of u**k for k = 0..4
+        self.moment_sums = np.zeros(3)  # sum of v * u**k for k = 0..2
+
+    def add(self, x: float, y: float):
+        if self.origin is None:
+            self.origin = (x, y)
+        else:
+            self.distance += np.hypot(x - self.previous[0], y - self.previous[1])
+        self.previous = (x, y)
+        self.count += 1
+
+        u, v = x - self.origin[0], y - self.origin[1]
+        powers = u ** np.arange(5)
+        self.power_sums += powers
+        self.moment_sums += v * powers[:3]
+
+    def result(self):
+        """Launch angle and exit velocity, or None until there are enough points."""
+        if self.count <= 3:
+            return None
+        s = self.power_sums
+        normal = np.array([[s[4], s[3], s[2]], [s[3], s[2], s[1]], [s[2], s[1], s[0]]])
+        coeffs = np.linalg.lstsq(normal, self.moment_sums[::-1], rcond=None)[0]
+        return {
+            'launch_angle': float(np.degrees(np.arctan(coeffs[1]))),
+            'exit_velocity': float(self.distance / (self.count - 1) * self.fps * BaseballTracker.VELOCITY_CONVERSION)
+        }
+
+def decode_frame(data: bytes, frame_format: str = "jpeg", width: int = None, height: int = None) -> np.ndarray:
+    """Decodes one live frame, a JPEG image or raw BGR24 pixels, into a BGR array."""
+    if frame_format == "jpeg":
+        frame = cv2.imdecode(np.frombuffer(data, np.uint8), cv2.IMREAD_COLOR)
+        if frame is None:
+            raise ValueError("Frame is not a valid JPEG image.")
+        if frame.shape[0] * frame.shape[1] > MAX_FRAME_PIXELS:
+            raise ValueError(f"Frames may have at most {MAX_FRAME_PIXELS} pixels.")
+        return frame
+
+    if len(data) != width * height * 3:
+        raise ValueError(f"Raw frames must be {width}x{height} BGR24 ({width * height * 3} bytes).")
+    return np.frombuffer(data, np.uint8).reshape(height, width, 3)
+
+class LiveSwingTracker:
+    """
+    Tracks a swing from frames that arrive one at a time, e.g. from a camera
+    over a WebSocket. The motion gate and trajectory fit carry over between
+    frames, so each frame costs one detection and a constant-time fit update,
+    and every frame yields a provisional launch angle and exit velocity.
+
+    When the smoothed processing time goes over frame_budget_ms, detection
+    moves to the next smaller scale in LIVE_SCALES, and back up once frames
+    take under half the budget. Positions are always in full-frame pixels.
+    """
+    def __init__(self, fps: float = 30.0, frame_format: str = "jpeg", width: int = None, height: int = None,
+                 motion_gate: bool = True, frame_budget_ms: float = LIVE_FRAME_BUDGET_MS):
+        self.fps = fps
+        self.frame_format = frame_format
+        self.width = width
+        self.height = height
+        self.motion_gate = motion_gate
+        self.frame_budget_ms = frame_budget_ms
+        self.detector = BaseballTracker(None, probe=False)
+        self.detector.fps = fps
+        self.scale_index = 0
+        self.reset()
+
+    @classmethod
+    def from_options(cls, options: dict, **kwargs):
+        """Builds a tracker from a client's start message, validating it."""
+        fps = options.get("fps", 30)
+        frame_format = options.get("format", "jpeg")
+        width, height = options.get("width"), options.get("height")
+        if not isinstance(fps, (int, float)) or not 0 < fps <= MAX_FPS:
+            raise ValueError(f"fps must be between 0 and {MAX_FPS}.")
+        if frame_format not in FRAME_FORMATS:
+            raise ValueError(f"format must be one of: {', '.join(FRAME_FORMATS)}.")
+        if frame_format == "bgr":
+            if not all(isinstance(value, int) and value > 0 for value in (width, height)):
+                raise ValueError("Raw frames need a positive integer width and height.")
+            if width * height > MAX_FRAME_PIXELS:
+                raise ValueError(f"Frames may have at most {MAX_FRAME_PIXELS} pixels.")
+        return cls(float(fps), frame_format, width, height, **kwargs)
+
+    @property
+    def scale(self) -> float:
+        return LIVE_SCALES[self.scale_index]
+
+    def reset(self):
+        """Starts a new swing, keeping the detection scale."""
+        self.fit = TrajectoryFit(self.fps)
+        self.gate = MotionGate() if self.motion_gate else None
+        self.positions = []
+        self.frame_indices = []
+        self.frames = 0
+        self.frame_shape = None
+        self.latency_ms = None
+
+    def process_bytes(self, data: bytes, frame_index: int = None) -> dict:
+        start = time.perf_counter()
+        frame = decode_frame(data, self.frame_format, self.width, self.height)
+        return self.process(frame, frame_index, start)
+
+    def process(self, frame: np.ndarray, frame_index: int = None, start: float = None) -> dict:
+        """
+        Detects the ball in the next frame and updates the fit. Returns the
+        detection, the provisional result (None until four points are seen)
+        and the time spent on this frame. A frame of a new size starts a new
+        swing, as earlier positions and the gate's last frame no longer line up.
+        """
+        start = start or time.perf_counter()
+        restarted = self.frame_shape is not None and frame.shape != self.frame_shape
+        if restarted:
+            self.reset()
+        self.frame_shape = frame.shape
+        frame_index = self.frames if frame_index is None else frame_index
+        self.frames += 1
+
+        scale = self.scale
+        if scale != 1.0:
+            frame = cv2.resize(frame, None, fx=scale, fy=scale, interpolation=cv2.INTER_AREA)
+        if self.gate is None:
+            detection = self.detector.detect_baseball(frame, scale=scale)
+        else:
+            region = self.gate.update(frame)
+            detection = self.detector._detect_region(frame, region, scale) if region is not None else None
+
+        position = None
+        if detection:
+            position = [detection[0] / scale, detection[1] / scale]
+            self.fit.add(*position)
+            self.positions.append(position)
+            self.frame_indices.append(frame_index)
+
+        elapsed_ms = (time.perf_counter() - start) * 1000
+        self._adapt(elapsed_ms)
+        return {
+            'frame': frame_index,
+            'position': position,
+            'points': self.fit.count,
+            'result': self.fit.result(),
+            'scale': scale,
+            'restarted': restarted,
+            'processing_ms': round(elapsed_ms, 2)
+        }
+
+    def _adapt(self, elapsed_ms: float):
+        if self.latency_ms is None:
+            self.latency_ms = elapsed_ms
+        else:
+            self.latency_ms += LATENCY_SMOOTHING * (elapsed_ms - self.latency_ms)
+
+        if self.latency_ms > self.frame_budget_ms and self.scale_index < len(LIVE_SCALES) - 1:
+            self.scale_index += 1
+        elif self.latency_ms < self.frame_budget_ms / 2 and self.scale_index > 0:
+            self.scale_index -= 1
+        else:
+            return
+        # Frame sizes change, so the gate starts over and the average is remeasured
+        if self.gate is not None:
+            self.gate.reset()
+        self.latency_ms = None
+
+    def summary(self) -> dict:
+        return {
+            'frames': self.frames,
+            'points': self.fit.count,
+            'frame_indices': list(self.frame_indices),
+            'result': self.fit.result()
+        }
@@ -0,0 +1,216 @@
+import os
+import json
+import asyncio
+import threading
+import time
+import hashlib
+import logging
+from collections import OrderedDict
+
+logger = logging.getLogger(__name__)
+
+MODEL_NAME = "gemini-pro"
+RESPONSE_CACHE_SIZE = int(os.getenv("LLM_CACHE_SIZE", "512"))
+RESPONSE_CACHE_TTL = float(os.getenv("LLM_CACHE_TTL", str(6 * 60 * 60)))
+
+class StubResponse:
+    """Mirrors the .text attribute of a Gemini response (or streamed chunk)."""
+    def __init__(self, text: str):
+        self.text = text
+
+class StubModel:
+    """
+    Offline stand-in for genai.GenerativeModel. Returns a deterministic answer
+    derived from the prompt after an optional delay, and counts its calls.
+    Select it with LLM_MODEL=stub or set_model_factory().
+    """
+    def __init__(self, model_name: str = MODEL_NAME, delay: float = 0.0, chunk_words: int = 8):
+        self.model_name = model_name
+        self.delay = delay
+        self.chunk_words = chunk_words
+        self.calls = 0
+
+    def _answer(self, prompt: str) -> str:
+        digest = hashlib.sha256(prompt.encode("utf-8")).hexdigest()[:12]
+        return (f"**Coaching Feedback** (offline model, prompt {digest})\n\n"
+                "- Keep your head still through contact and drive with your back leg.\n"
+                "- Track launch angle and exit velocity across sessions to measure progress.")
+
+    def generate_content(self, prompt: str, stream: bool = False):
+        self.calls += 1
+        if self.delay:
+            time.sleep(self.delay)
+        text = self._answer(prompt)
+        if not stream:
+            return StubResponse(text)
+
+        return (StubResponse(chunk) for chunk in self._chunks(text))
+
+    def _chunks(self, text: str):
+        words = text.split(" ")
+        for i in range(0, len(words), self.chunk_words):
+            yield " ".join(words[i:i + self.chunk_words]) + (" " if i + self.chunk_words < len(words) else "")
+
+    async def generate_content_async(self, prompt: str, stream: bool = False):
+        self.calls += 1
+        if self.delay:
+            await asyncio.sleep(self.delay)
+        text = self._answer(prompt)
+        if not stream:
+            return StubResponse(text)
+
+        async def chunks():
+            for chunk in self._chunks(text):
+                await asyncio.sleep(0)
+                yield StubResponse(chunk)
+        return chunks()
+
+def _gemini_model(model_name: str):
+    import google.generativeai as genai
+    genai.configure(api_key=os.getenv("GOOGLE_API_KEY"))
+    return genai.GenerativeModel(model_name)
+
+_model_factory = None
+
+def set_model_factory(factory):
+    """Overrides how models are created, e.g. lambda name: StubModel(name); None restores the default."""
+    global _model_factory
+    _model_factory = factory
+
+def get_model(model_name: str = MODEL_NAME):
+    if _model_factory is not None:
+        return _model_factory(model_name)
+    if os.getenv("LLM_MODEL") == "stub":
+        return StubModel(model_name)
+    return _gemini_model(model_name)
+
+class _Flight:
+    def __init__(self):
+        self.done = threading.Event()
+        self.value = None
+        self.error = None
+
+class ResponseCache:
+    """
+    Thread-safe LRU cache with a per-entry TTL and single-flight loading:
+    concurrent get_or_compute() calls for a missing key wait on the first
+    caller's computation instead of each calling upstream. Errors are passed
+    to every waiter and never cached.
+    """
+    def __init__(self, max_entries: int = RESPONSE_CACHE_SIZE, ttl_seconds: float = RESPONSE_CACHE_TTL,
+                 clock=time.monotonic):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.clock = clock
+        self.entries = OrderedDict()
+        self.in_flight = {}
+        self.lock = threading.Lock()
+        self.stats = {"hits": 0, "misses": 0, "coalesced": 0, "evictions": 0}
+
+    def get(self, key):
+        with self.lock:
+            return self._get(key)
+
+    def _get(self, key):
+        entry = self.entries.get(key)
+        if entry is None:
+            return None
+        value, expires_at = entry
+        if self.clock() >= expires_at:
+            del self.entries[key]
+            return None
+        self.entries.move_to_end(key)
+        return value
+
+    def put(self, key, value):
+        with self.lock:
+            self._put(key, value)
+
+    def _put(self, key, value):
+        self.entries[key] = (value, self.clock() + self.ttl_seconds)
+        self.entries.move_to_end(key)
+        while len(self.entries) > self.max_entries:
+            self.entries.popitem(last=False)
+            self.stats["evictions"] += 1
+
+    def get_or_compute(self, key, compute):
+        with self.lock:
+            value = self._get(key)
+            if value is not None:
+                self.stats["hits"] += 1
+                return value
+            flight = self.in_flight.get(key)
+            leader = flight is None
+            if leader:
+                flight = self.in_flight[key] = _Flight()
+                self.stats["misses"] += 1
+            else:
+                self.stats["coalesced"] += 1
+
+        if not leader:
+            flight.done.wait()
+            if flight.error is not None:
+                raise flight.error
+            return flight.value
+
+        try:
+            flight.value = compute()
+            with self.lock:
+                self._put(key, flight.value)
+            return flight.value
+        except Exception as e:
+            flight.error = e
+            raise
+        finally:
+            with self.lock:
+                self.in_flight.pop(key, None)
+            flight.done.set()
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+
+def generate_text(prompt: str, model_name: str = MODEL_NAME) -> str:
+    """Runs one non-streaming generation and returns its text."""
+    return get_model(model_name).generate_content(prompt).text
+
+async def stream_text(prompt: str, model_name: str = MODEL_NAME):
+    """
+    Yields the model's text as it is generated, using the async client so no
+    worker thread is held while waiting on the model.
+    """
+    response = await get_model(model_name).generate_content_async(prompt, stream=True)
+    async for chunk in response:
+        if chunk.text:
+            yield chunk.text
+
+async def stream_with_budget(chunks, first_item_seconds: float, total_seconds: float):
+    """
+    Re-yields an async iterator, raising asyncio.TimeoutError if the first
+    item takes longer than first_item_seconds or the whole stream longer than
+    total_seconds. The source iterator is closed either way.
+    """
+    loop = asyncio.get_running_loop()
+    deadline = loop.time() + total_seconds
+    iterator = chunks.__aiter__()
+    first = True
+    try:
+        while True:
+            timeout = deadline - loop.time()
+            if first:
+                timeout = min(timeout, first_item_seconds)
+            if timeout <= 0:
+                raise asyncio.TimeoutError()
+            try:
+                item = await asyncio.wait_for(iterator.__anext__(), timeout)
+            except StopAsyncIteration:
+                return
+            first = False
+            yield item
+    finally:
+        if hasattr(iterator, "aclose"):
+            await iterator.aclose()
+
+def format_sse(event: str, data) -> str:
+    """Formats one Server-Sent Events message with a JSON payload."""
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
@@ -0,0 +1,72 @@
+import cv2
+import numpy as np
+
+class MotionGate:
+    """
+    Cheap frame-difference gate for the tracker.
+
+    Each frame is compared with the previous one on a downscaled grayscale copy,
+    and the difference is summarized on a grid of tiles. Frames without moving
+    tiles are reported as static so the white-ball search can skip them, and for
+    moving frames the search is limited to the moving tiles. This also keeps
+    static white objects (uniforms, bases, lines) from producing candidates.
+    """
+    def __init__(self, tile_size=32, scale=4, pixel_threshold=25, tile_fraction=0.02):
+        self.tile_size = tile_size            # Tile edge in full-resolution pixels
+        self.scale = scale                    # Downscale factor for the difference image
+        self.pixel_threshold = pixel_threshold
+        self.tile_fraction = tile_fraction    # Share of changed pixels that marks a tile as moving
+        self.reset()
+
+    def reset(self):
+        self.previous = None
+        self.energy = 0.0
+        self.frames_seen = 0
+        self.frames_passed = 0
+
+    def update(self, frame):
+        """
+        Feeds the next frame of the video. The mean absolute difference to the
+        previous frame is kept in self.energy as a motion score.
+        Returns None for a static frame, otherwise ((x0, y0, x1, y1), mask) where
+        the box bounds the moving tiles and mask is a full-frame uint8 mask that
+        is 255 on moving tiles (grown by one tile to cover the ball's next step).
+        """
+        h, w = frame.shape[:2]
+        small = cv2.resize(frame, (max(w // self.scale, 1), max(h // self.scale, 1)),
+                           interpolation=cv2.INTER_AREA)
+        small = cv2.cvtColor(small, cv2.COLOR_BGR2GRAY)
+        small = cv2.GaussianBlur(small, (3, 3), 0)
+
+        previous, self.previous = self.previous, small
+        self.frames_seen += 1
+        if previous is None:
+            self.energy = 0.0
+            return None
+
+        difference = cv2.absdiff(small, previous)
+        self.energy = float(difference.mean())
+        moving = difference > self.pixel_threshold
+
+        # Fraction of changed pixels per tile, padding the edges to whole tiles.
+        # The grid covers the full-resolution frame, which the downscaled copy
+        # falls short of when h or w is not a multiple of scale.
+        tile = max(self.tile_size // self.scale, 1)
+        rows = max(-(-h // self.tile_size), -(-moving.shape[0] // tile))
+        cols = max(-(-w // self.tile_size), -(-moving.shape[1] // tile))
+        moving = np.pad(moving, ((0, rows * tile - moving.shape[0]), (0, cols * tile - moving.shape[1])))
+        activity = moving.reshape(rows, tile, cols, tile).mean(axis=(1, 3))
+
+        active = activity > self.tile_fraction
+        if not active.any():
+            return None
+
+        self.frames_passed += 1
+        active = cv2.dilate(active.astype(np.uint8), np.ones((3, 3), np.uint8))
+
+        ys, xs = np.nonzero(active)
+        x0, x1 = xs.min() * self.tile_size, min((xs.max() + 1) * self.tile_size, w)
+        y0, y1 = ys.min() * self.tile_size, min((ys.max() + 1) * self.tile_size, h)
+
+        mask = np.repeat(np.repeat(active * 255, self.tile_size, axis=0), self.tile_size, axis=1)
+        return (x0, y0, x1, y1), np.ascontiguousarray(mask[:h, :w], dtype=np.uint8)
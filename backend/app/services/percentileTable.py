@@ -0,0 +1,117 @@
+import numpy as np
+
+# Metrics with a sorted array per season, in PlayerData.metrics column order
+PERCENTILE_METRICS = ('LaunchAngle', 'ExitVelocity', 'HitDistance')
+ALL_SEASONS = 'all'
+
+# Joint grids use each axis's distinct values up to this many, else quantile bins
+MAX_GRID_EDGES = 1024
+
+class JointGrid:
+    """
+    Cumulative 2D histogram over (LaunchAngle, ExitVelocity): counts[i, j] is
+    the number of plays with LA <= la_edges[i] and EV <= ev_edges[j]. With
+    distinct values as edges the counts are exact; a lookup is two binary
+    searches.
+    """
+    def __init__(self, launch_angles: np.ndarray, exit_velocities: np.ndarray):
+        self.total = len(launch_angles)
+        self.la_edges = self._edges(launch_angles)
+        self.ev_edges = self._edges(exit_velocities)
+
+        la_bins = np.searchsorted(self.la_edges, launch_angles, side='left')
+        ev_bins = np.searchsorted(self.ev_edges, exit_velocities, side='left')
+        counts = np.zeros((len(self.la_edges), len(self.ev_edges)), dtype=np.int32)
+        np.add.at(counts, (la_bins, ev_bins), 1)
+        self.counts = counts.cumsum(axis=0).cumsum(axis=1)
+
+    @staticmethod
+    def _edges(values: np.ndarray) -> np.ndarray:
+        edges = np.unique(values)
+        if len(edges) > MAX_GRID_EDGES:
+            edges = np.unique(np.quantile(values, np.linspace(0, 1, MAX_GRID_EDGES)))
+        return edges
+
+    def at_or_below(self, launch_angle: float, exit_velocity: float) -> int:
+        i = np.searchsorted(self.la_edges, launch_angle, side='right') - 1
+        j = np.searchsorted(self.ev_edges, exit_velocity, side='right') - 1
+        if i < 0 or j < 0:
+            return 0
+        return int(self.counts[i, j])
+
+class PercentileTable:
+    """
+    Rank and percentile lookups for swing metrics against MLB home runs,
+    built once per reference dataset: a sorted array per metric and season
+    (plus all seasons combined) and a joint (LA, EV) grid per season. Every
+    query is O(log n).
+    """
+    def __init__(self, metrics: np.ndarray, seasons: np.ndarray):
+        self.sorted = {}
+        self.joint = {}
+        self.seasons = sorted(int(season) for season in np.unique(seasons))
+
+        groups = {season: seasons == season for season in self.seasons}
+        groups[ALL_SEASONS] = np.ones(len(seasons), dtype=bool)
+        for season, rows in groups.items():
+            for column, metric in enumerate(PERCENTILE_METRICS):
+                values = metrics[rows, column].astype(np.float64)
+                self.sorted[season, metric] = np.sort(values[~np.isnan(values)])
+
+            la_ev = metrics[rows, :2].astype(np.float64)
+            la_ev = la_ev[~np.isnan(la_ev).any(axis=1)]
+            self.joint[season] = JointGrid(la_ev[:, 0], la_ev[:, 1])
+
+    @property
+    def latest_season(self):
+        return self.seasons[-1] if self.seasons else ALL_SEASONS
+
+    def _season(self, season):
+        if season is None:
+            return self.latest_season
+        if season == ALL_SEASONS:
+            return season
+        season = int(season)
+        if season not in self.seasons:
+            raise ValueError(f"No MLB data for season {season}. Available: {', '.join(map(str, self.seasons))}")
+        return season
+
+    def percentile(self, metric: str, value: float, season=None) -> float:
+        """Share of plays below value (ties count half), from 0 to 100."""
+        values = self.sorted[self._season(season), metric]
+        if not len(values):
+            return None
+        below = np.searchsorted(values, value, side='left')
+        at_or_below = np.searchsorted(values, value, side='right')
+        return float(100.0 * (below + at_or_below) / (2 * len(values)))
+
+    def rank(self, metric: str, value: float, season=None) -> int:
+        """1 plus the number of plays with a strictly higher value."""
+        values = self.sorted[self._season(season), metric]
+        return int(len(values) - np.searchsorted(values, value, side='right') + 1)
+
+    def joint_percentile(self, launch_angle: float, exit_velocity: float, season=None) -> float:
+        """Share of plays with both launch angle and exit velocity at or below the given ones."""
+        grid = self.joint[self._season(season)]
+        if not grid.total:
+            return None
+        return float(100.0 * grid.at_or_below(launch_angle, exit_velocity) / grid.total)
+
+    def describe(self, launch_angle: float, exit_velocity: float, hit_distance: float = None, season=None) -> dict:
+        season = self._season(season)
+        values = {'LaunchAngle': launch_angle, 'ExitVelocity': exit_velocity, 'HitDistance': hit_distance}
+        metrics = {}
+        for metric, value in values.items():
+            if value is None:
+                continue
+            metrics[metric] = {
+                'value': value,
+                'percentile': self.percentile(metric, value, season),
+                'rank': self.rank(metric, value, season),
+                'total': int(len(self.sorted[season, metric]))
+            }
+        return {
+            'season': season,
+            'metrics': metrics,
+            'joint_percentile': self.joint_percentile(launch_angle, exit_velocity, season)
+        }
@@ -1,34 +1,330 @@
 import csv
+import glob
+import hashlib
+import json
 import os
+import sys
+import tempfile
+import logging
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+DATASET_DIR = os.path.join(os.path.dirname(__file__), '../../datasets')
+SEASON_PATTERN = '*-mlb-homeruns.csv'
+
+# Columns of the metric array and the metric index, in order
+INDEX_METRICS = ('LaunchAngle', 'ExitVelocity', 'HitDistance')
+
+# Bump when the cache layout changes
+CACHE_VERSION = 1
+CACHE_ALIGN = 64
+
+def season_files(dataset_dir=DATASET_DIR):
+    """All season CSVs in the dataset directory, oldest season first."""
+    return sorted(glob.glob(os.path.join(dataset_dir, SEASON_PATTERN)))
+
+class StringTable:
+    """
+    Immutable list of strings stored as one UTF-8 buffer plus offsets, so it
+    can live in (and be memory-mapped from) the binary cache.
+    """
+    def __init__(self, blob, offsets):
+        self.blob = blob
+        self.offsets = offsets
+
+    @classmethod
+    def from_strings(cls, strings):
+        encoded = [s.encode('utf-8') for s in strings]
+        offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+        np.cumsum([len(e) for e in encoded], out=offsets[1:])
+        blob = np.frombuffer(b''.join(encoded), dtype=np.uint8)
+        return cls(blob, offsets)
+
+    def __len__(self):
+        return len(self.offsets) - 1
+
+    def __getitem__(self, i):
+        return self.blob[self.offsets[i]:self.offsets[i + 1]].tobytes().decode('utf-8')
+
+    def __iter__(self):
+        return (self[i] for i in range(len(self)))
+
+class Interner:
+    """Assigns each distinct string a code, so repeated titles and URLs are stored once."""
+    def __init__(self):
+        self.codes = {}
+        self.strings = []
+
+    def add(self, value):
+        code = self.codes.get(value)
+        if code is None:
+            code = self.codes[value] = len(self.strings)
+            self.strings.append(sys.intern(value))
+        return code
 
 class PlayerData:
-    def __init__(self, filePath):
-        self.filePath = filePath
-        self.players_data = self._load_data()
+    """
+    Columnar store of the MLB home run datasets.
+
+    Metrics are one float32 (rows, 3) array in INDEX_METRICS order with NaN
+    for missing values; titles and video URLs are interned into string tables
+    referenced by int32 codes. The parsed columns are written to a binary
+    cache keyed by the CSV paths, and later instances (other workers, the next
+    cold start) memory-map it instead of re-parsing while the CSV mtimes and
+    sizes still match.
+    """
+    def __init__(self, filePath=None, cache_dir=None, use_cache=True):
+        if filePath is None:
+            filePaths = season_files()
+        elif isinstance(filePath, (str, os.PathLike)):
+            filePaths = [filePath]
+        else:
+            filePaths = list(filePath)
+        self.filePaths = [os.path.abspath(path) for path in filePaths]
+        self.cache_dir = cache_dir or os.getenv('PLAYER_DATA_CACHE_DIR') or os.path.join(DATASET_DIR, '.cache')
+        self.loaded_from_cache = False
+        self._row_by_id = None
+
+        columns = self._load_cache() if use_cache else None
+        if columns is None:
+            columns = self._load_data()
+            if use_cache:
+                self._write_cache(columns)
+        else:
+            self.loaded_from_cache = True
+
+        self.play_ids = StringTable(columns['play_id_blob'], columns['play_id_offsets'])
+        self.titles = StringTable(columns['title_blob'], columns['title_offsets'])
+        self.videos = StringTable(columns['video_blob'], columns['video_offsets'])
+        self.title_codes = columns['title_codes']
+        self.video_codes = columns['video_codes']
+        self.seasons = columns['seasons']
+        self.metrics = columns['metrics']
+        self._build_index()
 
     def _load_data(self):
-        players_data = {}
-        with open(self.filePath, mode='r') as file:
-            reader = csv.DictReader(file)
-            for row in reader:
-                player_id = row['play_id']
-                players_data[player_id] = {
-                    'title': row['title'],
-                    'ExitVelocity': row['ExitVelocity'],
-                    'HitDistance': row['HitDistance'],
-                    'LaunchAngle': row['LaunchAngle'],
-                    'video': row['video']
-                }
-        return players_data
+        play_ids, seen = [], set()
+        titles, videos = Interner(), Interner()
+        title_codes, video_codes, seasons, metrics = [], [], [], []
+
+        for path in self.filePaths:
+            season = os.path.basename(path).split('-', 1)[0]
+            season = int(season) if season.isdigit() else 0
+            with open(path, mode='r') as file:
+                reader = csv.DictReader(file)
+                for row in reader:
+                    player_id = row['play_id']
+                    if player_id in seen:
+                        continue  # The same play can appear in more than one file
+                    seen.add(player_id)
+
+                    values = []
+                    for metric in INDEX_METRICS:
+                        try:
+                            values.append(float(row[metric]))
+                        except (TypeError, ValueError):
+                            values.append(np.nan)
+
+                    play_ids.append(player_id)
+                    title_codes.append(titles.add(row['title'] or ''))
+                    video_codes.append(videos.add(row['video'] or ''))
+                    seasons.append(season)
+                    metrics.append(values)
+
+        play_id_table = StringTable.from_strings(play_ids)
+        title_table = StringTable.from_strings(titles.strings)
+        video_table = StringTable.from_strings(videos.strings)
+        return {
+            'play_id_blob': play_id_table.blob,
+            'play_id_offsets': play_id_table.offsets,
+            'title_blob': title_table.blob,
+            'title_offsets': title_table.offsets,
+            'video_blob': video_table.blob,
+            'video_offsets': video_table.offsets,
+            'title_codes': np.array(title_codes, dtype=np.int32),
+            'video_codes': np.array(video_codes, dtype=np.int32),
+            'seasons': np.array(seasons, dtype=np.int16),
+            'metrics': np.array(metrics, dtype=np.float32).reshape(-1, len(INDEX_METRICS))
+        }
+
+    def _sources(self):
+        sources = []
+        for path in self.filePaths:
+            stat = os.stat(path)
+            sources.append({'path': path, 'mtime_ns': stat.st_mtime_ns, 'size': stat.st_size})
+        return sources
+
+    def _cache_path(self):
+        key = hashlib.sha1('\n'.join(self.filePaths).encode('utf-8')).hexdigest()[:16]
+        return os.path.join(self.cache_dir, f'players-{key}.bin')
+
+    def _load_cache(self):
+        """
+        Maps the cache file if it was built from the current CSVs. The file is
+        an 8-byte header length, a JSON header and the arrays, each aligned so
+        it can be viewed straight out of the mapping.
+        """
+        path = self._cache_path()
+        try:
+            with open(path, 'rb') as file:
+                header_size = int.from_bytes(file.read(8), 'little')
+                header = json.loads(file.read(header_size))
+            if header['version'] != CACHE_VERSION or header['sources'] != self._sources():
+                return None
+
+            buffer = np.memmap(path, dtype=np.uint8, mode='r')
+            columns = {}
+            for name, spec in header['arrays'].items():
+                dtype = np.dtype(spec['dtype'])
+                count = int(np.prod(spec['shape'])) * dtype.itemsize
+                columns[name] = buffer[spec['offset']:spec['offset'] + count].view(dtype).reshape(spec['shape'])
+            return columns
+        except FileNotFoundError:
+            return None
+        except Exception as e:
+            logger.warning(f"Ignoring unreadable player data cache {path}: {str(e)}")
+            return None
+
+    def _write_cache(self, columns):
+        path = self._cache_path()
+        try:
+            os.makedirs(self.cache_dir, exist_ok=True)
+        except OSError:
+            # Read-only image; fall back to the temp directory
+            self.cache_dir = os.path.join(tempfile.gettempdir(), 'player-data-cache')
+            os.makedirs(self.cache_dir, exist_ok=True)
+            path = self._cache_path()
+
+        def align(size):
+            return -(-size // CACHE_ALIGN) * CACHE_ALIGN
+
+        relative, offset = {}, 0
+        for name, array in columns.items():
+            relative[name] = offset
+            offset += align(array.nbytes)
+
+        # The arrays start after the header, whose length depends on their offsets
+        base = CACHE_ALIGN
+        while True:
+            arrays = {
+                name: {'dtype': array.dtype.str, 'shape': list(array.shape), 'offset': base + relative[name]}
+                for name, array in columns.items()
+            }
+            header = {'version': CACHE_VERSION, 'sources': self._sources(), 'arrays': arrays}
+            encoded = json.dumps(header).encode('utf-8')
+            if align(8 + len(encoded)) <= base:
+                break
+            base = align(8 + len(encoded))
+
+        try:
+            fd, tmp_path = tempfile.mkstemp(dir=self.cache_dir, prefix='.players-')
+            with os.fdopen(fd, 'wb') as file:
+                file.write(len(encoded).to_bytes(8, 'little'))
+                file.write(encoded)
+                for name, array in columns.items():
+                    file.seek(arrays[name]['offset'])
+                    file.write(np.ascontiguousarray(array).tobytes())
+            os.chmod(tmp_path, 0o644)
+            os.replace(tmp_path, path)
+        except OSError as e:
+            logger.warning(f"Could not write player data cache {path}: {str(e)}")
+
+    def _build_index(self):
+        """
+        Builds KD-trees over z-score normalized (LaunchAngle, ExitVelocity) and
+        (LaunchAngle, ExitVelocity, HitDistance), so a unit of distance is one
+        standard deviation in every metric. Rows with missing metrics are left
+        out of the trees that need them.
+        """
+        from scipy.spatial import cKDTree
+
+        metrics = self.metrics.astype(np.float64)
+        self.rows_2d = np.flatnonzero(~np.isnan(metrics[:, :2]).any(axis=1))
+        self.rows_3d = self.rows_2d[~np.isnan(metrics[self.rows_2d, 2])]
+
+        if len(self.rows_2d):
+            self.index_mean = np.nanmean(metrics[self.rows_2d], axis=0)
+            std = np.nan_to_num(np.nanstd(metrics[self.rows_2d], axis=0))
+        else:
+            self.index_mean = np.zeros(len(INDEX_METRICS))
+            std = np.ones(len(INDEX_METRICS))
+        self.index_mean = np.nan_to_num(self.index_mean)
+        self.index_scale = np.where(std > 0, std, 1.0)
+
+        normalized = (metrics - self.index_mean) / self.index_scale
+        self.tree_2d = cKDTree(normalized[self.rows_2d, :2])
+        self.tree_3d = cKDTree(normalized[self.rows_3d])
+
+    def _query_point(self, launch_angle, exit_velocity, hit_distance=None):
+        if hit_distance is None:
+            point = (np.array([launch_angle, exit_velocity]) - self.index_mean[:2]) / self.index_scale[:2]
+            return point, self.tree_2d, self.rows_2d
+        point = (np.array([launch_angle, exit_velocity, hit_distance]) - self.index_mean) / self.index_scale
+        return point, self.tree_3d, self.rows_3d
+
+    def _matches(self, rows, distances):
+        return [
+            {'play_id': self.play_ids[row], 'distance': float(distance), **self._row_data(row)}
+            for row, distance in zip(rows, distances)
+        ]
+
+    def _row_data(self, row):
+        # float32 keeps about 7 significant digits; format back to what the CSV had
+        metrics = [None if np.isnan(value) else float(f"{value:.7g}") for value in self.metrics[row]]
+        return {
+            'title': self.titles[self.title_codes[row]],
+            'ExitVelocity': metrics[1],
+            'HitDistance': metrics[2],
+            'LaunchAngle': metrics[0],
+            'video': self.videos[self.video_codes[row]],
+            'season': int(self.seasons[row])
+        }
+
+    def nearest_players(self, launch_angle, exit_velocity, k=1, hit_distance=None):
+        """
+        Returns the k players closest to the given metrics, nearest first, each
+        as its player data plus 'play_id' and the normalized 'distance'.
+        Pass hit_distance to match on all three metrics.
+        """
+        point, tree, rows = self._query_point(launch_angle, exit_velocity, hit_distance)
+        k = min(k, tree.n)
+        if k <= 0:
+            return []
+        distances, found = tree.query(point, k=k)
+        distances, found = np.atleast_1d(distances), np.atleast_1d(found)
+        return self._matches(rows[found], distances)
+
+    def players_within(self, launch_angle, exit_velocity, radius, hit_distance=None, limit=None):
+        """
+        Returns the players within radius (in standard deviations) of the given
+        metrics, nearest first, optionally capped at limit.
+        """
+        point, tree, rows = self._query_point(launch_angle, exit_velocity, hit_distance)
+        found = np.array(tree.query_ball_point(point, r=radius), dtype=np.intp)
+        if not len(found):
+            return []
+        distances = np.linalg.norm(tree.data[found] - point, axis=1)
+        order = np.argsort(distances, kind='stable')[:limit]
+        return self._matches(rows[found[order]], distances[order])
 
     def get_player_data(self, player_id):
-        return self.players_data.get(player_id, None)
+        if self._row_by_id is None:
+            self._row_by_id = {play_id: row for row, play_id in enumerate(self.play_ids)}
+        row = self._row_by_id.get(player_id)
+        return None if row is None else self._row_data(row)
 
     def get_all_players(self):
-        return self.players_data
+        """Materializes every row as a dict keyed by play_id; prefer the column arrays."""
+        return {self.play_ids[row]: self._row_data(row) for row in range(len(self))}
+
+    def __len__(self):
+        return len(self.play_ids)
 
 if __name__ == "__main__":
-    filePath = os.path.join(os.path.dirname(__file__), '../../datasets/2024-mlb-homeruns.csv')
-    player_service = PlayerData(filePath)
+    player_service = PlayerData()
+    print(f"{len(player_service)} plays from {len(player_service.filePaths)} seasons "
+          f"({'cache' if player_service.loaded_from_cache else 'CSV'})")
     player_data = player_service.get_player_data('148e943b-10db-4d71-943d-ead3b36bebbc')
     print(player_data)
+    print(player_service.nearest_players(28, 104, k=3))
@@ -0,0 +1,112 @@
+import asyncio
+import logging
+import threading
+import time
+from collections import OrderedDict
+from ..config import get_resource, set_resource
+
+logger = logging.getLogger(__name__)
+
+# Analysis stages in pipeline order; completed means the analysis results
+# are stored, and charts and feedback follow when they are requested
+STAGES = ("queued", "started", "downloaded", "tracking", "fitted", "completed", "charts_uploaded",
+          "feedback_ready", "retrying", "failed")
+
+# Latest event kept per video, replayed to new subscribers
+LAST_EVENTS_MAX = 1024
+# Events buffered per connection before the oldest are dropped
+SUBSCRIBER_QUEUE_SIZE = 100
+
+class Subscriber:
+    """
+    Receives events on an asyncio queue owned by one event loop. Publishers
+    on any thread hand events over with call_soon_threadsafe; when the
+    consumer falls behind the oldest events are dropped, since a newer
+    progress event supersedes them.
+    """
+    def __init__(self, loop: asyncio.AbstractEventLoop = None, maxsize: int = SUBSCRIBER_QUEUE_SIZE):
+        self.loop = loop or asyncio.get_running_loop()
+        self.queue = asyncio.Queue(maxsize=maxsize)
+        self.dropped = 0
+
+    def deliver(self, event: dict):
+        try:
+            self.loop.call_soon_threadsafe(self._offer, event)
+        except RuntimeError:
+            pass  # The loop is closed; the subscriber is going away
+
+    def _offer(self, event: dict):
+        if self.queue.full():
+            self.queue.get_nowait()
+            self.dropped += 1
+        self.queue.put_nowait(event)
+
+    async def get(self) -> dict:
+        return await self.queue.get()
+
+class ProgressBroker:
+    """
+    In-process pub/sub of analysis progress, keyed by video_id. Publishing
+    never blocks the pipeline. Swap it for a shared implementation (e.g.
+    Redis or Pub/Sub) with set_progress_broker when running several
+    instances.
+    """
+    def __init__(self, last_events_max: int = LAST_EVENTS_MAX):
+        self._subscribers = {}  # video_id -> set of Subscriber
+        self._last_events = OrderedDict()
+        self._last_events_max = last_events_max
+        self._sequence = 0
+        self._lock = threading.Lock()
+
+    def publish(self, video_id: str, stage: str, **data) -> dict:
+        if stage not in STAGES:
+            raise ValueError(f"Unknown analysis stage: {stage}")
+        with self._lock:
+            self._sequence += 1
+            event = {"video_id": video_id, "stage": stage, "seq": self._sequence, "time": time.time(), **data}
+            self._last_events[video_id] = event
+            self._last_events.move_to_end(video_id)
+            while len(self._last_events) > self._last_events_max:
+                self._last_events.popitem(last=False)
+            subscribers = list(self._subscribers.get(video_id, ()))
+        for subscriber in subscribers:
+            subscriber.deliver(event)
+        return event
+
+    def subscribe(self, video_id: str, subscriber: Subscriber):
+        """Registers subscriber for video_id and replays the latest event, if any."""
+        with self._lock:
+            self._subscribers.setdefault(video_id, set()).add(subscriber)
+            last = self._last_events.get(video_id)
+        if last is not None:
+            subscriber.deliver(last)
+
+    def unsubscribe(self, video_id: str, subscriber: Subscriber):
+        with self._lock:
+            subscribers = self._subscribers.get(video_id)
+            if subscribers is not None:
+                subscribers.discard(subscriber)
+                if not subscribers:
+                    del self._subscribers[video_id]
+
+    def last_event(self, video_id: str):
+        with self._lock:
+            return self._last_events.get(video_id)
+
+    def subscriber_count(self, video_id: str) -> int:
+        with self._lock:
+            return len(self._subscribers.get(video_id, ()))
+
+def get_progress_broker() -> ProgressBroker:
+    return get_resource("progress_broker", ProgressBroker)
+
+def set_progress_broker(broker: ProgressBroker):
+    """Replaces the process-wide broker, e.g. with one shared across instances."""
+    set_resource("progress_broker", broker)
+
+def publish_progress(video_id: str, stage: str, **data):
+    """Publishes a stage event; progress reporting never fails the analysis."""
+    try:
+        get_progress_broker().publish(video_id, stage, **data)
+    except Exception as e:
+        logger.error(f"Error publishing {stage} progress for {video_id}: {str(e)}")
@@ -0,0 +1,106 @@
+import os
+import threading
+import time
+import logging
+import numpy as np
+from .playerData import PlayerData, DATASET_DIR, season_files
+from .percentileTable import PercentileTable
+
+logger = logging.getLogger(__name__)
+
+# Metrics with precomputed aggregates
+SUMMARY_METRICS = ('ExitVelocity', 'LaunchAngle', 'HitDistance')
+HISTOGRAM_BINS = 30
+
+# How often a cached dataset checks its CSVs for changes
+RELOAD_CHECK_SECONDS = float(os.getenv('REFERENCE_DATA_RELOAD_SECONDS', '5'))
+
+def chart_dataset_paths():
+    """The season the charts compare against: MLB_DATASET_PATH, else 2024."""
+    return [os.getenv('MLB_DATASET_PATH', os.path.join(DATASET_DIR, '2024-mlb-homeruns.csv'))]
+
+def summarize(values: np.ndarray) -> dict:
+    """Mean, mode, spread and a histogram of one metric; NaNs are ignored."""
+    values = values[~np.isnan(values)]
+    if not len(values):
+        return {'count': 0, 'mean': None, 'mode': None, 'std': None, 'min': None, 'max': None,
+                'histogram': {'counts': [], 'edges': []}}
+
+    # Smallest of the most frequent values, like pandas' Series.mode()[0]
+    unique, counts = np.unique(values, return_counts=True)
+    hist_counts, hist_edges = np.histogram(values, bins=HISTOGRAM_BINS)
+    return {
+        'count': int(len(values)),
+        'mean': float(values.mean()),
+        'mode': float(unique[np.argmax(counts)]),
+        'std': float(values.std()),
+        'min': float(values.min()),
+        'max': float(values.max()),
+        'histogram': {'counts': hist_counts.tolist(), 'edges': hist_edges.tolist()}
+    }
+
+class ReferenceData:
+    """
+    One loaded snapshot of the MLB reference datasets: the indexed PlayerData
+    used by coaching, a DataFrame view for the charts, precomputed
+    aggregates and per-season percentile tables. Shared by every request in
+    the process, so treat it as read-only.
+    """
+    def __init__(self, paths):
+        import pandas as pd
+
+        self.paths = list(paths)
+        self.players = PlayerData(self.paths)
+        self.mtimes = self._mtimes()
+        self.checked_at = time.monotonic()
+
+        # float32 columns carry about 7 significant digits; round them back
+        # so means and modes match what the CSV holds
+        metrics = np.round(self.players.metrics.astype(np.float64), 4)
+        frame = pd.DataFrame({
+            'play_id': list(self.players.play_ids),
+            'title': [self.players.titles[code] for code in self.players.title_codes],
+            'ExitVelocity': metrics[:, 1],
+            'HitDistance': metrics[:, 2],
+            'LaunchAngle': metrics[:, 0],
+            'video': [self.players.videos[code] for code in self.players.video_codes],
+            'season': self.players.seasons,
+        })
+        self.frame = frame.dropna(subset=['ExitVelocity', 'LaunchAngle']).reset_index(drop=True)
+        self.stats = {metric: summarize(self.frame[metric].to_numpy()) for metric in SUMMARY_METRICS}
+        self.percentiles = PercentileTable(metrics, self.players.seasons)
+
+    def _mtimes(self):
+        return [os.stat(path).st_mtime_ns for path in self.paths]
+
+    def is_stale(self) -> bool:
+        self.checked_at = time.monotonic()
+        try:
+            return self._mtimes() != self.mtimes
+        except OSError:
+            return False  # Keep serving the loaded copy if a file disappears
+
+_datasets = {}
+_datasets_lock = threading.Lock()
+
+def get_reference_data(paths=None) -> ReferenceData:
+    """
+    Returns the process-wide snapshot for the given CSVs (every season by
+    default), loading it on first use and reloading it when a file changes.
+    """
+    paths = tuple(os.path.abspath(path) for path in (paths or season_files()))
+    with _datasets_lock:
+        data = _datasets.get(paths)
+        if data is not None and time.monotonic() - data.checked_at < RELOAD_CHECK_SECONDS:
+            return data
+        if data is None or data.is_stale():
+            try:
+                data = ReferenceData(paths)
+            except Exception as e:
+                if data is None:
+                    raise ValueError(f"Failed to load MLB dataset: {str(e)}")
+                logger.error(f"Error reloading MLB dataset, keeping the loaded copy: {str(e)}")
+                return data
+            _datasets[paths] = data
+            logger.info(f"Loaded MLB reference data: {len(data.frame)} plays from {len(paths)} files")
+        return data
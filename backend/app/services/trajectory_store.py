@@ -0,0 +1,216 @@
+import logging
+import os
+import struct
+import time
+import zlib
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+from ..config import firestore_client, get_videos_bucket
+from .advancedTracker import BaseballTracker
+from .analysis_cache import store_cached_analysis
+
+logger = logging.getLogger(__name__)
+
+# Trajectories are stored next to their video as <file_name>.trajectory
+TRAJECTORY_SUFFIX = ".trajectory"
+TRAJECTORY_CONTENT_TYPE = "application/octet-stream"
+
+MAGIC = b"SSTJ"
+FORMAT_VERSION = 1
+# magic, format version, fps, number of points
+HEADER = struct.Struct("<4sBfI")
+# Positions are kept to 1/256 pixel so their deltas are exact integers
+POSITION_SCALE = 256
+
+# Trajectories fitted per vectorized batch, and parallel downloads when loading
+REFIT_BATCH_SIZE = 1024
+REFIT_DOWNLOADS = int(os.getenv("REFIT_DOWNLOADS", "16"))
+# Firestore allows at most 500 writes per batch
+WRITE_BATCH_SIZE = 500
+
+class Trajectory:
+    """Ball positions of one swing: frame indices, (x, y) pixels and the fps they were filmed at."""
+    def __init__(self, frames, positions, fps: float):
+        self.frames = np.asarray(frames, dtype=np.int32).reshape(-1)
+        self.positions = np.asarray(positions, dtype=np.float32).reshape(-1, 2)
+        self.fps = float(fps)
+        if len(self.frames) != len(self.positions):
+            raise ValueError("Trajectory needs one frame index per position.")
+
+    @classmethod
+    def from_tracker(cls, tracker: BaseballTracker, positions):
+        return cls(tracker.frame_indices, positions, tracker.fps)
+
+    def __len__(self):
+        return len(self.frames)
+
+def encode_trajectory(trajectory: Trajectory) -> bytes:
+    """
+    Packs a trajectory as a small header and one zlib stream of int32
+    columns: frame index deltas, then x and y deltas in 1/256 pixel.
+    This is about a third of the size of raw float32 (frame, x, y) rows.
+    """
+    fixed = np.rint(trajectory.positions.astype(np.float64) * POSITION_SCALE).astype(np.int32)
+    columns = np.stack([trajectory.frames, fixed[:, 0], fixed[:, 1]])
+    deltas = np.diff(columns, axis=1, prepend=0).astype("<i4")
+    header = HEADER.pack(MAGIC, FORMAT_VERSION, trajectory.fps, len(trajectory))
+    return header + zlib.compress(deltas.tobytes())
+
+def decode_trajectory(data: bytes) -> Trajectory:
+    if len(data) < HEADER.size:
+        raise ValueError("Trajectory data is truncated.")
+    magic, version, fps, count = HEADER.unpack_from(data)
+    if magic != MAGIC:
+        raise ValueError("Not a trajectory file.")
+    if version != FORMAT_VERSION:
+        raise ValueError(f"Unsupported trajectory format version: {version}")
+    try:
+        payload = zlib.decompress(data[HEADER.size:])
+    except zlib.error as e:
+        raise ValueError(f"Corrupt trajectory data: {str(e)}")
+    if len(payload) != 3 * 4 * count:
+        raise ValueError("Trajectory data does not match its point count.")
+
+    columns = np.cumsum(np.frombuffer(payload, dtype="<i4").reshape(3, count), axis=1, dtype=np.int64)
+    positions = columns[1:].T.astype(np.float64) / POSITION_SCALE
+    return Trajectory(columns[0], positions, fps)
+
+def trajectory_file_name(file_name: str) -> str:
+    return file_name + TRAJECTORY_SUFFIX
+
+def store_trajectory(bucket, file_name: str, trajectory: Trajectory) -> dict:
+    """Uploads the trajectory next to its video; returns the reference kept on the video document."""
+    data = encode_trajectory(trajectory)
+    name = trajectory_file_name(file_name)
+    bucket.blob(name).upload_from_string(data, content_type=TRAJECTORY_CONTENT_TYPE)
+    return {"bucket": bucket.name, "file": name, "points": len(trajectory), "bytes": len(data)}
+
+def load_trajectory(bucket, name: str) -> Trajectory:
+    return decode_trajectory(bucket.blob(name).download_as_bytes())
+
+def fit_trajectories(trajectories, velocity_conversion: float = BaseballTracker.VELOCITY_CONVERSION,
+                     batch_size: int = REFIT_BATCH_SIZE) -> list:
+    """
+    Launch angle and exit velocity for many trajectories, as
+    BaseballTracker._analyze_trajectory computes them one at a time.
+
+    Trajectories are sorted by length and fitted in padded batches: the
+    quadratic fit of every trajectory in a batch comes from masked power
+    sums and one stacked 3x3 solve, taken relative to the first point so
+    the linear coefficient is the initial slope. Trajectories with three
+    points or fewer get zeros, as in _summarize.
+    """
+    results = [None] * len(trajectories)
+    order = sorted(range(len(trajectories)), key=lambda i: len(trajectories[i]))
+    for start in range(0, len(order), batch_size):
+        batch = order[start:start + batch_size]
+        for i, result in zip(batch, _fit_batch([trajectories[i] for i in batch], velocity_conversion)):
+            results[i] = result
+    return results
+
+def _fit_batch(trajectories, velocity_conversion: float) -> list:
+    counts = np.array([len(trajectory) for trajectory in trajectories])
+    length = max(counts.max(initial=0), 1)
+    points = np.zeros((len(trajectories), length, 2))
+    for row, trajectory in enumerate(trajectories):
+        points[row, :len(trajectory)] = trajectory.positions
+    mask = np.arange(length) < counts[:, None]
+
+    relative = (points - points[:, :1]) * mask[..., None]
+    u, v = relative[..., 0], relative[..., 1]
+    powers = u[..., None] ** np.arange(5)
+    power_sums = np.einsum("bnk,bn->bk", powers, mask)
+    moment_sums = np.einsum("bnk,bn->bk", powers[..., 2::-1], v)
+    normal = power_sums[:, [[4, 3, 2], [3, 2, 1], [2, 1, 0]]]
+
+    fitted = counts > 3
+    coeffs = np.zeros((len(trajectories), 3))
+    if fitted.any():
+        try:
+            coeffs[fitted] = np.linalg.solve(normal[fitted], moment_sums[fitted][..., None])[..., 0]
+        except np.linalg.LinAlgError:
+            # Degenerate paths (e.g. all points at one x) get the least-squares answer
+            coeffs[fitted] = (np.linalg.pinv(normal[fitted]) @ moment_sums[fitted][..., None])[..., 0]
+
+    steps = np.hypot(*np.moveaxis(np.diff(points, axis=1), -1, 0)) * mask[:, 1:]
+    fps = np.array([trajectory.fps for trajectory in trajectories])
+    launch_angles = np.degrees(np.arctan(coeffs[:, 1]))
+    exit_velocities = steps.sum(axis=1) / np.maximum(counts - 1, 1) * fps * velocity_conversion
+
+    return [
+        {"launch_angle": float(launch_angle), "exit_velocity": float(exit_velocity)} if ok
+        else {"launch_angle": 0, "exit_velocity": 0}
+        for ok, launch_angle, exit_velocity in zip(fitted, launch_angles, exit_velocities)
+    ]
+
+def _stored_trajectory_refs(video_ids: list = None) -> dict:
+    """{video_id: (trajectory reference, content_hash)} for the videos with a stored trajectory."""
+    collection = firestore_client.collection("videos")
+    if video_ids is not None:
+        refs = [collection.document(video_id) for video_id in dict.fromkeys(video_ids)]
+        snapshots = firestore_client.get_all(refs, field_paths=["trajectory", "content_hash"]) if refs else []
+    else:
+        snapshots = collection.select(["trajectory", "content_hash"]).stream()
+
+    stored = {}
+    for snapshot in snapshots:
+        data = snapshot.to_dict() or {}
+        if data.get("trajectory"):
+            stored[snapshot.id] = (data["trajectory"], data.get("content_hash"))
+    return stored
+
+def _load_stored(stored: dict, workers: int = REFIT_DOWNLOADS) -> dict:
+    def load(item):
+        video_id, (reference, _) = item
+        try:
+            return video_id, load_trajectory(get_videos_bucket(reference["bucket"]), reference["file"])
+        except Exception as e:
+            logger.error(f"Error loading trajectory for {video_id}: {str(e)}")
+            return video_id, None
+
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        return {video_id: trajectory for video_id, trajectory in pool.map(load, stored.items()) if trajectory}
+
+def refit_videos(video_ids: list = None, velocity_conversion: float = BaseballTracker.VELOCITY_CONVERSION,
+                 write: bool = False) -> dict:
+    """
+    Recomputes launch angle and exit velocity from stored trajectories,
+    without decoding any video. Covers the given videos, or every video with
+    a stored trajectory. With write, the new results replace the videos'
+    analysis_results and are cached for their content, replacing any cached
+    charts. Results are cached under the current TRACKER_VERSION, so write
+    is only allowed with the tracker's own calibration; try a new
+    velocity_conversion without write, then change the tracker. Returns the
+    results, the videos that had no readable trajectory and the timings.
+    """
+    if write and velocity_conversion != BaseballTracker.VELOCITY_CONVERSION:
+        raise ValueError("Refits with a different velocity_conversion cannot be written; "
+                         "update BaseballTracker.VELOCITY_CONVERSION and TRACKER_VERSION instead.")
+    start = time.perf_counter()
+    stored = _stored_trajectory_refs(video_ids)
+    trajectories = _load_stored(stored)
+    loaded = time.perf_counter()
+
+    video_order = list(trajectories)
+    fits = fit_trajectories([trajectories[video_id] for video_id in video_order], velocity_conversion)
+    results = dict(zip(video_order, fits))
+    fitted = time.perf_counter()
+
+    if write:
+        collection = firestore_client.collection("videos")
+        for offset in range(0, len(video_order), WRITE_BATCH_SIZE):
+            batch = firestore_client.batch()
+            for video_id in video_order[offset:offset + WRITE_BATCH_SIZE]:
+                batch.update(collection.document(video_id), {"analysis_results": results[video_id]})
+            batch.commit()
+        for video_id in video_order:
+            store_cached_analysis(stored[video_id][1], results[video_id], clear_images=True)
+
+    missing = [video_id for video_id in (video_ids or stored) if video_id not in trajectories]
+    logger.info(f"Refit {len(results)} trajectories in {fitted - loaded:.3f}s (loading took {loaded - start:.1f}s)")
+    return {
+        "results": results,
+        "missing": missing,
+        "load_seconds": round(loaded - start, 3),
+        "fit_seconds": round(fitted - loaded, 3)
+    }
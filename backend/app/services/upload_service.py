@@ -0,0 +1,192 @@
+import hashlib
+import logging
+import os
+try:
+    from python_multipart.exceptions import FormParserError
+    from python_multipart.multipart import MultipartParser, parse_options_header
+except ImportError:  # python-multipart < 0.0.13
+    from multipart.exceptions import FormParserError
+    from multipart.multipart import MultipartParser, parse_options_header
+
+logger = logging.getLogger(__name__)
+
+# Resumable upload chunks must be a multiple of 256 KiB
+UPLOAD_CHUNK_SIZE = 8 * 1024 * 1024
+MAX_UPLOAD_BYTES = int(os.getenv("MAX_UPLOAD_BYTES", str(1024 * 1024 * 1024)))
+STAGING_PREFIX = "uploads/"
+# Bytes of the file collected from the request stream before each write
+STREAM_WRITE_SIZE = 1024 * 1024
+# Enough of the file's start for sniff_video_type
+SNIFF_BYTES = 64
+
+class UploadError(ValueError):
+    """Raised when an upload is rejected; carries the HTTP status to report."""
+    def __init__(self, message: str, status_code: int = 400):
+        super().__init__(message)
+        self.status_code = status_code
+
+def sniff_video_type(header: bytes):
+    """Returns the MIME type for known video container signatures, else None."""
+    if len(header) >= 12 and header[4:8] == b"ftyp":
+        return "video/quicktime" if header[8:10] == b"qt" else "video/mp4"
+    if len(header) >= 12 and header[:4] == b"RIFF" and header[8:12] == b"AVI ":
+        return "video/x-msvideo"
+    if header[:4] == b"\x1a\x45\xdf\xa3":
+        return "video/webm" if b"webm" in header[:64] else "video/x-matroska"
+    return None
+
+class MultipartFileStream:
+    """
+    Push parser for a multipart/form-data request body that passes on the
+    bytes of one file field as they arrive, so a request can be checked
+    and rejected while it is still being received. Feed it the body chunk
+    by chunk; feed() returns the file bytes found in that chunk. filename
+    and content_type are set once the file part's headers have been read.
+    """
+    def __init__(self, content_type_header: str, field_name: str = "file"):
+        content_type, options = parse_options_header(content_type_header or "")
+        boundary = options.get(b"boundary")
+        if content_type != b"multipart/form-data" or not boundary:
+            raise UploadError("Expected a multipart/form-data upload.")
+        self.field_name = field_name
+        self.filename = None
+        self.content_type = None
+        self.found = False
+        self.complete = False
+        self._in_file = False
+        self._headers = {}
+        self._header_field = b""
+        self._header_value = b""
+        self._chunks = []
+        self.parser = MultipartParser(boundary, {
+            "on_part_begin": self._on_part_begin,
+            "on_header_field": self._on_header_field,
+            "on_header_value": self._on_header_value,
+            "on_header_end": self._on_header_end,
+            "on_headers_finished": self._on_headers_finished,
+            "on_part_data": self._on_part_data,
+            "on_part_end": self._on_part_end,
+            "on_end": self._on_end
+        })
+
+    def _on_part_begin(self):
+        self._headers = {}
+
+    def _on_header_field(self, data: bytes, start: int, end: int):
+        self._header_field += data[start:end]
+
+    def _on_header_value(self, data: bytes, start: int, end: int):
+        self._header_value += data[start:end]
+
+    def _on_header_end(self):
+        self._headers[self._header_field.lower()] = self._header_value
+        self._header_field = self._header_value = b""
+
+    def _on_headers_finished(self):
+        _, options = parse_options_header(self._headers.get(b"content-disposition", b""))
+        name = options.get(b"name", b"").decode("latin-1")
+        self._in_file = name == self.field_name and not self.found and b"filename" in options
+        if self._in_file:
+            self.found = True
+            self.filename = options[b"filename"].decode("utf-8", "replace")
+            self.content_type = self._headers.get(b"content-type", b"application/octet-stream").decode("latin-1")
+
+    def _on_part_data(self, data: bytes, start: int, end: int):
+        if self._in_file:
+            self._chunks.append(bytes(data[start:end]))
+
+    def _on_part_end(self):
+        self._in_file = False
+
+    def _on_end(self):
+        self.complete = True
+
+    def feed(self, data: bytes) -> list:
+        try:
+            self.parser.write(data)
+        except FormParserError as e:
+            raise UploadError(f"Malformed multipart body: {str(e)}")
+        chunks, self._chunks = self._chunks, []
+        return chunks
+
+    def finish(self):
+        try:
+            self.parser.finalize()
+        except FormParserError as e:
+            raise UploadError(f"Malformed multipart body: {str(e)}")
+        if not self.complete:
+            raise UploadError("The upload ended before the multipart body was complete.")
+        if not self.found:
+            raise UploadError(f"No file was uploaded in the '{self.field_name}' field.")
+
+class StreamingUpload:
+    """
+    Streams an upload into a resumable GCS upload chunk by chunk, hashing,
+    size-checking and MIME-sniffing the bytes as they pass, so the file is
+    never buffered whole.
+
+    The upload goes to a staging object first; finish() then moves it to its
+    content-addressed name, or drops it when identical content is already
+    stored. write(), finish() and abort() block on network I/O, so async
+    callers should run them in a threadpool.
+    """
+    def __init__(self, bucket, staging_name: str, max_bytes: int = MAX_UPLOAD_BYTES,
+                 chunk_size: int = UPLOAD_CHUNK_SIZE):
+        self.bucket = bucket
+        self.staging_blob = bucket.blob(staging_name)
+        self.max_bytes = max_bytes
+        self.chunk_size = chunk_size
+        self.digest = hashlib.sha256()
+        self.size = 0
+        self.content_type = None
+        self.writer = None
+
+    def write(self, chunk: bytes):
+        if self.writer is None:
+            self.content_type = sniff_video_type(chunk)
+            if self.content_type is None:
+                raise UploadError("Invalid file content. Only MP4, MOV, AVI and MKV videos are allowed.", 415)
+            self.staging_blob.content_type = self.content_type
+            self.writer = self.staging_blob.open("wb", chunk_size=self.chunk_size)
+
+        self.size += len(chunk)
+        if self.size > self.max_bytes:
+            raise UploadError(f"File too large. The limit is {self.max_bytes // (1024 * 1024)} MB.", 413)
+
+        self.digest.update(chunk)
+        self.writer.write(chunk)
+
+    def finish(self, extension: str):
+        """
+        Completes the upload. Returns (final_name, content_hash, deduplicated).
+        """
+        if self.writer is None:
+            raise UploadError("The uploaded file is empty.")
+        self.writer.close()
+
+        content_hash = self.digest.hexdigest()
+        final_name = f"{content_hash}.{extension}"
+        final_blob = self.bucket.blob(final_name)
+
+        if final_blob.exists():
+            self.staging_blob.delete()
+            return final_name, content_hash, True
+
+        # Server-side rewrite; large objects may take several calls
+        token, _, _ = final_blob.rewrite(self.staging_blob)
+        while token is not None:
+            token, _, _ = final_blob.rewrite(self.staging_blob, token=token)
+        self.staging_blob.delete()
+        return final_name, content_hash, False
+
+    def abort(self):
+        """Discards a rejected or failed upload, including any staged bytes."""
+        if self.writer is None:
+            return
+        try:
+            # BlobWriter finalizes on close (and on garbage collection), so
+            # close it here and delete the staged object
+            self.writer.close()
+            self.staging_blob.delete()
+        except Exception as e:
+            logger.error(f"Error discarding staged upload {self.staging_blob.name}: {str(e)}")
@@ -1,6 +1,109 @@
-from google.cloud import firestore
+import base64
+import json
+from datetime import datetime, timezone
+from ..config import firestore_client
 
-firestore_client = firestore.Client()
+# Largest list of video ids accepted by the batch endpoints
+MAX_BATCH_VIDEOS = 50
+
+# Video list pages, newest upload first
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 500
+# What a list view gets by default, and what it may ask for
+LIST_FIELDS = ("status", "uploaded_at")
+LISTABLE_FIELDS = ("status", "uploaded_at", "file_name", "content_type", "size_bytes", "bucket",
+                   "content_hash", "error", "analysis_results")
+
+def encode_cursor(uploaded_at: datetime, video_id: str) -> str:
+    payload = json.dumps({"uploaded_at": uploaded_at.isoformat(), "video_id": video_id})
+    return base64.urlsafe_b64encode(payload.encode()).decode()
+
+def decode_cursor(cursor: str):
+    """Returns (uploaded_at, video_id) from an opaque page cursor."""
+    try:
+        payload = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+        return datetime.fromisoformat(payload["uploaded_at"]), payload["video_id"]
+    except (ValueError, KeyError, TypeError):
+        raise ValueError("Invalid cursor.")
+
+def parse_fields(fields: str = None) -> tuple:
+    """Validates a comma-separated field list; video_id is always returned."""
+    if not fields:
+        return LIST_FIELDS
+    requested = tuple(dict.fromkeys(field.strip() for field in fields.split(",") if field.strip()))
+    unknown = [field for field in requested if field not in LISTABLE_FIELDS and field != "video_id"]
+    if unknown:
+        raise ValueError(f"Unknown fields: {', '.join(unknown)}. Use any of: {', '.join(LISTABLE_FIELDS)}")
+    return tuple(field for field in requested if field != "video_id")
+
+def _utc(value: datetime) -> datetime:
+    return value if value.tzinfo else value.replace(tzinfo=timezone.utc)
+
+class VideoPage:
+    """
+    One page of the video list, read lazily from a Firestore query stream.
+    Iterate it for the videos; afterwards next_cursor is set when more
+    videos follow.
+    """
+    def __init__(self, query, page_size: int, fields: tuple):
+        self.query = query
+        self.page_size = page_size
+        self.fields = fields
+        self.next_cursor = None
+
+    def __iter__(self):
+        last = None
+        for count, snapshot in enumerate(self.query.stream()):
+            if count == self.page_size:
+                # The extra document only tells that another page exists
+                self.next_cursor = encode_cursor(last.get("uploaded_at"), last.id)
+                break
+            data = snapshot.to_dict()
+            last = snapshot
+            yield {"video_id": snapshot.id, **{field: data.get(field) for field in self.fields}}
+
+def list_videos_page(page_size: int = DEFAULT_PAGE_SIZE, cursor: str = None, status: str = None,
+                     uploaded_after: datetime = None, uploaded_before: datetime = None,
+                     fields: tuple = LIST_FIELDS) -> VideoPage:
+    """
+    Builds a page query over the videos collection: filtered by status and
+    upload time on the server, ordered by uploaded_at then id (newest
+    first), projected to the requested fields and resumed after cursor.
+    Filtering by status as well needs a composite index on
+    (status, uploaded_at desc).
+    """
+    from google.cloud.firestore import FieldFilter, Query
+
+    if not 1 <= page_size <= MAX_PAGE_SIZE:
+        raise ValueError(f"Page size must be between 1 and {MAX_PAGE_SIZE}")
+    after = decode_cursor(cursor) if cursor else None
+
+    query = firestore_client.collection("videos")
+    if status:
+        query = query.where(filter=FieldFilter("status", "==", status))
+    if uploaded_after:
+        query = query.where(filter=FieldFilter("uploaded_at", ">=", _utc(uploaded_after)))
+    if uploaded_before:
+        query = query.where(filter=FieldFilter("uploaded_at", "<", _utc(uploaded_before)))
+
+    query = (query.order_by("uploaded_at", direction=Query.DESCENDING)
+                  .order_by("__name__", direction=Query.DESCENDING))
+    # uploaded_at is always read so the page can end with a cursor
+    query = query.select(list(dict.fromkeys(fields + ("uploaded_at",))))
+    if after:
+        query = query.start_after({"uploaded_at": after[0], "__name__": after[1]})
+    return VideoPage(query.limit(page_size + 1), page_size, fields)
+
+def get_video_documents(video_ids: list) -> dict:
+    """
+    Reads many video documents in one get_all round trip. Returns
+    {video_id: data} for the videos that exist.
+    """
+    collection = firestore_client.collection("videos")
+    refs = [collection.document(video_id) for video_id in dict.fromkeys(video_ids)]
+    if not refs:
+        return {}
+    return {snapshot.id: snapshot.to_dict() for snapshot in firestore_client.get_all(refs) if snapshot.exists}
 
 def analyze_video(video_id: str):
     """Analyzes video data."""
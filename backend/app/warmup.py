@@ -0,0 +1,52 @@
+import importlib
+import logging
+import threading
+import time
+from .config import get_firestore_client, get_storage_client
+
+logger = logging.getLogger(__name__)
+
+def _import(module_name: str):
+    return lambda: importlib.import_module(module_name)
+
+def _load_reference_data():
+    from .services.referenceData import get_reference_data
+    get_reference_data()
+
+def _build_chart_layers():
+    # Renders the static MLB chart backgrounds so the first analysis only draws its overlay
+    from utils.image_generator import MLBDataLoader
+    from utils.chart_layers import get_chart_layers
+    get_chart_layers(MLBDataLoader.load_reference()).prebuild()
+
+# Run in order; later steps are the ones a first request is least likely to need
+WARM_UP_STEPS = [
+    ("firestore_client", get_firestore_client),
+    ("storage_client", get_storage_client),
+    ("reference_data", _load_reference_data),
+    ("tracker", _import("app.services.analysis_service")),
+    ("charts", _build_chart_layers),
+]
+
+def warm_up() -> dict:
+    """
+    Creates the shared clients, loads the reference data and imports the
+    heavy modules ahead of the first request that needs them. A failing step
+    is logged and skipped. Returns each step's duration in seconds.
+    """
+    timings = {}
+    for name, step in WARM_UP_STEPS:
+        started = time.perf_counter()
+        try:
+            step()
+        except Exception as e:
+            logger.warning(f"Warm-up step {name} failed: {str(e)}")
+        timings[name] = time.perf_counter() - started
+    logger.info("Warm-up finished: " + ", ".join(f"{name} {seconds:.2f}s" for name, seconds in timings.items()))
+    return timings
+
+def start_warm_up() -> threading.Thread:
+    """Runs warm_up() in a background thread so the server can accept requests meanwhile."""
+    thread = threading.Thread(target=warm_up, name="warm-up", daemon=True)
+    thread.start()
+    return thread
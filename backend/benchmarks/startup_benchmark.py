@@ -0,0 +1,109 @@
+"""
+Cold-start benchmark for the API process.
+
+Starts fresh interpreters that import app.main, then run the warm-up (shared
+clients, reference data, heavy imports), and reports the time of each phase
+plus the slowest imports from python -X importtime.
+
+    cd backend
+    python -m benchmarks.startup_benchmark --runs 5
+    python -m benchmarks.startup_benchmark --offline-credentials   # no GCP account needed
+
+--offline-credentials points the Google clients at a throwaway service
+account so they can be constructed without network access or real keys.
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+from pathlib import Path
+
+BACKEND_DIR = Path(__file__).parent.parent
+
+PROBE = """
+import json, time
+started = time.perf_counter()
+import app.main
+imported = time.perf_counter()
+from app.warmup import warm_up
+steps = warm_up()
+print(json.dumps({"import": imported - started, "warm_up": steps, "total": time.perf_counter() - started}))
+"""
+
+def write_offline_credentials(directory: str) -> str:
+    from cryptography.hazmat.primitives import serialization
+    from cryptography.hazmat.primitives.asymmetric import rsa
+
+    key = rsa.generate_private_key(public_exponent=65537, key_size=2048)
+    pem = key.private_bytes(serialization.Encoding.PEM, serialization.PrivateFormat.PKCS8,
+                            serialization.NoEncryption()).decode()
+    path = os.path.join(directory, "offline-service-account.json")
+    with open(path, "w") as f:
+        json.dump({
+            "type": "service_account",
+            "project_id": "startup-benchmark",
+            "private_key_id": "0",
+            "private_key": pem,
+            "client_email": "benchmark@startup-benchmark.iam.gserviceaccount.com",
+            "client_id": "0",
+            "token_uri": "https://oauth2.googleapis.com/token"
+        }, f)
+    return path
+
+def run_probe(env: dict) -> dict:
+    result = subprocess.run([sys.executable, "-c", PROBE], cwd=BACKEND_DIR, env=env,
+                            capture_output=True, text=True, check=True)
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+def slowest_imports(env: dict, count: int) -> list:
+    result = subprocess.run([sys.executable, "-X", "importtime", "-c", "import app.main"], cwd=BACKEND_DIR,
+                            env=env, capture_output=True, text=True, check=True)
+    imports = []
+    for line in result.stderr.splitlines():
+        # "import time: self [us] | cumulative | imported package", nesting shown by indentation
+        parts = line.removeprefix("import time:").split("|")
+        if len(parts) != 3 or not parts[1].strip().isdigit():
+            continue
+        name = parts[2][1:]
+        # Only modules imported directly by app code, so nested imports are not double counted
+        if not name.startswith(" ") or name.strip().startswith("app."):
+            imports.append((int(parts[1]), name.strip()))
+    return sorted(imports, reverse=True)[:count]
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=3, help="Number of fresh processes (default 3)")
+    parser.add_argument("--top", type=int, default=10, help="Number of slowest imports to list")
+    parser.add_argument("--offline-credentials", action="store_true",
+                        help="Use a throwaway service account instead of the environment's credentials")
+    parser.add_argument("--json", help="Write the raw measurements to this file")
+    args = parser.parse_args(argv)
+
+    env = dict(os.environ, WARM_UP="0")
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        if args.offline_credentials:
+            env["GOOGLE_APPLICATION_CREDENTIALS"] = write_offline_credentials(tmp_dir)
+            env["GOOGLE_CLOUD_PROJECT"] = "startup-benchmark"
+
+        runs = [run_probe(env) for _ in range(args.runs)]
+        imports = slowest_imports(env, args.top)
+
+    print(f"{'phase':<20} {'median s':>9} {'max s':>9}")
+    phases = ["import"] + list(runs[0]["warm_up"]) + ["total"]
+    for phase in phases:
+        values = [run[phase] if phase in ("import", "total") else run["warm_up"][phase] for run in runs]
+        print(f"{phase:<20} {statistics.median(values):>9.3f} {max(values):>9.3f}")
+
+    print(f"\nSlowest imports of app.main (cumulative):")
+    for us, name in imports:
+        print(f"  {us / 1e6:>7.3f}s  {name}")
+
+    if args.json:
+        Path(args.json).write_text(json.dumps({"runs": runs, "imports": imports}, indent=2))
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
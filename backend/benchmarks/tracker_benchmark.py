@@ -0,0 +1,247 @@
+"""
+Synthetic-video benchmark and accuracy suite for BaseballTracker.
+
+Renders clips of a ball on a known parabolic trajectory (varying resolution,
+fps, noise, background clutter and ball size), runs the tracker on them and
+reports throughput, peak memory and launch-angle / exit-velocity error against
+ground truth. Everything runs offline.
+
+    cd backend
+    python -m benchmarks.tracker_benchmark                      # curated scenarios
+    python -m benchmarks.tracker_benchmark --full --json out.json
+    python -m benchmarks.tracker_benchmark --check out.json     # fail on regressions
+"""
+import argparse
+import itertools
+import json
+import resource
+import sys
+import tempfile
+import time
+import tracemalloc
+from dataclasses import dataclass, asdict
+from pathlib import Path
+
+import cv2
+import numpy as np
+
+sys.path.append(str(Path(__file__).parent.parent))
+
+from app.services.advancedTracker import BaseballTracker
+
+@dataclass
+class Scenario:
+    width: int = 1280
+    height: int = 720
+    fps: int = 30
+    noise: float = 0.0         # Std-dev of per-pixel Gaussian noise
+    clutter: int = 0           # Number of static white objects in the background
+    ball_radius: float = 8.0
+    launch_angle: float = 25.0 # Degrees above horizontal
+    flight_seconds: float = 0.5
+    lead_seconds: float = 0.25
+
+    @property
+    def name(self) -> str:
+        return (f"{self.width}x{self.height}@{self.fps} noise={self.noise:g} "
+                f"clutter={self.clutter} r={self.ball_radius:g} la={self.launch_angle:g}")
+
+def trajectory(scenario: Scenario):
+    """
+    Ball centers per frame (None before launch and after leaving the frame)
+    and the ground-truth metrics in the tracker's image-coordinate convention.
+    """
+    w, h, fps = scenario.width, scenario.height, scenario.fps
+    theta = np.radians(scenario.launch_angle)
+    speed = 0.8 * w / scenario.flight_seconds   # px/s, crosses most of the frame
+    vx, vy = speed * np.cos(theta), speed * np.sin(theta)
+    gravity = vy ** 2 / (0.8 * h)               # Peak about 0.4 * h above the start
+    x0, y0 = 0.1 * w, 0.8 * h
+
+    lead = int(round(scenario.lead_seconds * fps))
+    total = lead + int(round((scenario.flight_seconds + scenario.lead_seconds) * fps))
+
+    centers, velocities = [], []
+    for i in range(total):
+        t = (i - lead) / fps
+        x, y = x0 + vx * t, y0 - vy * t + 0.5 * gravity * t ** 2
+        r = scenario.ball_radius
+        if t < 0 or not (r <= x < w - r and r <= y < h - r):
+            centers.append(None)
+            continue
+        centers.append((x, y))
+        velocities.append(np.hypot(vx, -vy + gravity * t))
+
+    # Image y grows downward, so the tracker reports upward flight as a negative angle
+    truth = {
+        "launch_angle": -scenario.launch_angle,
+        "exit_velocity": float(np.mean(velocities)) * BaseballTracker.VELOCITY_CONVERSION
+    }
+    return centers, truth
+
+def render_clip(scenario: Scenario, path: Path, seed: int = 0):
+    """Writes the scenario to path with cv2.VideoWriter and returns the ground truth."""
+    rng = np.random.default_rng(seed)
+    w, h = scenario.width, scenario.height
+    centers, truth = trajectory(scenario)
+
+    background = np.zeros((h, w, 3), dtype=np.uint8)
+    background[:] = (40, 110, 50)
+    background[: h // 3] = (150, 120, 90)  # Backstop
+    for _ in range(scenario.clutter):
+        cx, cy = int(rng.integers(0, w)), int(rng.integers(0, h))
+        size = int(rng.integers(8, 30))
+        cv2.rectangle(background, (cx, cy), (cx + size, cy + size), (245, 245, 245), -1)
+
+    writer = cv2.VideoWriter(str(path), cv2.VideoWriter_fourcc(*"MJPG"), scenario.fps, (w, h))
+    shift = 4  # Sub-pixel ball centers
+    for center in centers:
+        frame = background.copy()
+        if center is not None:
+            cv2.circle(frame, (int(center[0] * 2 ** shift), int(center[1] * 2 ** shift)),
+                       int(scenario.ball_radius * 2 ** shift), (255, 255, 255), -1,
+                       lineType=cv2.LINE_AA, shift=shift)
+        if scenario.noise:
+            noise = rng.normal(0, scenario.noise, frame.shape)
+            frame = np.clip(frame + noise, 0, 255).astype(np.uint8)
+        writer.write(frame)
+    writer.release()
+    return centers, truth
+
+def run_scenario(scenario: Scenario, work_dir: Path, mode: str = "baseline") -> dict:
+    path = work_dir / "clip.avi"
+    centers, truth = render_clip(scenario, path)
+
+    tracker = BaseballTracker(str(path))
+    track = {
+        "baseline": tracker.track_baseball,
+        "batch": lambda: tracker.track_baseball(batch_size=16),
+        "gated": lambda: tracker.track_baseball(motion_gate=True),
+        "swing": tracker.track_swing,
+    }[mode]
+
+    tracemalloc.start()
+    started = time.perf_counter()
+    results, positions = track()
+    elapsed = time.perf_counter() - started
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    frames = min(len(centers), BaseballTracker.MAX_FRAMES + 1)
+    if mode == "swing" and tracker.swing_window:
+        frames = len(centers)  # The localization pass reads the whole clip
+
+    # Position error against the rendered centers
+    errors = [
+        np.hypot(x - centers[i][0], y - centers[i][1])
+        for i, (x, y) in zip(tracker.frame_indices, positions) if centers[i] is not None
+    ]
+    false_detections = sum(1 for i in tracker.frame_indices if centers[i] is None)
+
+    return {
+        "scenario": scenario.name,
+        "mode": mode,
+        "frames": frames,
+        "seconds": elapsed,
+        "fps": frames / elapsed if elapsed else 0.0,
+        "peak_traced_mb": peak / 2 ** 20,
+        "detections": len(positions),
+        "false_detections": false_detections,
+        "mean_position_error_px": float(np.mean(errors)) if errors else None,
+        "launch_angle": float(results["launch_angle"]),
+        "launch_angle_error": abs(float(results["launch_angle"]) - truth["launch_angle"]),
+        "exit_velocity": float(results["exit_velocity"]),
+        "exit_velocity_error": abs(float(results["exit_velocity"]) - truth["exit_velocity"]),
+        "truth": truth
+    }
+
+def curated_scenarios():
+    return [
+        Scenario(),
+        Scenario(width=640, height=360),
+        Scenario(width=1920, height=1080, ball_radius=12),
+        Scenario(fps=120),
+        Scenario(fps=240, width=1280, height=720),
+        Scenario(noise=8),
+        Scenario(clutter=12),
+        Scenario(ball_radius=5),
+        Scenario(launch_angle=10),
+        Scenario(launch_angle=40),
+    ]
+
+def full_scenarios():
+    grid = itertools.product(
+        [(640, 360), (1280, 720), (1920, 1080)],
+        [30, 120, 240],
+        [0.0, 8.0],
+        [0, 12],
+        [5.0, 10.0],
+    )
+    return [
+        Scenario(width=w, height=h, fps=fps, noise=noise, clutter=clutter, ball_radius=radius)
+        for (w, h), fps, noise, clutter, radius in grid
+    ]
+
+def check_regressions(report: list, baseline: list, tolerance: float) -> list:
+    """
+    Compares a report against a saved one. Throughput may drop and errors may
+    grow by at most tolerance (relative) per scenario; returns the failures.
+    """
+    previous = {(r["scenario"], r["mode"]): r for r in baseline}
+    failures = []
+    for result in report:
+        before = previous.get((result["scenario"], result["mode"]))
+        if before is None:
+            continue
+        if result["fps"] < before["fps"] * (1 - tolerance):
+            failures.append(f"{result['scenario']}: throughput {before['fps']:.1f} -> {result['fps']:.1f} fps")
+        for metric in ("launch_angle_error", "exit_velocity_error"):
+            allowed = before[metric] * (1 + tolerance) + 0.5
+            if result[metric] > allowed:
+                failures.append(f"{result['scenario']}: {metric} {before[metric]:.2f} -> {result[metric]:.2f}")
+    return failures
+
+def print_report(report: list):
+    header = f"{'scenario':<50} {'mode':<8} {'fps':>8} {'peak MB':>8} {'det':>4} {'LA err':>7} {'EV err':>7}"
+    print(header)
+    print("-" * len(header))
+    for r in report:
+        print(f"{r['scenario']:<50} {r['mode']:<8} {r['fps']:>8.1f} {r['peak_traced_mb']:>8.1f} "
+              f"{r['detections']:>4} {r['launch_angle_error']:>7.2f} {r['exit_velocity_error']:>7.2f}")
+    max_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+    print(f"\nProcess max RSS: {max_rss:.0f} MB")
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--full", action="store_true", help="Run the full resolution/fps/noise/clutter/size grid")
+    parser.add_argument("--mode", action="append", choices=["baseline", "batch", "gated", "swing"],
+                        help="Tracker mode(s) to run (default: baseline)")
+    parser.add_argument("--json", help="Write the report to this file")
+    parser.add_argument("--check", help="Compare against a saved report and exit non-zero on regressions")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="Allowed relative regression (default 0.2)")
+    args = parser.parse_args(argv)
+
+    scenarios = full_scenarios() if args.full else curated_scenarios()
+    modes = args.mode or ["baseline"]
+
+    report = []
+    with tempfile.TemporaryDirectory() as work_dir:
+        for scenario, mode in itertools.product(scenarios, modes):
+            report.append(run_scenario(scenario, Path(work_dir), mode))
+            print(f"done: {scenario.name} [{mode}]", file=sys.stderr)
+
+    print_report(report)
+
+    if args.json:
+        Path(args.json).write_text(json.dumps({"scenarios": [asdict(s) for s in scenarios], "results": report}, indent=2))
+
+    if args.check:
+        baseline = json.loads(Path(args.check).read_text())["results"]
+        failures = check_regressions(report, baseline, args.tolerance)
+        for failure in failures:
+            print(f"REGRESSION {failure}")
+        return 1 if failures else 0
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
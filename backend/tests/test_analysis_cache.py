@@ -0,0 +1,126 @@
+import unittest
+import sys
+from pathlib import Path
+from unittest import mock
+
+backend_dir = Path(__file__).parent.parent
+sys.path.append(str(backend_dir))
+
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from app.config import delete_field
+from app.routers import analysis
+from app.services import analysis_cache
+from app.services.analysis_cache import (cache_key, get_cached_analysis, invalidate_analysis_cache,
+                                         store_cached_analysis)
+
+class FakeDocument:
+    def __init__(self, store: dict, key: str):
+        self.store = store
+        self.id = key
+        self.reference = self
+
+    @property
+    def exists(self) -> bool:
+        return self.id in self.store
+
+    def get(self):
+        return self
+
+    def to_dict(self):
+        return dict(self.store[self.id])
+
+    def set(self, data: dict, merge: bool = False):
+        entry = dict(self.store.get(self.id, {})) if merge else {}
+        for field, value in data.items():
+            if value is delete_field():
+                entry.pop(field, None)
+            else:
+                entry[field] = value
+        self.store[self.id] = entry
+
+    def delete(self):
+        self.store.pop(self.id, None)
+
+class FakeCollection:
+    """In-memory stand-in for the analysis_cache collection"""
+    def __init__(self, store: dict, filters=()):
+        self.store = store
+        self.filters = filters
+
+    def document(self, key: str) -> FakeDocument:
+        return FakeDocument(self.store, key)
+
+    def where(self, field, op, value):
+        return FakeCollection(self.store, self.filters + ((field, value),))
+
+    def stream(self):
+        for key in list(self.store):
+            if all(self.store[key].get(field) == value for field, value in self.filters):
+                yield FakeDocument(self.store, key)
+
+class TestAnalysisCache(unittest.TestCase):
+    """Test analysis results cached by content hash and tracker version"""
+    def setUp(self):
+        self.store = {}
+        client = mock.Mock()
+        client.collection.return_value = FakeCollection(self.store)
+        for module in (analysis_cache, analysis):
+            patcher = mock.patch.object(module, "firestore_client", client)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def bump_tracker_version(self, version: str):
+        patcher = mock.patch.object(analysis_cache, "TRACKER_VERSION", version)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_cache_key(self):
+        self.assertEqual(cache_key("abc", "2"), "abc-v2")
+        self.assertNotEqual(cache_key("abc", "2"), cache_key("abc", "3"))
+
+    def test_hit_and_miss(self):
+        self.assertIsNone(get_cached_analysis("abc"))
+        self.assertIsNone(get_cached_analysis(None))
+        store_cached_analysis("abc", {"launch_angle": 20.0}, images={"barrel_zone": "url"})
+        cached = get_cached_analysis("abc")
+        self.assertEqual(cached["analysis"], {"launch_angle": 20.0})
+        self.assertEqual(cached["images"], {"barrel_zone": "url"})
+        self.assertEqual(cached["tracker_version"], analysis_cache.TRACKER_VERSION)
+        self.assertIsNone(get_cached_analysis("other"))
+
+    def test_images_kept_unless_cleared(self):
+        store_cached_analysis("abc", {"launch_angle": 20.0}, images={"barrel_zone": "url"})
+        store_cached_analysis("abc", {"launch_angle": 21.0})
+        self.assertEqual(get_cached_analysis("abc")["images"], {"barrel_zone": "url"})
+        store_cached_analysis("abc", {"launch_angle": 22.0}, clear_images=True)
+        self.assertNotIn("images", get_cached_analysis("abc"))
+
+    def test_version_bump_misses_and_invalidates(self):
+        store_cached_analysis("abc", {"launch_angle": 20.0})
+        store_cached_analysis("def", {"launch_angle": 30.0})
+        self.bump_tracker_version("99")
+        self.assertIsNone(get_cached_analysis("abc"))
+        store_cached_analysis("abc", {"launch_angle": 25.0})
+
+        self.assertEqual(invalidate_analysis_cache(), 2)
+        self.assertEqual(list(self.store), ["abc-v99"])
+        self.assertEqual(get_cached_analysis("abc")["analysis"], {"launch_angle": 25.0})
+        self.assertEqual(invalidate_analysis_cache("abc", stale_only=False), 1)
+        self.assertEqual(self.store, {})
+
+    def test_invalidate_route(self):
+        store_cached_analysis("abc", {"launch_angle": 20.0})
+        store_cached_analysis("def", {"launch_angle": 30.0})
+        app = FastAPI()
+        app.include_router(analysis.router, prefix="/analysis")
+        client = TestClient(app)
+
+        response = client.post("/analysis/cache/invalidate", json={})
+        self.assertEqual(response.json(), {"deleted": 0})  # Nothing is stale yet
+        response = client.post("/analysis/cache/invalidate", json={"content_hash": "abc", "stale_only": False})
+        self.assertEqual(response.json(), {"deleted": 1})
+        self.assertEqual(list(self.store), [cache_key("def")])
+
+if __name__ == "__main__":
+    unittest.main()
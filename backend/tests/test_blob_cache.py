@@ -0,0 +1,195 @@
+import unittest
+import os
+import sys
+import time
+import shutil
+import tempfile
+import threading
+from pathlib import Path
+from unittest import mock
+
+backend_dir = Path(__file__).parent.parent
+sys.path.append(str(backend_dir))
+sys.path.append(str(Path(__file__).parent))
+
+from app.services import analysis_service
+from app.services.blob_cache import BlobCache, LocalBucket, MEMORY_CACHE_MAX_BYTES, TMP_PREFIX, is_memory_backed
+from test_tracker import write_synthetic_clip
+
+class SlowBucket(LocalBucket):
+    """LocalBucket whose downloads take a while, to overlap concurrent misses"""
+    def blob(self, name):
+        blob = super().blob(name)
+        download = blob.download_to_filename
+
+        def slow_download(filename):
+            time.sleep(0.2)
+            download(filename)
+        blob.download_to_filename = slow_download
+        return blob
+
+class TestBlobCache(unittest.TestCase):
+    """Test the on-disk LRU cache of downloaded blobs"""
+    def setUp(self):
+        self.tmp_dir = Path(tempfile.mkdtemp())
+        self.bucket_dir = self.tmp_dir / "videos"
+        self.bucket_dir.mkdir()
+        self.cache_dir = str(self.tmp_dir / "cache")
+        self.bucket = LocalBucket(str(self.bucket_dir))
+        for name, size in (("a.mp4", 1000), ("b.mp4", 1000), ("c.mp4", 1000)):
+            (self.bucket_dir / name).write_bytes(name.encode() * (size // len(name)))
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir, ignore_errors=True)
+
+    def test_second_fetch_is_a_local_hit(self):
+        cache = BlobCache(self.cache_dir, max_bytes=10_000)
+        with cache.fetch(self.bucket.blob("a.mp4")) as path:
+            first = Path(path).read_bytes()
+        with cache.fetch(self.bucket.blob("a.mp4")) as path:
+            self.assertEqual(Path(path).read_bytes(), first)
+
+        self.assertEqual(self.bucket.downloads, 1)
+        self.assertEqual(cache.stats["hits"], 1)
+        self.assertEqual(cache.stats["misses"], 1)
+        self.assertEqual(first, (self.bucket_dir / "a.mp4").read_bytes())
+
+    def test_new_generation_is_a_new_entry(self):
+        cache = BlobCache(self.cache_dir, max_bytes=10_000)
+        with cache.fetch(self.bucket.blob("a.mp4")):
+            pass
+        self.bucket.blob("a.mp4").upload_from_string(b"replaced")
+        os.utime(self.bucket_dir / "a.mp4", ns=(time.time_ns() + 10**9, time.time_ns() + 10**9))
+        with cache.fetch(self.bucket.blob("a.mp4")) as path:
+            self.assertEqual(Path(path).read_bytes(), b"replaced")
+        self.assertEqual(self.bucket.downloads, 2)
+
+    def test_lru_eviction_skips_pinned_entries(self):
+        cache = BlobCache(self.cache_dir, max_bytes=2000)
+        with cache.fetch(self.bucket.blob("a.mp4")) as pinned_path:
+            with cache.fetch(self.bucket.blob("b.mp4")):
+                pass
+            with cache.fetch(self.bucket.blob("c.mp4")):
+                pass
+            # b was the least recently used unpinned entry
+            self.assertTrue(os.path.exists(pinned_path))
+        self.assertEqual(cache.stats["evictions"], 1)
+        self.assertLessEqual(cache.stats["bytes"], 2000)
+        with cache.lookup(self.bucket.blob("b.mp4")) as path:
+            self.assertIsNone(path)
+        with cache.lookup(self.bucket.blob("c.mp4")) as path:
+            self.assertIsNotNone(path)
+
+    def test_concurrent_misses_share_one_download(self):
+        bucket = SlowBucket(str(self.bucket_dir))
+        cache = BlobCache(self.cache_dir, max_bytes=10_000)
+        contents = []
+
+        def read():
+            with cache.fetch(bucket.blob("a.mp4")) as path:
+                contents.append(Path(path).read_bytes())
+        threads = [threading.Thread(target=read) for _ in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(bucket.downloads, 1)
+        self.assertEqual(len(set(contents)), 1)
+        self.assertFalse([name for name in os.listdir(self.cache_dir) if name.startswith(TMP_PREFIX)])
+
+    def test_failed_download_leaves_nothing(self):
+        cache = BlobCache(self.cache_dir, max_bytes=10_000)
+        blob = self.bucket.blob("a.mp4")
+        blob.download_to_filename = mock.Mock(side_effect=IOError("network down"))
+        with self.assertRaises(IOError):
+            with cache.fetch(blob):
+                pass
+        self.assertEqual(os.listdir(self.cache_dir), [])
+        self.assertEqual(cache.stats["bytes"], 0)
+        self.assertEqual(cache._fill_locks, {})
+
+    def test_restart_with_a_smaller_cap_evicts(self):
+        cache = BlobCache(self.cache_dir, max_bytes=10_000)
+        for name in ("a.mp4", "b.mp4"):
+            with cache.fetch(self.bucket.blob(name)):
+                pass
+        smaller = BlobCache(self.cache_dir, max_bytes=1500)
+        self.assertEqual(smaller.stats["bytes"], 1000)
+        self.assertEqual(smaller.stats["evictions"], 1)
+        self.assertEqual(len(os.listdir(self.cache_dir)), 1)
+
+    def test_memory_backed_cache(self):
+        with mock.patch.dict(os.environ, {"BLOB_CACHE_ON_DISK": "0"}):
+            self.assertTrue(is_memory_backed(self.cache_dir))
+            cache = BlobCache(self.cache_dir)
+        self.assertEqual(cache.max_bytes, MEMORY_CACHE_MAX_BYTES)
+        self.assertFalse(cache.copy_streams)
+        with mock.patch.dict(os.environ, {"BLOB_CACHE_ON_DISK": "1", "K_SERVICE": "slugsei"}):
+            self.assertTrue(BlobCache(self.cache_dir).copy_streams)
+
+    def test_entries_survive_restart(self):
+        with BlobCache(self.cache_dir, max_bytes=10_000).fetch(self.bucket.blob("a.mp4")):
+            pass
+        cache = BlobCache(self.cache_dir, max_bytes=10_000)
+        self.assertEqual(cache.stats["bytes"], 1000)
+        with cache.lookup(self.bucket.blob("a.mp4")) as path:
+            self.assertIsNotNone(path)
+        self.assertEqual(self.bucket.downloads, 1)
+
+    def test_put_file_adopts_a_streamed_copy(self):
+        cache = BlobCache(self.cache_dir, max_bytes=10_000)
+        blob = self.bucket.blob("b.mp4")
+        copy_path = cache.temp_path()
+        shutil.copyfile(blob.path, copy_path)
+        cache.put_file(blob, copy_path)
+        with cache.lookup(self.bucket.blob("b.mp4")) as path:
+            self.assertEqual(Path(path).read_bytes(), (self.bucket_dir / "b.mp4").read_bytes())
+        self.assertEqual(self.bucket.downloads, 0)
+
+class TestTrackFromCache(unittest.TestCase):
+    """Test that re-analysis reads the cached video instead of the bucket"""
+    def setUp(self):
+        self.tmp_dir = Path(tempfile.mkdtemp())
+        (self.tmp_dir / "videos").mkdir()
+        self.bucket = LocalBucket(str(self.tmp_dir / "videos"))
+        self.cache = BlobCache(str(self.tmp_dir / "cache"), max_bytes=50 * 1024 * 1024)
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir, ignore_errors=True)
+
+    def track_twice(self, file_name):
+        results = []
+        with mock.patch.object(analysis_service, "get_blob_cache", return_value=self.cache):
+            for _ in range(2):
+                results.append(analysis_service._track_video(self.bucket.blob(file_name), file_name)[0])
+                downloads = self.bucket.downloads
+        return results, downloads
+
+    def test_streamed_video_is_cached(self):
+        write_synthetic_clip(self.tmp_dir / "videos" / "clip.avi", n_frames=60)
+        (first, second), _ = self.track_twice("clip.avi")
+        # The first run streams (single pass), the second tracks the cached file
+        for metric in ("launch_angle", "exit_velocity"):
+            self.assertAlmostEqual(first[metric], second[metric], delta=0.5)
+        self.assertEqual(self.cache.stats["hits"], 1)
+        self.assertEqual(self.cache.stats["fills"], 1)
+
+    def test_streamed_video_is_not_copied_into_memory(self):
+        write_synthetic_clip(self.tmp_dir / "videos" / "clip.avi", n_frames=60)
+        self.cache = BlobCache(str(self.tmp_dir / "memory-cache"), memory_backed=True)
+        (first, second), downloads = self.track_twice("clip.avi")
+        self.assertEqual(first, second)
+        self.assertEqual(self.cache.stats["fills"], 0)
+        self.assertEqual(os.listdir(self.tmp_dir / "memory-cache"), [])
+
+    def test_downloaded_video_is_cached(self):
+        write_synthetic_clip(self.tmp_dir / "videos" / "clip.avi", n_frames=60)
+        os.rename(self.tmp_dir / "videos" / "clip.avi", self.tmp_dir / "videos" / "clip.bin")
+        (first, second), downloads = self.track_twice("clip.bin")
+        self.assertEqual(first, second)
+        self.assertEqual(downloads, 1)
+        self.assertEqual(self.cache.stats["hits"], 1)
+
+if __name__ == "__main__":
+    unittest.main()
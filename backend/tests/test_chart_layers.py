@@ -0,0 +1,84 @@
+import unittest
+import os
+import sys
+import numpy as np
+from io import BytesIO
+from pathlib import Path
+from PIL import Image
+
+backend_dir = Path(__file__).parent.parent
+sys.path.append(str(backend_dir))
+
+from utils.chart_layers import DistributionLayer, get_chart_layers, kde_curve, snap_dpi, CHART_TYPES
+from utils.image_generator import ChartGenerator, MLBDataLoader
+
+def setUpModule():
+    os.environ["MLB_DATASET_PATH"] = str(backend_dir / "datasets" / "2024-mlb-homeruns.csv")
+
+class TestDistributionLayer(unittest.TestCase):
+    def test_histogram_counts_every_value(self):
+        values = np.array([1.0, 2.0, 2.0, 3.0, np.nan])
+        layer = DistributionLayer(values, bins=3)
+        self.assertEqual(layer.counts.sum(), 4)
+        self.assertAlmostEqual(layer.mean, 2.0)
+        self.assertLessEqual(layer.xlim[0], 1.0)
+        self.assertGreaterEqual(layer.xlim[1], 3.0)
+
+    def test_kde_matches_counts(self):
+        rng = np.random.default_rng(0)
+        values = rng.normal(100, 5, 5000)
+        grid, curve = kde_curve(values, 400, len(values))
+        # Scaled by the count, the curve integrates to about the count over the data range
+        self.assertAlmostEqual(float(((curve[1:] + curve[:-1]) / 2 * np.diff(grid)).sum()) / len(values), 1.0, delta=0.02)
+
+    def test_constant_values_have_no_kde(self):
+        grid, curve = kde_curve(np.full(10, 3.0), 50, 10)
+        self.assertEqual(len(curve), 0)
+
+    def test_empty_values_rejected(self):
+        with self.assertRaises(ValueError):
+            DistributionLayer(np.array([np.nan]))
+
+class TestChartLayers(unittest.TestCase):
+    def setUp(self):
+        self.reference = MLBDataLoader.load_reference()
+        self.layers = get_chart_layers(self.reference)
+
+    def test_layers_shared_per_reference(self):
+        self.assertIs(get_chart_layers(self.reference), self.layers)
+        self.assertIs(self.layers.background("launch_angle", dpi=50),
+                      self.layers.background("launch_angle", dpi=50))
+
+    def test_dpi_is_snapped_to_cached_steps(self):
+        self.assertEqual(snap_dpi(50), 72)
+        self.assertEqual(snap_dpi(120), 100)
+        self.assertEqual(snap_dpi(599), 600)
+        backgrounds = {id(self.layers.background("barrel_zone", dpi=dpi)) for dpi in range(60, 90)}
+        self.assertEqual(len(backgrounds), 2)  # 72 and 100
+        self.assertEqual(self.layers.background("barrel_zone", dpi=71).dpi, 72)
+
+    def test_unknown_chart_type(self):
+        with self.assertRaises(ValueError):
+            self.layers.background("spin_rate")
+
+    def test_unknown_season(self):
+        with self.assertRaises(ValueError):
+            self.layers.distribution("ExitVelocity", season=1900)
+
+    def test_composite_matches_background_size(self):
+        for chart_type in CHART_TYPES:
+            background = self.layers.background(chart_type, dpi=50)
+            stream = background.composite(lambda ax: ax.axvline(sum(background.xlim) / 2, color="green"))
+            image = Image.open(stream)
+            self.assertEqual(image.size, background.image.size)
+
+    def test_generator_falls_back_outside_cached_axes(self):
+        generator = ChartGenerator(launch_angle=85.0, exit_velocity=200.0)
+        background = self.layers.background("barrel_zone")
+        self.assertFalse(background.contains(85.0, 200.0))
+        stream = generator.generate_single_chart("barrel_zone")
+        self.assertIsInstance(stream, BytesIO)
+        self.assertTrue(stream.getvalue().startswith(b"\x89PNG"))
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,137 @@
+import unittest
+import asyncio
+import json
+import sys
+import threading
+import time
+from pathlib import Path
+from unittest import mock
+
+backend_dir = Path(__file__).parent.parent
+sys.path.append(str(backend_dir))
+
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from app.routers import analysis, coaching
+from app.services import coaching_service
+from app.services.coaching_service import batch_coaching_feedback
+from app.services.video_service import MAX_BATCH_VIDEOS
+
+class FakeCoach:
+    """Stands in for generate_coaching_feedback, recording how many calls overlap"""
+    def __init__(self, delays=None, failing=()):
+        self.delays = delays or {}
+        self.failing = set(failing)
+        self.lock = threading.Lock()
+        self.running = 0
+        self.peak = 0
+        self.calls = []
+
+    def __call__(self, video_id, data):
+        with self.lock:
+            self.calls.append(video_id)
+            self.running += 1
+            self.peak = max(self.peak, self.running)
+        try:
+            time.sleep(self.delays.get(video_id, 0.05))
+            if video_id in self.failing:
+                raise RuntimeError("model unavailable")
+            return {"video_id": video_id, "feedback": f"Keep your hands back, {data['player']}"}
+        finally:
+            with self.lock:
+                self.running -= 1
+
+def documents_for(video_ids):
+    return {video_id: {"player": video_id, "analysis_results": {"launch_angle": 20.0, "exit_velocity": 90.0}}
+            for video_id in video_ids}
+
+class TestBatchCoachingFeedback(unittest.TestCase):
+    """Test batched coaching feedback: one document read, bounded concurrency, per-item errors"""
+    def run_batch(self, video_ids, documents, coach, concurrency=2):
+        async def collect():
+            return [result async for result in batch_coaching_feedback(video_ids, concurrency)]
+
+        get_documents = mock.Mock(return_value=documents)
+        with mock.patch.object(coaching_service, "get_video_documents", get_documents), \
+             mock.patch.object(coaching_service, "generate_coaching_feedback", coach):
+            results = asyncio.run(collect())
+        return results, get_documents
+
+    def test_concurrency_is_capped(self):
+        video_ids = [f"video-{i}" for i in range(8)]
+        coach = FakeCoach()
+        results, get_documents = self.run_batch(video_ids, documents_for(video_ids), coach, concurrency=3)
+        self.assertEqual(sorted(result["video_id"] for result in results), sorted(video_ids))
+        self.assertEqual(coach.peak, 3)
+        get_documents.assert_called_once_with(video_ids)
+
+    def test_results_come_in_completion_order(self):
+        video_ids = ["slow", "fast-1", "fast-2"]
+        coach = FakeCoach(delays={"slow": 0.4})
+        results, _ = self.run_batch(video_ids, documents_for(video_ids), coach)
+        self.assertEqual([result["video_id"] for result in results], ["fast-1", "fast-2", "slow"])
+
+    def test_missing_and_failed_videos_do_not_stop_the_batch(self):
+        video_ids = ["video-1", "missing", "broken", "video-2", "video-1"]
+        coach = FakeCoach(failing=["broken"])
+        results, _ = self.run_batch(video_ids, documents_for(["video-1", "broken", "video-2"]), coach)
+        by_id = {result["video_id"]: result for result in results}
+        self.assertEqual(len(results), 4)  # Duplicates are coached once
+        self.assertIn("No video found", by_id["missing"]["error"])
+        self.assertEqual(by_id["broken"]["error"], "model unavailable")
+        self.assertIn("feedback", by_id["video-1"])
+        self.assertIn("feedback", by_id["video-2"])
+        self.assertNotIn("missing", coach.calls)
+
+class TestBatchRoutes(unittest.TestCase):
+    """Test the NDJSON /coaching/feedback/batch and JSON /analysis/batch routes"""
+    def setUp(self):
+        app = FastAPI()
+        app.include_router(coaching.router, prefix="/coaching")
+        app.include_router(analysis.router, prefix="/analysis")
+        self.client = TestClient(app)
+
+    def test_feedback_batch_streams_ndjson(self):
+        video_ids = ["video-1", "missing", "broken"]
+        with mock.patch.object(coaching_service, "get_video_documents",
+                               return_value=documents_for(["video-1", "broken"])), \
+             mock.patch.object(coaching_service, "generate_coaching_feedback", FakeCoach(failing=["broken"])):
+            response = self.client.post("/coaching/feedback/batch", json={"video_ids": video_ids})
+
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.headers["content-type"].startswith("application/x-ndjson"))
+        lines = [json.loads(line) for line in response.text.splitlines()]
+        self.assertTrue(response.text.endswith("\n"))
+        self.assertEqual(sorted(line["video_id"] for line in lines), sorted(video_ids))
+        errors = {line["video_id"] for line in lines if "error" in line}
+        self.assertEqual(errors, {"missing", "broken"})
+
+    def test_feedback_batch_limits(self):
+        self.assertEqual(self.client.post("/coaching/feedback/batch", json={"video_ids": []}).status_code, 400)
+        too_many = [f"video-{i}" for i in range(MAX_BATCH_VIDEOS + 1)]
+        self.assertEqual(self.client.post("/coaching/feedback/batch", json={"video_ids": too_many}).status_code, 400)
+
+    def test_analysis_batch(self):
+        documents = {
+            "done": {"status": "completed", "analysis_results": {"launch_angle": 20.0}},
+            "pending": {"status": "processing"}
+        }
+        with mock.patch.object(analysis, "get_video_documents", return_value=documents) as get_documents:
+            response = self.client.post("/analysis/batch", json={"video_ids": ["done", "missing", "pending", "done"]})
+
+        get_documents.assert_called_once()
+        results = response.json()["results"]
+        self.assertEqual([result["video_id"] for result in results], ["done", "missing", "pending"])
+        self.assertEqual(results[0]["analysis"], {"launch_angle": 20.0})
+        self.assertEqual(results[1]["error"], "Video not found")
+        self.assertEqual(results[2]["status"], "processing")
+        self.assertIn("error", results[2])
+
+    def test_analysis_batch_errors(self):
+        too_many = [f"video-{i}" for i in range(MAX_BATCH_VIDEOS + 1)]
+        self.assertEqual(self.client.post("/analysis/batch", json={"video_ids": too_many}).status_code, 400)
+        with mock.patch.object(analysis, "get_video_documents", side_effect=RuntimeError("firestore down")):
+            self.assertEqual(self.client.post("/analysis/batch", json={"video_ids": ["video-1"]}).status_code, 500)
+
+if __name__ == "__main__":
+    unittest.main()
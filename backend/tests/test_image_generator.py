@@ -14,7 +14,9 @@ from utils.image_generator import (
     GCSUploader,
     generate_and_upload_images
 )
+import utils.image_generator as image_generator
 from io import BytesIO
+from unittest import mock
 
 def setUpModule():
     """Global test setup that runs once before all tests"""
@@ -72,6 +74,37 @@ class TestChartGenerator(unittest.TestCase):
         with self.assertRaises(ValueError):
             self.generator.generate_single_chart("invalid_type")
 
+class TestImageFormats(unittest.TestCase):
+    """Test output formats and resolution options"""
+    def test_webp_and_svg(self):
+        webp = ChartGenerator(20.0, 90.0, image_format="webp", dpi=72).generate_single_chart("launch_angle")
+        self.assertEqual(webp.getvalue()[8:12], b"WEBP")
+        svg = ChartGenerator(20.0, 90.0, image_format="svg", dpi=72).generate_single_chart("exit_velocity")
+        self.assertIn(b"<svg", svg.getvalue())
+
+    def test_lower_dpi_is_smaller(self):
+        small = ChartGenerator(20.0, 90.0, dpi=72).generate_single_chart("barrel_zone")
+        large = ChartGenerator(20.0, 90.0, dpi=150).generate_single_chart("barrel_zone")
+        self.assertLess(len(small.getvalue()), len(large.getvalue()))
+
+    def test_invalid_options(self):
+        with self.assertRaises(ValueError):
+            ChartGenerator(20.0, 90.0, image_format="gif")
+        with self.assertRaises(ValueError):
+            ChartGenerator(20.0, 90.0, dpi=5000)
+
+    def test_generate_and_upload_in_parallel(self):
+        uploads = []
+        bucket = mock.Mock()
+        bucket.blob.side_effect = lambda name: mock.Mock(
+            upload_from_file=lambda stream, content_type: uploads.append((name, content_type)))
+        with mock.patch.object(image_generator, "get_images_bucket", return_value=bucket):
+            images = generate_and_upload_images("test_video_123", 20.0, 90.0, image_format="webp", dpi=72)
+
+        self.assertEqual(set(images), {"barrel_zone", "exit_velocity", "launch_angle"})
+        self.assertTrue(all(url.endswith(".webp") for url in images.values()))
+        self.assertEqual({content_type for _, content_type in uploads}, {"image/webp"})
+
 class TestGCSUploader(unittest.TestCase):
     """Test Google Cloud Storage upload functionality"""
     def setUp(self):
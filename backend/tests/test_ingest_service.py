@@ -0,0 +1,86 @@
+import unittest
+import sys
+import struct
+import cv2
+import tempfile
+import shutil
+from pathlib import Path
+
+backend_dir = Path(__file__).parent.parent
+sys.path.append(str(backend_dir))
+sys.path.append(str(Path(__file__).parent))
+
+from app.services.advancedTracker import BaseballTracker
+from app.services.ingest_service import BlobPipe, has_faststart, is_streamable
+from test_tracker import write_synthetic_clip
+
+class FakeBlob:
+    """In-memory stand-in for a GCS blob that serves ranged reads"""
+    def __init__(self, name, data):
+        self.name = name
+        self.data = data
+        self.size = len(data)
+        self.requests = 0
+
+    def reload(self):
+        pass
+
+    def download_as_bytes(self, start=0, end=None):
+        self.requests += 1
+        return self.data[start:end + 1]
+
+def box(box_type, payload=b""):
+    return struct.pack(">I4s", 8 + len(payload), box_type) + payload
+
+class TestContainerLayout(unittest.TestCase):
+    """Test detection of streamable containers"""
+    def test_faststart_mp4(self):
+        data = box(b"ftyp", b"isom" * 4) + box(b"moov", b"x" * 64) + box(b"mdat", b"y" * 256)
+        self.assertTrue(has_faststart(FakeBlob("a.mp4", data), len(data)))
+        self.assertTrue(is_streamable(FakeBlob("a.mp4", data), "a.mp4"))
+
+    def test_moov_at_end(self):
+        data = box(b"ftyp", b"isom" * 4) + box(b"mdat", b"y" * 256) + box(b"moov", b"x" * 64)
+        self.assertFalse(is_streamable(FakeBlob("a.mov", data), "a.mov"))
+
+    def test_stream_containers(self):
+        self.assertTrue(is_streamable(FakeBlob("a.avi", b""), "a.avi"))
+        self.assertFalse(is_streamable(FakeBlob("a.bin", b""), "a.bin"))
+
+class TestBlobPipe(unittest.TestCase):
+    """Test tracking a video while it streams through a pipe"""
+    @classmethod
+    def setUpClass(cls):
+        cls.tmp_dir = Path(tempfile.mkdtemp())
+        cls.video_path = cls.tmp_dir / "clip.avi"
+        cls.centers = write_synthetic_clip(cls.video_path, n_frames=120, start_frame=60)
+
+    @classmethod
+    def tearDownClass(cls):
+        shutil.rmtree(cls.tmp_dir, ignore_errors=True)
+
+    def test_track_from_pipe(self):
+        blob = FakeBlob("clip.avi", self.video_path.read_bytes())
+        pipe = BlobPipe(blob, chunk_size=64 * 1024)
+        with pipe as pipe_path:
+            tracker = BaseballTracker(pipe_path, probe=False, capture_api=cv2.CAP_FFMPEG)
+            _, streamed = tracker.track_swing_stream()
+        self.assertEqual(pipe.bytes_written, blob.size)
+        self.assertGreater(blob.requests, 1)
+        self.assertEqual(tracker.fps, 30)
+
+        self.assertGreater(len(streamed), 3)
+        for frame_index, (x, y) in zip(tracker.frame_indices, streamed):
+            cx, cy = self.centers[frame_index]
+            self.assertAlmostEqual(x, cx, delta=2)
+            self.assertAlmostEqual(y, cy, delta=2)
+
+    def test_fetch_error_is_raised(self):
+        blob = FakeBlob("clip.avi", self.video_path.read_bytes())
+        blob.download_as_bytes = lambda start=0, end=None: (_ for _ in ()).throw(IOError("network down"))
+        with self.assertRaises(ValueError):
+            with BlobPipe(blob) as pipe_path:
+                BaseballTracker(pipe_path, probe=False, capture_api=cv2.CAP_FFMPEG).track_swing_stream()
+
+if __name__ == "__main__":
+    unittest.main()
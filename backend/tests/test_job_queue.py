@@ -0,0 +1,247 @@
+import unittest
+import sys
+import threading
+import time
+from pathlib import Path
+from unittest import mock
+
+backend_dir = Path(__file__).parent.parent
+sys.path.append(str(backend_dir))
+
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from app.routers import analysis
+from app.services.job_queue import JobQueue, SQLiteJobStore, new_job
+
+class TestSQLiteJobStore(unittest.TestCase):
+    """Test job claiming order and lease recovery"""
+    def setUp(self):
+        self.store = SQLiteJobStore()
+
+    def test_interactive_lane_is_claimed_first(self):
+        bulk = new_job("bulk-video", lane="bulk")
+        interactive = new_job("interactive-video", lane="interactive")
+        self.store.enqueue(bulk)
+        self.store.enqueue(interactive)
+
+        first = self.store.claim()
+        self.assertEqual(first["video_id"], "interactive-video")
+        self.assertEqual(first["status"], "running")
+        self.assertEqual(first["attempts"], 1)
+        self.assertEqual(self.store.claim()["video_id"], "bulk-video")
+        self.assertIsNone(self.store.claim())
+
+    def test_expired_lease_is_reclaimed(self):
+        self.store.enqueue(new_job("video"))
+        job = self.store.claim(lease_seconds=0.05)
+        self.assertIsNone(self.store.claim())
+        time.sleep(0.1)
+        reclaimed = self.store.claim()
+        self.assertEqual(reclaimed["job_id"], job["job_id"])
+        self.assertEqual(reclaimed["attempts"], 2)
+
+    def test_renew_extends_running_lease(self):
+        self.store.enqueue(new_job("video"))
+        job = self.store.claim(lease_seconds=0.05, worker="worker-1")
+        self.assertFalse(self.store.renew(job["job_id"], "worker-2", time.time() + 60))
+        self.assertTrue(self.store.renew(job["job_id"], "worker-1", time.time() + 60))
+        time.sleep(0.1)
+        self.assertIsNone(self.store.claim())
+        self.assertGreater(self.store.get(job["job_id"])["lease_until"], time.time() + 30)
+
+    def test_reclaimed_job_ignores_the_old_worker(self):
+        self.store.enqueue(new_job("video"))
+        stale = self.store.claim(lease_seconds=0.05, worker="worker-1")
+        time.sleep(0.1)
+        current = self.store.claim(worker="worker-2")
+        self.assertFalse(self.store.renew(stale["job_id"], "worker-1", time.time() + 60))
+        stale["status"] = "succeeded"
+        self.assertFalse(self.store.complete(stale))
+        self.assertEqual(self.store.get(stale["job_id"])["status"], "running")
+        current["status"] = "failed"
+        self.assertTrue(self.store.fail(current))
+        self.assertEqual(self.store.get(stale["job_id"])["status"], "failed")
+
+    def test_promote_only_queued_jobs(self):
+        queued = new_job("queued-video", lane="bulk")
+        running = new_job("running-video", lane="bulk")
+        self.store.enqueue(running)
+        self.store.claim()
+        self.store.enqueue(queued)
+        self.assertTrue(self.store.promote(queued["job_id"], "interactive"))
+        self.assertFalse(self.store.promote(queued["job_id"], "interactive"))
+        self.assertFalse(self.store.promote(running["job_id"], "interactive"))
+        self.assertEqual(self.store.get(queued["job_id"])["lane"], "interactive")
+        self.assertEqual(self.store.get(running["job_id"])["status"], "running")
+        self.assertEqual(self.store.get(running["job_id"])["lane"], "bulk")
+
+    def test_find_active(self):
+        job = new_job("video")
+        self.store.enqueue(job)
+        self.assertEqual(self.store.find_active("video")["job_id"], job["job_id"])
+        job["status"] = "succeeded"
+        self.store.update(job)
+        self.assertIsNone(self.store.find_active("video"))
+
+    def test_unknown_lane(self):
+        with self.assertRaises(ValueError):
+            new_job("video", lane="urgent")
+
+class TestJobQueue(unittest.TestCase):
+    """Test worker pool execution, retries and status updates"""
+    def setUp(self):
+        self.updates = []
+        self.done = threading.Event()
+
+    def make_queue(self, handler, workers=2):
+        queue = JobQueue(SQLiteJobStore(), handler, workers=workers, poll_interval=0.01,
+                         backoff_base=0.01, on_update=lambda job: self.updates.append(dict(job)))
+        self.addCleanup(queue.stop, 1)
+        return queue
+
+    def wait_for(self, queue, job_id, status, timeout=5):
+        deadline = time.time() + timeout
+        while time.time() < deadline:
+            job = queue.store.get(job_id)
+            if job["status"] == status:
+                return job
+            time.sleep(0.01)
+        self.fail(f"Job {job_id} did not reach {status}")
+
+    def test_job_succeeds(self):
+        processed = []
+        queue = self.make_queue(processed.append)
+        queue.start()
+        job = queue.enqueue("video-1")
+
+        finished = self.wait_for(queue, job["job_id"], "succeeded")
+        self.assertEqual(processed, ["video-1"])
+        self.assertIsNotNone(finished["finished_at"])
+        self.assertEqual([u["status"] for u in self.updates], ["queued", "running", "succeeded"])
+
+    def test_retries_with_backoff_then_fails(self):
+        attempts = []
+        def flaky(video_id):
+            attempts.append(time.time())
+            raise ValueError("tracker crashed")
+
+        queue = self.make_queue(flaky, workers=1)
+        queue.start()
+        job = queue.enqueue("video-2", max_attempts=3)
+
+        failed = self.wait_for(queue, job["job_id"], "failed")
+        self.assertEqual(len(attempts), 3)
+        self.assertEqual(failed["attempts"], 3)
+        self.assertEqual(failed["error"], "tracker crashed")
+
+    def test_recovers_after_retry(self):
+        calls = []
+        def flaky_once(video_id):
+            calls.append(video_id)
+            if len(calls) == 1:
+                raise ValueError("transient")
+
+        queue = self.make_queue(flaky_once, workers=1)
+        queue.start()
+        job = queue.enqueue("video-3")
+        finished = self.wait_for(queue, job["job_id"], "succeeded")
+        self.assertEqual(finished["attempts"], 2)
+        self.assertIsNone(finished["error"])
+
+    def test_worker_pool_limits_concurrency(self):
+        running, peak = [0], [0]
+        lock = threading.Lock()
+        def slow(video_id):
+            with lock:
+                running[0] += 1
+                peak[0] = max(peak[0], running[0])
+            time.sleep(0.02)
+            with lock:
+                running[0] -= 1
+
+        queue = self.make_queue(slow, workers=3)
+        queue.start()
+        jobs = [queue.enqueue(f"video-{i}", lane="bulk") for i in range(20)]
+        for job in jobs:
+            self.wait_for(queue, job["job_id"], "succeeded")
+        self.assertLessEqual(peak[0], 3)
+
+    def test_long_job_keeps_its_lease(self):
+        calls = []
+        def slow(video_id):
+            calls.append(video_id)
+            time.sleep(0.5)
+
+        queue = JobQueue(SQLiteJobStore(), slow, workers=2, poll_interval=0.01, on_update=None, lease_seconds=0.15)
+        self.addCleanup(queue.stop, 1)
+        queue.start()
+        job = queue.enqueue("video-long")
+        finished = self.wait_for(queue, job["job_id"], "succeeded")
+        # Without renewal the second worker would reclaim the job after 0.15 s
+        self.assertEqual(calls, ["video-long"])
+        self.assertEqual(finished["attempts"], 1)
+        self.assertIsNone(finished["lease_until"])
+
+    def test_ensure_job_reuses_and_promotes(self):
+        queue = self.make_queue(lambda video_id: None)
+        bulk = queue.enqueue("video-1", lane="bulk")
+        job = queue.ensure_job("video-1", "interactive")
+        self.assertEqual(job["job_id"], bulk["job_id"])
+        self.assertEqual(queue.store.get(bulk["job_id"])["lane"], "interactive")
+        self.assertEqual(queue.store.counts(), {"queued": 1})
+        self.assertNotEqual(queue.ensure_job("video-2")["job_id"], bulk["job_id"])
+
+class TestProcessEndpoint(unittest.TestCase):
+    """Test that /analysis/process waits on the worker pool instead of tracking inline"""
+    def setUp(self):
+        self.docs = {"video-1": {"status": "processing", "content_hash": "hash-1"}}
+        self.tracked = []
+
+        def handler(video_id):
+            self.tracked.append(video_id)
+            time.sleep(0.1)
+            self.docs[video_id].update(status="completed", analysis_results={"launch_angle": 20.0, "exit_velocity": 90.0})
+
+        def document(video_id):
+            doc_ref = mock.Mock()
+            doc_ref.get.side_effect = lambda: mock.Mock(exists=video_id in self.docs,
+                                                        to_dict=lambda: dict(self.docs.get(video_id, {})))
+            doc_ref.update.side_effect = lambda fields: self.docs[video_id].update(fields)
+            return doc_ref
+
+        client = mock.Mock()
+        client.collection.return_value.document.side_effect = document
+        self.queue = JobQueue(SQLiteJobStore(), handler, workers=2, poll_interval=0.01, on_update=None)
+        self.addCleanup(self.queue.stop, 1)
+        for target, value in (("firestore_client", client), ("get_job_queue", lambda: self.queue),
+                              ("get_cached_analysis", lambda content_hash: None),
+                              ("store_cached_analysis", mock.Mock()), ("JOB_POLL_SECONDS", 0.01),
+                              ("generate_and_upload_images", mock.Mock(return_value={"launch_angle": "url"}))):
+            patcher = mock.patch.object(analysis, target, value)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        app = FastAPI()
+        app.include_router(analysis.router, prefix="/analysis")
+        self.client = TestClient(app)
+
+    def test_reuses_the_upload_job(self):
+        job = self.queue.enqueue("video-1", lane="bulk")
+        self.queue.start()
+        response = self.client.post("/analysis/process", json={"video_id": "video-1"})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()["analysis"]["exit_velocity"], 90.0)
+        self.assertEqual(self.tracked, ["video-1"])
+        self.assertEqual(self.queue.store.get(job["job_id"])["status"], "succeeded")
+
+    def test_returns_202_when_the_job_is_slow(self):
+        with mock.patch.object(analysis, "PROCESS_WAIT_SECONDS", 0):
+            response = self.client.post("/analysis/process", json={"video_id": "video-1"})
+        self.assertEqual(response.status_code, 202)
+        self.assertEqual(response.json()["status"], "processing")
+        self.assertEqual(self.queue.store.get(response.json()["job_id"])["lane"], "interactive")
+
+    def test_missing_video(self):
+        self.assertEqual(self.client.post("/analysis/process", json={"video_id": "nope"}).status_code, 404)
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,178 @@
+import unittest
+import asyncio
+import shutil
+import sys
+import tempfile
+from pathlib import Path
+from unittest import mock
+
+import cv2
+import numpy as np
+
+backend_dir = Path(__file__).parent.parent
+sys.path.append(str(backend_dir))
+sys.path.append(str(Path(__file__).parent))
+
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from starlette.websockets import WebSocketDisconnect
+from app.routers import live
+from app.routers.live import LatestFrame
+from app.services.advancedTracker import BaseballTracker
+from app.services.liveTracker import LIVE_SCALES, LiveSwingTracker, TrajectoryFit, decode_frame
+from test_tracker import write_synthetic_clip
+
+def read_frames(path):
+    cap = cv2.VideoCapture(str(path))
+    frames = []
+    while True:
+        ok, frame = cap.read()
+        if not ok:
+            break
+        frames.append(frame)
+    cap.release()
+    return frames
+
+class TestLiveSwingTracker(unittest.TestCase):
+    """Test incremental tracking of frames that arrive one at a time"""
+    @classmethod
+    def setUpClass(cls):
+        cls.tmp_dir = Path(tempfile.mkdtemp())
+        cls.video_path = cls.tmp_dir / "clip.avi"
+        write_synthetic_clip(cls.video_path)
+        cls.frames = read_frames(cls.video_path)
+
+    @classmethod
+    def tearDownClass(cls):
+        shutil.rmtree(cls.tmp_dir, ignore_errors=True)
+
+    def test_fit_matches_offline_trajectory(self):
+        rng = np.random.default_rng(7)
+        x = np.sort(rng.uniform(0, 1280, 40))
+        points = np.column_stack([x, 600 - 0.8 * x + 0.0004 * x ** 2 + rng.normal(0, 2, 40)])
+        tracker = BaseballTracker(None, probe=False)
+        tracker.fps = 60.0
+        fit = TrajectoryFit(60.0)
+        for point in points:
+            fit.add(*point)
+        expected = tracker._analyze_trajectory(points.tolist())
+        self.assertAlmostEqual(fit.result()["launch_angle"], expected["launch_angle"], places=6)
+        self.assertAlmostEqual(fit.result()["exit_velocity"], expected["exit_velocity"], places=6)
+
+    def test_live_frames_match_offline_tracking(self):
+        offline = BaseballTracker(str(self.video_path), motion_gate=True)
+        expected, _ = offline.track_baseball()
+        tracker = LiveSwingTracker(fps=offline.fps, frame_budget_ms=float("inf"))
+        updates = [tracker.process(frame) for frame in self.frames]
+
+        self.assertEqual(tracker.frame_indices, offline.frame_indices)
+        self.assertIsNone(updates[0]["result"])
+        for metric in ("launch_angle", "exit_velocity"):
+            self.assertAlmostEqual(updates[-1]["result"][metric], expected[metric], places=6)
+
+    def test_slow_frames_shrink_the_detection_scale(self):
+        tracker = LiveSwingTracker(fps=30.0, motion_gate=False, frame_budget_ms=0)
+        updates = [tracker.process(frame) for frame in self.frames[10:20]]
+        self.assertEqual(updates[0]["scale"], LIVE_SCALES[0])
+        self.assertEqual(updates[-1]["scale"], LIVE_SCALES[-1])
+        # Positions stay in full-frame pixels at every scale
+        full = LiveSwingTracker(fps=30.0, motion_gate=False, frame_budget_ms=float("inf"))
+        for frame, update in zip(self.frames[10:20], updates):
+            expected = full.process(frame)["position"]
+            np.testing.assert_allclose(update["position"], expected, atol=3)
+
+    def test_reset_starts_a_new_swing(self):
+        tracker = LiveSwingTracker(fps=30.0)
+        for frame in self.frames:
+            tracker.process(frame)
+        tracker.reset()
+        self.assertEqual(tracker.summary()["points"], 0)
+        self.assertIsNone(tracker.summary()["result"])
+
+    def test_new_frame_size_starts_a_new_swing(self):
+        tracker = LiveSwingTracker(fps=30.0, frame_budget_ms=float("inf"))
+        for frame in self.frames:
+            tracker.process(frame)
+        self.assertGreater(tracker.fit.count, 3)
+        smaller = [cv2.resize(frame, (161, 121)) for frame in self.frames[:3]]
+        updates = [tracker.process(frame) for frame in smaller]
+        self.assertEqual([update["restarted"] for update in updates], [True, False, False])
+        self.assertEqual(tracker.frames, 3)
+
+    def test_decode_and_options(self):
+        frame = self.frames[0]
+        self.assertEqual(decode_frame(frame.tobytes(), "bgr", 320, 240).shape, frame.shape)
+        jpeg = cv2.imencode(".jpg", frame)[1].tobytes()
+        self.assertEqual(decode_frame(jpeg).shape, frame.shape)
+        with self.assertRaises(ValueError):
+            decode_frame(b"not a jpeg")
+        with self.assertRaises(ValueError):
+            decode_frame(frame.tobytes()[:-1], "bgr", 320, 240)
+        with self.assertRaises(ValueError):
+            LiveSwingTracker.from_options({"format": "bgr"})
+        with self.assertRaises(ValueError):
+            LiveSwingTracker.from_options({"fps": 0})
+
+class TestLatestFrame(unittest.TestCase):
+    """Test that waiting frames are replaced rather than queued"""
+    def test_newer_frame_replaces_waiting_one(self):
+        async def run():
+            frames = LatestFrame()
+            for index in range(5):
+                frames.put(index)
+            return await frames.take(), frames.dropped, frames.item
+        self.assertEqual(asyncio.run(run()), (4, 4, None))
+
+class TestLiveWebSocket(unittest.TestCase):
+    """Test the /live/ws frame streaming protocol"""
+    def setUp(self):
+        self.tmp_dir = Path(tempfile.mkdtemp())
+        write_synthetic_clip(self.tmp_dir / "clip.avi")
+        self.frames = read_frames(self.tmp_dir / "clip.avi")
+        app = FastAPI()
+        app.include_router(live.router, prefix="/live")
+        self.client = TestClient(app)
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir, ignore_errors=True)
+
+    def test_streamed_frames_get_provisional_results(self):
+        with self.client.websocket_connect("/live/ws") as websocket:
+            websocket.send_json({"action": "start", "fps": 30, "format": "bgr", "width": 320, "height": 240})
+            self.assertEqual(websocket.receive_json()["event"], "started")
+            updates = []
+            for frame in self.frames:
+                websocket.send_bytes(frame.tobytes())
+                updates.append(websocket.receive_json())
+            websocket.send_json({"action": "stop"})
+            final = websocket.receive_json()
+
+        self.assertEqual([update["frame"] for update in updates], list(range(len(self.frames))))
+        self.assertTrue(all(update["event"] == "frame" and update["provisional"] for update in updates))
+        self.assertEqual(final["event"], "final")
+        self.assertEqual(final["result"], updates[-1]["result"])
+        self.assertGreater(final["points"], 3)
+
+    def test_errors_are_reported(self):
+        with self.client.websocket_connect("/live/ws") as websocket:
+            websocket.send_bytes(b"frame before start")
+            self.assertEqual(websocket.receive_json()["event"], "error")
+            websocket.send_json({"action": "start", "format": "png"})
+            self.assertIn("format", websocket.receive_json()["error"])
+            websocket.send_json({"action": "start"})
+            self.assertEqual(websocket.receive_json()["event"], "started")
+            websocket.send_bytes(b"not a jpeg")
+            self.assertEqual(websocket.receive_json()["event"], "error")
+
+    def test_analysis_failure_closes_the_socket(self):
+        with mock.patch.object(LiveSwingTracker, "process", side_effect=cv2.error("Sizes do not match")):
+            with self.client.websocket_connect("/live/ws") as websocket:
+                websocket.send_json({"action": "start", "fps": 30, "format": "bgr", "width": 320, "height": 240})
+                websocket.receive_json()
+                websocket.send_bytes(self.frames[0].tobytes())
+                with self.assertRaises(WebSocketDisconnect) as closed:
+                    websocket.receive_json()
+        self.assertEqual(closed.exception.code, 1011)
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,166 @@
+import unittest
+import unittest.mock
+import sys
+import asyncio
+import threading
+import time
+from pathlib import Path
+
+backend_dir = Path(__file__).parent.parent
+sys.path.append(str(backend_dir))
+
+from app.services import llm_service
+from app.services.llm_service import (
+    ResponseCache, StubModel, generate_text, set_model_factory, stream_text, stream_with_budget, format_sse
+)
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+class TestResponseCache(unittest.TestCase):
+    def test_lru_eviction(self):
+        cache = ResponseCache(max_entries=2, ttl_seconds=60)
+        cache.put("a", 1)
+        cache.put("b", 2)
+        cache.get("a")  # b is now least recently used
+        cache.put("c", 3)
+
+        self.assertEqual(cache.get("a"), 1)
+        self.assertIsNone(cache.get("b"))
+        self.assertEqual(cache.get("c"), 3)
+        self.assertEqual(cache.stats["evictions"], 1)
+
+    def test_ttl_expiry(self):
+        clock = FakeClock()
+        cache = ResponseCache(max_entries=10, ttl_seconds=30, clock=clock)
+        cache.put("a", 1)
+        clock.now = 29
+        self.assertEqual(cache.get("a"), 1)
+        clock.now = 30
+        self.assertIsNone(cache.get("a"))
+
+    def test_concurrent_requests_share_one_call(self):
+        cache = ResponseCache()
+        model = StubModel(delay=0.2)
+        results = []
+
+        def request():
+            results.append(cache.get_or_compute("key", lambda: model.generate_content("prompt").text))
+
+        threads = [threading.Thread(target=request) for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(model.calls, 1)
+        self.assertEqual(len(set(results)), 1)
+        self.assertEqual(len(results), 8)
+        self.assertEqual(cache.stats["misses"], 1)
+        self.assertEqual(cache.stats["coalesced"], 7)
+
+        cache.get_or_compute("key", lambda: model.generate_content("prompt").text)
+        self.assertEqual(model.calls, 1)
+        self.assertEqual(cache.stats["hits"], 1)
+
+    def test_errors_are_shared_but_not_cached(self):
+        cache = ResponseCache()
+        calls = []
+        started = threading.Event()
+
+        def failing():
+            calls.append(1)
+            started.set()
+            time.sleep(0.1)
+            raise RuntimeError("quota exceeded")
+
+        errors = []
+        def request():
+            try:
+                cache.get_or_compute("key", failing)
+            except RuntimeError as e:
+                errors.append(e)
+
+        leader = threading.Thread(target=request)
+        leader.start()
+        started.wait()
+        follower = threading.Thread(target=request)
+        follower.start()
+        leader.join()
+        follower.join()
+
+        self.assertEqual(len(calls), 1)
+        self.assertEqual(len(errors), 2)
+        self.assertEqual(cache.get_or_compute("key", lambda: "recovered"), "recovered")
+
+class TestModelFactory(unittest.TestCase):
+    def tearDown(self):
+        set_model_factory(None)
+
+    def test_stub_model(self):
+        stub = StubModel()
+        set_model_factory(lambda name: stub)
+        text = generate_text("prompt")
+        self.assertEqual(text, generate_text("prompt"))
+        self.assertEqual(stub.calls, 2)
+
+        streamed = "".join(chunk.text for chunk in stub.generate_content("prompt", stream=True))
+        self.assertEqual(streamed, text)
+
+    def test_stub_selected_by_environment(self):
+        with unittest.mock.patch.dict("os.environ", {"LLM_MODEL": "stub"}):
+            self.assertIsInstance(llm_service.get_model(), StubModel)
+
+async def slow_chunks(delays):
+    for i, delay in enumerate(delays):
+        await asyncio.sleep(delay)
+        yield f"chunk{i} "
+
+async def collect(chunks, first_item_seconds, total_seconds):
+    items = []
+    try:
+        async for item in stream_with_budget(chunks, first_item_seconds, total_seconds):
+            items.append(item)
+    except asyncio.TimeoutError:
+        return items, True
+    return items, False
+
+class TestStreaming(unittest.TestCase):
+    def tearDown(self):
+        set_model_factory(None)
+
+    def test_stream_within_budget(self):
+        items, timed_out = asyncio.run(collect(slow_chunks([0.01, 0.01, 0.01]), 1, 1))
+        self.assertEqual(items, ["chunk0 ", "chunk1 ", "chunk2 "])
+        self.assertFalse(timed_out)
+
+    def test_first_item_budget(self):
+        items, timed_out = asyncio.run(collect(slow_chunks([0.5, 0.01]), 0.05, 5))
+        self.assertEqual(items, [])
+        self.assertTrue(timed_out)
+
+    def test_total_budget(self):
+        items, timed_out = asyncio.run(collect(slow_chunks([0.01, 0.01, 0.5, 0.01]), 1, 0.2))
+        self.assertEqual(items, ["chunk0 ", "chunk1 "])
+        self.assertTrue(timed_out)
+
+    def test_stream_text_from_stub(self):
+        stub = StubModel()
+        set_model_factory(lambda name: stub)
+
+        async def run():
+            return [text async for text in stream_text("prompt")]
+
+        chunks = asyncio.run(run())
+        self.assertGreater(len(chunks), 1)
+        self.assertEqual("".join(chunks), stub.generate_content("prompt").text)
+
+    def test_format_sse(self):
+        self.assertEqual(format_sse("token", {"text": "hi"}), 'event: token\ndata: {"text": "hi"}\n\n')
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,53 @@
+import unittest
+import sys
+import numpy as np
+from pathlib import Path
+
+backend_dir = Path(__file__).parent.parent
+sys.path.append(str(backend_dir))
+
+from app.services.percentileTable import PercentileTable, ALL_SEASONS
+
+class TestPercentileTable(unittest.TestCase):
+    def setUp(self):
+        rng = np.random.default_rng(0)
+        n = 2000
+        self.metrics = np.column_stack([
+            rng.integers(10, 45, n).astype(np.float32),              # LaunchAngle
+            np.round(rng.normal(103, 4, n), 1).astype(np.float32),  # ExitVelocity
+            rng.normal(400, 25, n).astype(np.float32),              # HitDistance
+        ])
+        self.metrics[::50, 2] = np.nan
+        self.seasons = np.where(np.arange(n) < 1200, 2017, 2024).astype(np.int16)
+        self.table = PercentileTable(self.metrics, self.seasons)
+
+    def test_percentile_and_rank_match_brute_force(self):
+        ev = self.metrics[self.seasons == 2024, 1].astype(np.float64)
+        for value in (90.0, 103.0, float(ev[5]), 120.0):
+            below, equal = np.sum(ev < value), np.sum(ev == value)
+            expected = 100 * (below + equal / 2) / len(ev)
+            self.assertAlmostEqual(self.table.percentile("ExitVelocity", value), expected)
+            self.assertEqual(self.table.rank("ExitVelocity", value), int(np.sum(ev > value)) + 1)
+
+    def test_missing_values_are_ignored(self):
+        distances = self.metrics[:, 2]
+        self.assertEqual(self.table.describe(25, 100, 400, ALL_SEASONS)["metrics"]["HitDistance"]["total"],
+                         int(np.sum(~np.isnan(distances))))
+
+    def test_joint_percentile_matches_brute_force(self):
+        la, ev = self.metrics[:, 0], self.metrics[:, 1]
+        for point in ((25, 103), (10, 90), (44, 115.5), (30.5, 101.25)):
+            expected = 100 * np.mean((la <= point[0]) & (ev <= point[1]))
+            self.assertAlmostEqual(self.table.joint_percentile(*point, season=ALL_SEASONS), expected)
+        self.assertEqual(self.table.joint_percentile(5, 80, ALL_SEASONS), 0.0)
+        self.assertEqual(self.table.joint_percentile(90, 200, ALL_SEASONS), 100.0)
+
+    def test_seasons(self):
+        self.assertEqual(self.table.latest_season, 2024)
+        self.assertEqual(self.table.describe(25, 100)["season"], 2024)
+        self.assertEqual(self.table.describe(25, 100, season="2017")["season"], 2017)
+        with self.assertRaises(ValueError):
+            self.table.percentile("LaunchAngle", 25, season=2019)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,111 @@
+import unittest
+import sys
+import tempfile
+import shutil
+import os
+import time
+import numpy as np
+from pathlib import Path
+
+backend_dir = Path(__file__).parent.parent
+sys.path.append(str(backend_dir))
+
+from app.services.playerData import PlayerData
+
+ROWS = [
+    ("a", "Player A homers", "100.0", "400", "25"),
+    ("b", "Player B homers", "105.0", "420", "30"),
+    ("c", "Player C homers", "95.0", "380", "20"),
+    ("d", "Player D homers", "110.0", "450", "35"),
+    ("e", "Player E homers", "", "", "28"),
+    ("f", "Player F homers", "101.0", "", "26"),
+]
+
+class TestPlayerData(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        self.path = os.path.join(self.tmp_dir, "players.csv")
+        with open(self.path, "w") as f:
+            f.write("play_id,title,ExitVelocity,HitDistance,LaunchAngle,video\n")
+            for row in ROWS:
+                f.write(",".join(row) + f",https://example.com/{row[0]}.mp4\n")
+        self.cache_dir = os.path.join(self.tmp_dir, "cache")
+        self.players = PlayerData(self.path, cache_dir=self.cache_dir)
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir)
+
+    def brute_force(self, launch_angle, exit_velocity):
+        scale = self.players.index_scale
+        mean = self.players.index_mean
+        distances = {}
+        for player_id, data in self.players.get_all_players().items():
+            if not data['ExitVelocity']:
+                continue
+            la = (float(data['LaunchAngle']) - launch_angle) / scale[0]
+            ev = (float(data['ExitVelocity']) - exit_velocity) / scale[1]
+            distances[player_id] = np.hypot(la, ev)
+        return sorted(distances, key=distances.get)
+
+    def test_nearest_players_matches_brute_force(self):
+        matches = self.players.nearest_players(27, 102, k=3)
+        self.assertEqual([m['play_id'] for m in matches], self.brute_force(27, 102)[:3])
+        self.assertEqual(matches[0]['title'], "Player F homers")
+        self.assertLessEqual(matches[0]['distance'], matches[1]['distance'])
+
+    def test_rows_without_metrics_are_skipped(self):
+        ids = [m['play_id'] for m in self.players.nearest_players(28, 100, k=10)]
+        self.assertNotIn("e", ids)
+        self.assertEqual(len(ids), 5)
+
+    def test_hit_distance_uses_three_dimensions(self):
+        ids = [m['play_id'] for m in self.players.nearest_players(26, 101, k=10, hit_distance=400)]
+        self.assertNotIn("f", ids)  # No hit distance
+        self.assertEqual(ids[0], "a")
+
+    def test_players_within_radius(self):
+        within = self.players.players_within(25, 100, radius=0.5)
+        self.assertEqual([m['play_id'] for m in within], ["a", "f"])
+        self.assertEqual(len(self.players.players_within(25, 100, radius=100, limit=2)), 2)
+        self.assertEqual(self.players.players_within(90, 10, radius=0.1), [])
+
+    def test_columns(self):
+        self.assertEqual(len(self.players), len(ROWS))
+        self.assertEqual(self.players.metrics.dtype, np.float32)
+        self.assertEqual(self.players.get_player_data("b")["ExitVelocity"], 105.0)
+        self.assertIsNone(self.players.get_player_data("e")["HitDistance"])
+        self.assertIsNone(self.players.get_player_data("missing"))
+
+    def test_cache_is_reused_until_csv_changes(self):
+        self.assertFalse(self.players.loaded_from_cache)
+
+        cached = PlayerData(self.path, cache_dir=self.cache_dir)
+        self.assertTrue(cached.loaded_from_cache)
+        self.assertIsInstance(cached.metrics.base, np.memmap)
+        self.assertEqual(cached.get_all_players(), self.players.get_all_players())
+        self.assertEqual(cached.nearest_players(27, 102, k=3), self.players.nearest_players(27, 102, k=3))
+
+        with open(self.path, "a") as f:
+            f.write("g,Player G homers,99.0,390,22,https://example.com/g.mp4\n")
+        stat = os.stat(self.path)
+        os.utime(self.path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000_000))
+
+        reloaded = PlayerData(self.path, cache_dir=self.cache_dir)
+        self.assertFalse(reloaded.loaded_from_cache)
+        self.assertEqual(len(reloaded), len(ROWS) + 1)
+
+    def test_multiple_seasons_are_merged_and_interned(self):
+        other = os.path.join(self.tmp_dir, "2017-mlb-homeruns.csv")
+        with open(other, "w") as f:
+            f.write("play_id,title,ExitVelocity,HitDistance,LaunchAngle,video\n")
+            f.write("a,Player A homers,100.0,400,25,https://example.com/a.mp4\n")  # Duplicate play
+            f.write("h,Player A homers,102.0,410,27,https://example.com/h.mp4\n")
+
+        players = PlayerData([other, self.path], cache_dir=self.cache_dir)
+        self.assertEqual(len(players), len(ROWS) + 1)
+        self.assertEqual(players.get_player_data("h")["season"], 2017)
+        self.assertEqual(players.title_codes[0], players.title_codes[1])
+        self.assertEqual(len(players.titles), len(ROWS))
+
+if __name__ == '__main__':
+    unittest.main()
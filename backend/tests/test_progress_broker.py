@@ -0,0 +1,166 @@
+import unittest
+import asyncio
+import json
+import sys
+import threading
+from pathlib import Path
+from unittest import mock
+
+backend_dir = Path(__file__).parent.parent
+sys.path.append(str(backend_dir))
+
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from app.routers import progress
+from app.services import progress_broker
+from app.services.progress_broker import ProgressBroker, Subscriber
+from app.services.analysis_service import TrackingProgress
+from app.services.job_queue import JobQueue, SQLiteJobStore, record_job_update
+
+class TestProgressBroker(unittest.TestCase):
+    """Test publishing and subscribing to analysis progress"""
+    def setUp(self):
+        self.loop = asyncio.new_event_loop()
+        self.addCleanup(self.loop.close)
+        self.broker = ProgressBroker()
+
+    def drain(self, subscriber):
+        async def collect():
+            await asyncio.sleep(0)  # Run the handed-over deliveries
+            events = []
+            while not subscriber.queue.empty():
+                events.append(await subscriber.get())
+            return events
+        return self.loop.run_until_complete(collect())
+
+    def test_subscriber_gets_events_for_its_video(self):
+        subscriber = Subscriber(self.loop)
+        self.broker.subscribe("a", subscriber)
+        self.broker.publish("a", "started")
+        self.broker.publish("b", "started")
+        self.broker.publish("a", "tracking", percent=40)
+
+        events = self.drain(subscriber)
+        self.assertEqual([event["stage"] for event in events], ["started", "tracking"])
+        self.assertEqual(events[1]["percent"], 40)
+        self.assertLess(events[0]["seq"], events[1]["seq"])
+
+    def test_late_subscriber_gets_latest_event(self):
+        self.broker.publish("a", "started")
+        self.broker.publish("a", "fitted", launch_angle=20.0, exit_velocity=90.0)
+        subscriber = Subscriber(self.loop)
+        self.broker.subscribe("a", subscriber)
+        events = self.drain(subscriber)
+        self.assertEqual(len(events), 1)
+        self.assertEqual(events[0]["stage"], "fitted")
+
+    def test_slow_subscriber_drops_oldest(self):
+        subscriber = Subscriber(self.loop, maxsize=3)
+        self.broker.subscribe("a", subscriber)
+        for percent in range(0, 100, 10):
+            self.broker.publish("a", "tracking", percent=percent)
+        events = self.drain(subscriber)
+        self.assertEqual([event["percent"] for event in events], [70, 80, 90])
+        self.assertEqual(subscriber.dropped, 7)
+
+    def test_publish_from_worker_threads(self):
+        subscriber = Subscriber(self.loop, maxsize=1000)
+        self.broker.subscribe("a", subscriber)
+        threads = [threading.Thread(target=lambda: [self.broker.publish("a", "tracking") for _ in range(50)])
+                   for _ in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(len(self.drain(subscriber)), 200)
+
+    def test_unsubscribe_and_unknown_stage(self):
+        subscriber = Subscriber(self.loop)
+        self.broker.subscribe("a", subscriber)
+        self.broker.unsubscribe("a", subscriber)
+        self.broker.publish("a", "started")
+        self.assertEqual(self.drain(subscriber), [])
+        self.assertEqual(self.broker.subscriber_count("a"), 0)
+        with self.assertRaises(ValueError):
+            self.broker.publish("a", "halfway")
+
+    def test_last_events_are_bounded(self):
+        broker = ProgressBroker(last_events_max=2)
+        for video_id in ("a", "b", "c"):
+            broker.publish(video_id, "queued")
+        self.assertIsNone(broker.last_event("a"))
+        self.assertEqual(broker.last_event("c")["stage"], "queued")
+
+class TestProgressPublishers(unittest.TestCase):
+    """Test the progress events published by the analysis pipeline"""
+    def setUp(self):
+        self.broker = ProgressBroker()
+        patcher = mock.patch.object(progress_broker, "get_progress_broker", return_value=self.broker)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_tracking_progress_is_throttled(self):
+        on_progress = TrackingProgress("a")
+        stages = []
+        with mock.patch.object(self.broker, "publish", side_effect=lambda *args, **data: stages.append(data)):
+            for frame in range(0, 201):
+                on_progress(frame, 200)
+        percents = [data["percent"] for data in stages]
+        self.assertEqual(percents, list(range(0, 101, 5)))
+
+    def test_tracking_progress_without_frame_count(self):
+        fraction = [0.0]
+        on_progress = TrackingProgress("a", lambda: fraction[0])
+        fraction[0] = 0.42
+        on_progress(30, None)
+        self.assertEqual(self.broker.last_event("a")["percent"], 42)
+
+    def test_job_queue_publishes_queued_and_retrying(self):
+        attempts = []
+
+        def flaky(video_id):
+            attempts.append(video_id)
+            if len(attempts) == 1:
+                raise RuntimeError("transient")
+
+        with mock.patch("app.services.job_queue.update_video_job_fields"):
+            queue = JobQueue(SQLiteJobStore(), flaky, workers=1, poll_interval=0.01, backoff_base=0.01)
+            self.assertIs(queue.on_update, record_job_update)
+            stages = []
+            with mock.patch.object(self.broker, "publish", side_effect=lambda video_id, stage, **data: stages.append(stage)):
+                queue.enqueue("a")
+                job = queue.store.claim()
+                queue._execute(job)
+        self.assertEqual(stages, ["queued", "retrying"])
+
+class TestProgressWebSocket(unittest.TestCase):
+    """Test subscribing to progress over the /ws endpoint"""
+    def setUp(self):
+        self.broker = ProgressBroker()
+        patcher = mock.patch.object(progress, "get_progress_broker", return_value=self.broker)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        app = FastAPI()
+        app.include_router(progress.router)
+        self.client = TestClient(app)
+
+    def test_subscribe_and_receive_events(self):
+        self.broker.publish("a", "started")
+        with self.client.websocket_connect("/ws") as websocket:
+            websocket.send_text(json.dumps({"action": "subscribe", "video_id": "a"}))
+            self.assertEqual(websocket.receive_json()["stage"], "started")
+            self.broker.publish("b", "started")
+            self.broker.publish("a", "tracking", percent=50)
+            event = websocket.receive_json()
+            self.assertEqual((event["video_id"], event["stage"], event["percent"]), ("a", "tracking", 50))
+        self.assertEqual(self.broker.subscriber_count("a"), 0)
+
+    def test_invalid_messages_get_an_error(self):
+        with self.client.websocket_connect("/ws") as websocket:
+            websocket.send_text("hello")
+            self.assertIn("error", websocket.receive_json())
+            websocket.send_text(json.dumps({"action": "subscribe"}))
+            self.assertIn("video_id", websocket.receive_json()["error"])
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,59 @@
+import unittest
+import sys
+import os
+import shutil
+import tempfile
+import pandas as pd
+from pathlib import Path
+
+backend_dir = Path(__file__).parent.parent
+sys.path.append(str(backend_dir))
+
+from app.services import referenceData
+from app.services.referenceData import get_reference_data
+
+class TestReferenceData(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        self.path = os.path.join(self.tmp_dir, "2024-mlb-homeruns.csv")
+        shutil.copy(backend_dir / "datasets" / "2024-mlb-homeruns.csv", self.path)
+        os.environ["PLAYER_DATA_CACHE_DIR"] = os.path.join(self.tmp_dir, "cache")
+
+    def tearDown(self):
+        del os.environ["PLAYER_DATA_CACHE_DIR"]
+        referenceData._datasets.clear()
+        shutil.rmtree(self.tmp_dir)
+
+    def test_loaded_once_per_process(self):
+        first = get_reference_data([self.path])
+        self.assertIs(get_reference_data([self.path]), first)
+
+    def test_aggregates_match_pandas(self):
+        data = get_reference_data([self.path])
+        # The CSVs repeat some plays verbatim; those are counted once
+        df = pd.read_csv(self.path).drop_duplicates(subset="play_id").dropna(subset=["ExitVelocity", "LaunchAngle"])
+        self.assertEqual(len(data.frame), len(df))
+        for metric in ("ExitVelocity", "LaunchAngle"):
+            self.assertAlmostEqual(data.stats[metric]["mean"], df[metric].mean(), places=4)
+            self.assertAlmostEqual(data.stats[metric]["mode"], df[metric].mode()[0], places=4)
+            self.assertEqual(sum(data.stats[metric]["histogram"]["counts"]), len(df))
+
+    def test_reloads_when_file_changes(self):
+        first = get_reference_data([self.path])
+        with open(self.path, "a") as f:
+            f.write("\nnew-play,New homer,120.0,500,30,https://example.com/new.mp4\n")
+        stat = os.stat(self.path)
+        os.utime(self.path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000_000))
+
+        first.checked_at -= referenceData.RELOAD_CHECK_SECONDS
+        second = get_reference_data([self.path])
+        self.assertIsNot(second, first)
+        self.assertEqual(len(second.frame), len(first.frame) + 1)
+        self.assertEqual(second.stats["ExitVelocity"]["max"], 120.0)
+
+    def test_missing_file_raises(self):
+        with self.assertRaises(ValueError):
+            get_reference_data([os.path.join(self.tmp_dir, "missing.csv")])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,214 @@
+import unittest
+import sys
+import tempfile
+import shutil
+import numpy as np
+import cv2
+from pathlib import Path
+
+backend_dir = Path(__file__).parent.parent
+sys.path.append(str(backend_dir))
+
+from app.services.advancedTracker import BaseballTracker
+from app.services.motionGate import MotionGate
+
+def write_synthetic_clip(path, n_frames=60, size=(320, 240), fps=30, radius=8, start_frame=10,
+                         static_ball=None):
+    """Writes a clip with a white ball flying on a parabola over a dark field"""
+    width, height = size
+    writer = cv2.VideoWriter(str(path), cv2.VideoWriter_fourcc(*"MJPG"), fps, (width, height))
+    centers = {}
+    for i in range(n_frames):
+        frame = np.full((height, width, 3), (40, 90, 40), dtype=np.uint8)
+        if static_ball:
+            cv2.circle(frame, static_ball, radius + 4, (255, 255, 255), -1)
+        t = i - start_frame
+        if 0 <= t and 20 + 6 * t < width - radius:
+            cx = 20 + 6 * t
+            cy = int(height - 40 - 5 * t + 0.08 * t ** 2)
+            cv2.circle(frame, (cx, cy), radius, (255, 255, 255), -1)
+            centers[i] = (cx, cy)
+        writer.write(frame)
+    writer.release()
+    return centers
+
+class TestBaseballTracker(unittest.TestCase):
+    """Test ball detection and tracking on synthetic clips"""
+    @classmethod
+    def setUpClass(cls):
+        cls.tmp_dir = Path(tempfile.mkdtemp())
+        cls.video_path = cls.tmp_dir / "clip.avi"
+        cls.centers = write_synthetic_clip(cls.video_path)
+
+    @classmethod
+    def tearDownClass(cls):
+        shutil.rmtree(cls.tmp_dir, ignore_errors=True)
+
+    def test_track_baseball(self):
+        tracker = BaseballTracker(str(self.video_path))
+        results, positions = tracker.track_baseball()
+        self.assertGreater(len(positions), 3)
+        self.assertEqual(len(positions), len(tracker.frame_indices))
+        for frame_index, (x, y) in zip(tracker.frame_indices, positions):
+            cx, cy = self.centers[frame_index]
+            self.assertAlmostEqual(x, cx, delta=2)
+            self.assertAlmostEqual(y, cy, delta=2)
+        self.assertGreater(results["exit_velocity"], 0)
+
+    def test_batch_matches_single_frame_detection(self):
+        tracker = BaseballTracker(str(self.video_path))
+        single_results, single_positions = tracker.track_baseball(batch_size=1)
+        single_frames = list(tracker.frame_indices)
+        batch_results, batch_positions = tracker.track_baseball(batch_size=16)
+
+        self.assertEqual(single_frames, tracker.frame_indices)
+        np.testing.assert_allclose(single_positions, batch_positions, atol=1)
+        self.assertAlmostEqual(single_results["launch_angle"], batch_results["launch_angle"], delta=1)
+
+    def test_pipelined_matches_sequential(self):
+        tracker = BaseballTracker(str(self.video_path))
+        _, positions = tracker.track_baseball()
+        frames = list(tracker.frame_indices)
+
+        for decoders in (1, 3):
+            _, pipelined = tracker.track_baseball_pipelined(decoders=decoders, queue_size=4)
+            self.assertEqual(frames, tracker.frame_indices)
+            np.testing.assert_allclose(positions, pipelined)
+
+            stats = tracker.pipeline_stats
+            self.assertEqual(stats["decoders"], decoders)
+            self.assertEqual(stats["frames"], 60)
+            self.assertLessEqual(stats["max_queue_depth"], 4)
+            self.assertIn("detect_seconds", stats)
+
+    def test_pipelined_gated_matches_sequential(self):
+        tracker = BaseballTracker(str(self.video_path))
+        _, positions = tracker.track_baseball(motion_gate=True)
+        frames = list(tracker.frame_indices)
+        self.assertIn(20, frames)
+
+        for decoders in (1, 3):
+            _, pipelined = tracker.track_baseball_pipelined(decoders=decoders, motion_gate=True)
+            # Each decoder seeds its gate with the frame before its slice
+            self.assertEqual(frames, tracker.frame_indices)
+            np.testing.assert_allclose(positions, pipelined)
+            self.assertEqual(tracker.pipeline_stats["frames"], 60)
+
+    def test_pipelined_downscale(self):
+        tracker = BaseballTracker(str(self.video_path))
+        _, positions = tracker.track_baseball_pipelined(scale=0.5)
+        self.assertGreater(len(positions), 3)
+        for frame_index, (x, y) in zip(tracker.frame_indices, positions):
+            cx, cy = self.centers[frame_index]
+            self.assertAlmostEqual(x, cx, delta=3)
+            self.assertAlmostEqual(y, cy, delta=3)
+
+    def test_segmented_matches_sequential(self):
+        tracker = BaseballTracker(str(self.video_path))
+        self.assertEqual(tracker.segment_ranges(60, workers=2), [(0, 30), (30, 60)])
+        self.assertEqual(tracker.segment_ranges(60, workers=4), [(0, 30), (30, 60)])
+
+        _, positions = tracker.track_baseball()
+        frames = list(tracker.frame_indices)
+        _, segmented = tracker.track_baseball_segmented(workers=2)
+        self.assertEqual(frames, tracker.frame_indices)
+        np.testing.assert_allclose(positions, segmented)
+
+    def test_detect_baseball_batch_empty_frames(self):
+        tracker = BaseballTracker(str(self.video_path))
+        frames = np.zeros((4, 120, 160, 3), dtype=np.uint8)
+        self.assertEqual(tracker.detect_baseball_batch(frames), [None] * 4)
+
+class TestSwingWindow(unittest.TestCase):
+    """Test swing-window localization"""
+    @classmethod
+    def setUpClass(cls):
+        cls.tmp_dir = Path(tempfile.mkdtemp())
+        cls.video_path = cls.tmp_dir / "late_swing.avi"
+        # The ball only flies after the first MAX_FRAMES frames
+        cls.centers = write_synthetic_clip(cls.video_path, n_frames=420, start_frame=340)
+
+    @classmethod
+    def tearDownClass(cls):
+        shutil.rmtree(cls.tmp_dir, ignore_errors=True)
+
+    def test_find_swing_window(self):
+        tracker = BaseballTracker(str(self.video_path))
+        start, stop = tracker.find_swing_window(window_seconds=1.0)
+        self.assertEqual(stop - start, 30)
+        self.assertTrue(330 <= start <= 370, (start, stop))
+
+    def test_track_swing(self):
+        tracker = BaseballTracker(str(self.video_path))
+        _, positions = tracker.track_baseball()
+        self.assertEqual(positions, [])
+
+        _, positions = tracker.track_swing()
+        self.assertGreater(len(positions), 3)
+        start, stop = tracker.swing_window
+        for frame_index, (x, y) in zip(tracker.frame_indices, positions):
+            self.assertTrue(start <= frame_index < stop)
+            cx, cy = self.centers[frame_index]
+            self.assertAlmostEqual(x, cx, delta=2)
+            self.assertAlmostEqual(y, cy, delta=2)
+
+class TestMotionGate(unittest.TestCase):
+    """Test motion-gated tracking"""
+    @classmethod
+    def setUpClass(cls):
+        cls.tmp_dir = Path(tempfile.mkdtemp())
+        cls.video_path = cls.tmp_dir / "clip.avi"
+        # A larger static white blob that would win without motion gating
+        cls.centers = write_synthetic_clip(cls.video_path, size=(640, 480), static_ball=(560, 60))
+
+    @classmethod
+    def tearDownClass(cls):
+        shutil.rmtree(cls.tmp_dir, ignore_errors=True)
+
+    def test_static_frames_are_skipped(self):
+        gate = MotionGate()
+        frame = np.full((240, 320, 3), 60, dtype=np.uint8)
+        self.assertIsNone(gate.update(frame))
+        self.assertIsNone(gate.update(frame.copy()))
+
+        moved = frame.copy()
+        cv2.circle(moved, (100, 100), 8, (255, 255, 255), -1)
+        (x0, y0, x1, y1), mask = gate.update(moved)
+        self.assertTrue(x0 <= 100 < x1 and y0 <= 100 < y1)
+        self.assertEqual(mask.shape, (240, 320))
+        self.assertEqual(mask[100, 100], 255)
+        self.assertEqual(mask[230, 310], 0)
+
+    def test_mask_matches_frames_of_any_size(self):
+        for h, w in ((259, 320), (257, 355), (43, 61)):
+            gate = MotionGate()
+            frame = np.full((h, w, 3), 60, dtype=np.uint8)
+            gate.update(frame)
+            moved = frame.copy()
+            moved[-12:, -12:] = 255  # Runs into the strip the downscaled copy drops
+            (x0, y0, x1, y1), mask = gate.update(moved)
+            self.assertEqual(mask.shape, (h, w))
+            self.assertEqual(mask[-1, -1], 255)
+            self.assertEqual((x1, y1), (w, h))
+
+    def test_gated_tracking_of_odd_frame_size(self):
+        video_path = self.tmp_dir / "odd.avi"
+        write_synthetic_clip(video_path, size=(355, 259))
+        _, gated = BaseballTracker(str(video_path)).track_baseball(batch_size=8, motion_gate=True)
+        self.assertGreater(len(gated), 3)
+
+    def test_gated_tracking_ignores_static_white_objects(self):
+        tracker = BaseballTracker(str(self.video_path))
+        _, ungated = tracker.track_baseball()
+        self.assertTrue(any(abs(x - 560) < 2 and abs(y - 60) < 2 for x, y in ungated))
+
+        for batch_size in (1, 8):
+            _, gated = tracker.track_baseball(batch_size=batch_size, motion_gate=True)
+            self.assertGreater(len(gated), 3)
+            for frame_index, (x, y) in zip(tracker.frame_indices, gated):
+                cx, cy = self.centers[frame_index]
+                self.assertAlmostEqual(x, cx, delta=2)
+                self.assertAlmostEqual(y, cy, delta=2)
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,34 @@
+import unittest
+import sys
+import tempfile
+from pathlib import Path
+
+backend_dir = Path(__file__).parent.parent
+sys.path.append(str(backend_dir))
+
+from benchmarks.tracker_benchmark import Scenario, run_scenario, check_regressions
+
+class TestTrackerBenchmark(unittest.TestCase):
+    def test_clean_clip_matches_ground_truth(self):
+        with tempfile.TemporaryDirectory() as work_dir:
+            result = run_scenario(Scenario(width=640, height=360), Path(work_dir))
+
+        self.assertGreater(result["detections"], 10)
+        self.assertEqual(result["false_detections"], 0)
+        self.assertLess(result["mean_position_error_px"], 1.5)
+        self.assertLess(result["launch_angle_error"], 1.0)
+        self.assertLess(result["exit_velocity_error"], 1.0)
+
+    def test_check_regressions(self):
+        before = [{"scenario": "s", "mode": "baseline", "fps": 100.0,
+                   "launch_angle_error": 0.1, "exit_velocity_error": 0.1}]
+        same = [dict(before[0], fps=95.0)]
+        slower = [dict(before[0], fps=50.0)]
+        worse = [dict(before[0], launch_angle_error=5.0)]
+
+        self.assertEqual(check_regressions(same, before, 0.2), [])
+        self.assertEqual(len(check_regressions(slower, before, 0.2)), 1)
+        self.assertEqual(len(check_regressions(worse, before, 0.2)), 1)
+
+if __name__ == '__main__':
+    unittest.main()
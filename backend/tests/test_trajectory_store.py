@@ -0,0 +1,156 @@
+import unittest
+import shutil
+import sys
+import tempfile
+import time
+from pathlib import Path
+from unittest import mock
+
+import numpy as np
+
+backend_dir = Path(__file__).parent.parent
+sys.path.append(str(backend_dir))
+sys.path.append(str(Path(__file__).parent))
+
+from app.services import trajectory_store
+from app.services.advancedTracker import BaseballTracker
+from app.services.blob_cache import LocalBucket
+from app.services.trajectory_store import (Trajectory, decode_trajectory, encode_trajectory, fit_trajectories,
+                                           refit_videos, store_trajectory)
+from test_tracker import write_synthetic_clip
+
+def random_trajectory(rng, length, fps=30.0):
+    """A noisy parabolic ball path over length frames, with a few missed detections"""
+    frames = np.sort(rng.choice(np.arange(length * 2), size=length, replace=False)) + rng.integers(0, 300)
+    x = 100 + rng.uniform(4, 20) * (frames - frames[0])
+    y = 700 - rng.uniform(2, 10) * (frames - frames[0]) + 0.05 * (frames - frames[0]) ** 2
+    positions = np.column_stack([x, y]) + rng.normal(0, 1.5, (length, 2))
+    return Trajectory(frames, np.round(positions * 2) / 2, fps)
+
+def offline_fit(trajectory, conversion=BaseballTracker.VELOCITY_CONVERSION):
+    tracker = BaseballTracker(None, probe=False)
+    tracker.fps = trajectory.fps
+    tracker.VELOCITY_CONVERSION = conversion
+    if len(trajectory) <= 3:
+        return {"launch_angle": 0, "exit_velocity": 0}
+    return tracker._analyze_trajectory(trajectory.positions.astype(np.float64).tolist())
+
+class TestTrajectoryEncoding(unittest.TestCase):
+    """Test the compact binary form of stored trajectories"""
+    def test_round_trip(self):
+        trajectory = random_trajectory(np.random.default_rng(1), 120, fps=59.94)
+        decoded = decode_trajectory(encode_trajectory(trajectory))
+        np.testing.assert_array_equal(decoded.frames, trajectory.frames)
+        np.testing.assert_allclose(decoded.positions, trajectory.positions, atol=1 / 512)
+        self.assertAlmostEqual(decoded.fps, 59.94, places=4)
+        self.assertEqual(decoded.positions.dtype, np.float32)
+
+    def test_smaller_than_raw_float32(self):
+        trajectory = random_trajectory(np.random.default_rng(2), 300)
+        self.assertLess(len(encode_trajectory(trajectory)), len(trajectory) * 3 * 4 / 2)
+
+    def test_empty_and_corrupt(self):
+        empty = decode_trajectory(encode_trajectory(Trajectory([], [], 30.0)))
+        self.assertEqual(len(empty), 0)
+        data = encode_trajectory(random_trajectory(np.random.default_rng(3), 20))
+        for bad in (b"", b"JUNK" + data[4:], data[:-5]):
+            with self.assertRaises(ValueError):
+                decode_trajectory(bad)
+
+class TestRefit(unittest.TestCase):
+    """Test vectorized refitting against the per-video trajectory fit"""
+    def test_matches_analyze_trajectory(self):
+        rng = np.random.default_rng(4)
+        trajectories = [random_trajectory(rng, length, fps) for length, fps in
+                        zip(rng.integers(2, 200, 300), rng.choice([30.0, 60.0, 240.0], 300))]
+        results = fit_trajectories(trajectories, batch_size=64)
+        for trajectory, result in zip(trajectories, results):
+            expected = offline_fit(trajectory)
+            self.assertAlmostEqual(result["launch_angle"], expected["launch_angle"], places=5)
+            self.assertAlmostEqual(result["exit_velocity"], expected["exit_velocity"], places=5)
+
+    def test_new_calibration(self):
+        trajectory = random_trajectory(np.random.default_rng(5), 50)
+        result = fit_trajectories([trajectory], velocity_conversion=0.05)[0]
+        self.assertAlmostEqual(result["exit_velocity"], offline_fit(trajectory, 0.05)["exit_velocity"], places=5)
+
+    def test_degenerate_path(self):
+        trajectory = Trajectory(range(6), [[50.0, y] for y in range(6)], 30.0)
+        result = fit_trajectories([trajectory, random_trajectory(np.random.default_rng(6), 30)])[0]
+        self.assertTrue(np.isfinite(result["launch_angle"]))
+
+    def test_archive_refits_in_seconds(self):
+        rng = np.random.default_rng(7)
+        trajectories = [random_trajectory(rng, length) for length in rng.integers(20, 300, 5000)]
+        start = time.perf_counter()
+        results = fit_trajectories(trajectories)
+        self.assertEqual(len(results), 5000)
+        self.assertLess(time.perf_counter() - start, 10)
+
+class TestStoredTrajectories(unittest.TestCase):
+    """Test storing trajectories next to videos and refitting them from there"""
+    def setUp(self):
+        self.tmp_dir = Path(tempfile.mkdtemp())
+        (self.tmp_dir / "videos").mkdir()
+        self.bucket = LocalBucket(str(self.tmp_dir / "videos"))
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir, ignore_errors=True)
+
+    def test_tracked_trajectory_refits_to_the_same_result(self):
+        from app.services import analysis_service
+        from app.services.blob_cache import BlobCache
+
+        write_synthetic_clip(self.tmp_dir / "videos" / "clip.avi", n_frames=60)
+        cache = BlobCache(str(self.tmp_dir / "cache"))
+        with mock.patch.object(analysis_service, "get_blob_cache", return_value=cache), \
+             mock.patch.object(analysis_service, "publish_progress"):
+            results, trajectory = analysis_service._track_video(self.bucket.blob("clip.avi"), "clip.avi")
+
+        reference = store_trajectory(self.bucket, "clip.avi", trajectory)
+        self.assertEqual(reference["file"], "clip.avi.trajectory")
+        stored = trajectory_store.load_trajectory(self.bucket, reference["file"])
+        refit = fit_trajectories([stored])[0]
+        self.assertGreater(len(stored), 3)
+        for metric in ("launch_angle", "exit_velocity"):
+            self.assertAlmostEqual(refit[metric], results[metric], places=2)
+
+    def test_refit_videos(self):
+        rng = np.random.default_rng(8)
+        documents = {}
+        for i in range(3):
+            reference = store_trajectory(self.bucket, f"video-{i}.mp4", random_trajectory(rng, 40))
+            documents[f"video-{i}"] = {"trajectory": reference, "content_hash": f"hash-{i}"}
+        documents["video-3"] = {"trajectory": {"bucket": "videos", "file": "gone.trajectory"}}
+        documents["video-4"] = {"content_hash": "hash-4"}
+
+        snapshots = []
+        for video_id, data in documents.items():
+            snapshot = mock.Mock(id=video_id)
+            snapshot.to_dict.return_value = data
+            snapshots.append(snapshot)
+        client = mock.Mock()
+        client.collection.return_value.select.return_value.stream.return_value = snapshots
+
+        with mock.patch.object(trajectory_store, "firestore_client", client), \
+             mock.patch.object(trajectory_store, "get_videos_bucket", return_value=self.bucket), \
+             mock.patch.object(trajectory_store, "store_cached_analysis") as store_cached:
+            report = refit_videos(write=True)
+
+        self.assertEqual(sorted(report["results"]), ["video-0", "video-1", "video-2"])
+        self.assertEqual(report["missing"], ["video-3"])
+        self.assertEqual(client.batch.return_value.update.call_count, 3)
+        client.batch.return_value.commit.assert_called_once()
+        self.assertEqual(store_cached.call_count, 3)
+        # Charts drawn for the old results must not be served with the new ones
+        self.assertTrue(all(call.kwargs["clear_images"] for call in store_cached.call_args_list))
+
+    def test_recalibrated_refit_is_not_written(self):
+        client = mock.Mock()
+        with mock.patch.object(trajectory_store, "firestore_client", client):
+            with self.assertRaises(ValueError):
+                refit_videos(velocity_conversion=0.05, write=True)
+        client.batch.assert_not_called()
+
+if __name__ == "__main__":
+    unittest.main()
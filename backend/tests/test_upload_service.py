@@ -0,0 +1,202 @@
+import unittest
+import asyncio
+import functools
+import io
+import sys
+import struct
+from pathlib import Path
+from unittest import mock
+
+backend_dir = Path(__file__).parent.parent
+sys.path.append(str(backend_dir))
+
+from fastapi import HTTPException
+from starlette.requests import Request
+from app.routers import video
+from app.services.upload_service import MultipartFileStream, StreamingUpload, UploadError, sniff_video_type
+
+class FakeWriter(io.BytesIO):
+    def __init__(self, bucket, name):
+        super().__init__()
+        self.bucket = bucket
+        self.name = name
+
+    def close(self):
+        if not self.closed:
+            self.bucket.objects[self.name] = self.getvalue()
+        super().close()
+
+class FakeBlob:
+    def __init__(self, bucket, name):
+        self.bucket = bucket
+        self.name = name
+        self.content_type = None
+
+    def open(self, mode="rb", chunk_size=None):
+        return FakeWriter(self.bucket, self.name)
+
+    def exists(self):
+        return self.name in self.bucket.objects
+
+    def delete(self):
+        del self.bucket.objects[self.name]
+
+    def rewrite(self, source, token=None):
+        self.bucket.objects[self.name] = self.bucket.objects[source.name]
+        return None, 0, 0
+
+class FakeBucket:
+    """In-memory stand-in for a GCS bucket"""
+    def __init__(self):
+        self.objects = {}
+
+    def blob(self, name):
+        return FakeBlob(self, name)
+
+MP4_HEADER = struct.pack(">I4s", 24, b"ftyp") + b"isom" + b"\x00" * 12
+BOUNDARY = "test-boundary"
+
+def multipart_body(data, filename="swing.mp4", content_type="video/mp4", field="file"):
+    return (
+        f"--{BOUNDARY}\r\n"
+        f'Content-Disposition: form-data; name="note"\r\n\r\nhello\r\n'
+        f"--{BOUNDARY}\r\n"
+        f'Content-Disposition: form-data; name="{field}"; filename="{filename}"\r\n'
+        f"Content-Type: {content_type}\r\n\r\n"
+    ).encode() + data + f"\r\n--{BOUNDARY}--\r\n".encode()
+
+def split(data, size):
+    return [data[start:start + size] for start in range(0, len(data), size)]
+
+class TestSniffVideoType(unittest.TestCase):
+    def test_known_containers(self):
+        self.assertEqual(sniff_video_type(MP4_HEADER), "video/mp4")
+        self.assertEqual(sniff_video_type(b"\x00\x00\x00\x14ftypqt  "), "video/quicktime")
+        self.assertEqual(sniff_video_type(b"RIFF\x00\x00\x00\x00AVI LIST"), "video/x-msvideo")
+        self.assertEqual(sniff_video_type(b"\x1a\x45\xdf\xa3\x9f\x42\x86\x81"), "video/x-matroska")
+
+    def test_unknown_content(self):
+        self.assertIsNone(sniff_video_type(b"%PDF-1.7 not a video"))
+
+class TestStreamingUpload(unittest.TestCase):
+    def setUp(self):
+        self.bucket = FakeBucket()
+        self.data = MP4_HEADER + b"frame" * 1000
+
+    def upload(self, name, data, chunk=1024, **kwargs):
+        upload = StreamingUpload(self.bucket, name, **kwargs)
+        for start in range(0, len(data), chunk):
+            upload.write(data[start:start + chunk])
+        return upload
+
+    def test_upload_is_content_addressed(self):
+        upload = self.upload("uploads/a.mp4", self.data)
+        final_name, content_hash, deduplicated = upload.finish("mp4")
+
+        self.assertFalse(deduplicated)
+        self.assertEqual(final_name, f"{content_hash}.mp4")
+        self.assertEqual(self.bucket.objects, {final_name: self.data})
+        self.assertEqual(upload.content_type, "video/mp4")
+        self.assertEqual(upload.size, len(self.data))
+
+    def test_identical_upload_is_deduplicated(self):
+        first_name, _, _ = self.upload("uploads/a.mp4", self.data).finish("mp4")
+        second_name, _, deduplicated = self.upload("uploads/b.mp4", self.data).finish("mp4")
+        self.assertTrue(deduplicated)
+        self.assertEqual(first_name, second_name)
+        self.assertEqual(list(self.bucket.objects), [first_name])
+
+    def test_rejects_non_video_content(self):
+        upload = StreamingUpload(self.bucket, "uploads/a.mp4")
+        with self.assertRaises(UploadError) as ctx:
+            upload.write(b"#!/bin/sh\necho not a video")
+        self.assertEqual(ctx.exception.status_code, 415)
+
+    def test_size_limit(self):
+        with self.assertRaises(UploadError) as ctx:
+            self.upload("uploads/a.mp4", self.data, max_bytes=2048)
+        self.assertEqual(ctx.exception.status_code, 413)
+
+    def test_abort_discards_staged_bytes(self):
+        upload = StreamingUpload(self.bucket, "uploads/a.mp4")
+        upload.write(self.data[:1024])
+        upload.abort()
+        self.assertEqual(self.bucket.objects, {})
+
+class TestMultipartFileStream(unittest.TestCase):
+    """Test incremental parsing of the upload's multipart body"""
+    def parse(self, body, chunk_size):
+        form = MultipartFileStream(f"multipart/form-data; boundary={BOUNDARY}")
+        data = b"".join(b"".join(form.feed(chunk)) for chunk in split(body, chunk_size))
+        form.finish()
+        return form, data
+
+    def test_file_bytes_pass_through_in_any_chunking(self):
+        payload = MP4_HEADER + bytes(range(256)) * 40
+        for chunk_size in (1, 7, 1000, 1 << 20):
+            form, data = self.parse(multipart_body(payload), chunk_size)
+            self.assertEqual(data, payload)
+            self.assertEqual((form.filename, form.content_type), ("swing.mp4", "video/mp4"))
+
+    def test_rejects_bad_requests(self):
+        with self.assertRaises(UploadError):
+            MultipartFileStream("application/json")
+        with self.assertRaises(UploadError):
+            self.parse(multipart_body(MP4_HEADER, field="other"), 100)
+        with self.assertRaises(UploadError):
+            self.parse(multipart_body(MP4_HEADER)[:-20], 100)  # Truncated body
+
+class TestUploadRoute(unittest.TestCase):
+    """Test that /video/upload streams the request body instead of buffering it"""
+    def setUp(self):
+        self.bucket = FakeBucket()
+        for target, value in (("get_videos_bucket", lambda: self.bucket), ("firestore_client", mock.Mock()),
+                              ("get_cached_analysis", lambda content_hash: None)):
+            patcher = mock.patch.object(video, target, value)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        patcher = mock.patch("app.services.analysis_service.analyze_video_background",
+                             return_value={"job_id": "job-1"})
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def post(self, body, chunk_size=64 * 1024):
+        chunks = split(body, chunk_size)
+        self.received = 0
+
+        async def receive():
+            self.received += 1
+            if self.received > len(chunks):
+                return {"type": "http.disconnect"}
+            return {"type": "http.request", "body": chunks[self.received - 1],
+                    "more_body": self.received < len(chunks)}
+
+        scope = {"type": "http", "method": "POST", "path": "/video/upload", "headers": [
+            (b"content-type", f"multipart/form-data; boundary={BOUNDARY}".encode())
+        ]}
+        return asyncio.run(video.upload_video(Request(scope, receive)))
+
+    def test_upload_is_stored(self):
+        payload = MP4_HEADER + b"frame" * 100000
+        response = self.post(multipart_body(payload))
+        self.assertEqual(response["status"], "processing")
+        self.assertEqual(list(self.bucket.objects.values()), [payload])
+
+    def test_oversized_upload_is_rejected_while_streaming(self):
+        body = multipart_body(MP4_HEADER + b"frame" * 2_000_000)
+        with mock.patch.object(video, "StreamingUpload", functools.partial(StreamingUpload, max_bytes=1024 * 1024)):
+            with self.assertRaises(HTTPException) as ctx:
+                self.post(body)
+        self.assertEqual(ctx.exception.status_code, 413)
+        self.assertLess(self.received, len(split(body, 64 * 1024)) // 4)
+        self.assertEqual(self.bucket.objects, {})
+
+    def test_non_video_is_rejected_at_the_first_bytes(self):
+        body = multipart_body(b"#!/bin/sh\n" * 1_000_000)
+        with self.assertRaises(HTTPException) as ctx:
+            self.post(body)
+        self.assertEqual(ctx.exception.status_code, 415)
+        self.assertLessEqual(self.received, 2)
+
+if __name__ == "__main__":
+    unittest.main()
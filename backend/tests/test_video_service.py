@@ -0,0 +1,181 @@
+import unittest
+import json
+import operator
+import sys
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+from unittest import mock
+
+backend_dir = Path(__file__).parent.parent
+sys.path.append(str(backend_dir))
+
+from app.services import video_service
+from app.services.video_service import decode_cursor, encode_cursor, list_videos_page, parse_fields
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from google.api_core.exceptions import FailedPrecondition
+from app.routers import video
+from app.routers.video import stream_video_page
+
+OPERATORS = {"==": operator.eq, ">=": operator.ge, "<": operator.lt}
+
+class FakeSnapshot:
+    def __init__(self, doc_id, data):
+        self.id = doc_id
+        self._data = data
+
+    def to_dict(self):
+        return dict(self._data)
+
+    def get(self, field):
+        return self._data[field]
+
+class FakeQuery:
+    """In-memory stand-in for the Firestore query calls the video list makes"""
+    def __init__(self, docs, filters=(), projection=None, after=None, count=None):
+        self.docs = docs
+        self.filters = list(filters)
+        self.projection = projection
+        self.after = after
+        self.count = count
+
+    def _copy(self, **changes):
+        state = dict(filters=self.filters, projection=self.projection, after=self.after, count=self.count)
+        state.update(changes)
+        return FakeQuery(self.docs, **state)
+
+    def where(self, filter):
+        return self._copy(filters=self.filters + [filter])
+
+    def order_by(self, field, direction=None):
+        return self  # Always newest first, then id descending, like the real query
+
+    def select(self, fields):
+        return self._copy(projection=fields)
+
+    def start_after(self, values):
+        return self._copy(after=(values["uploaded_at"], values["__name__"]))
+
+    def limit(self, count):
+        return self._copy(count=count)
+
+    def stream(self):
+        rows = [(doc_id, data) for doc_id, data in self.docs.items()
+                if all(OPERATORS[f.op_string](data.get(f.field_path), f.value) for f in self.filters)]
+        rows.sort(key=lambda row: (row[1]["uploaded_at"], row[0]), reverse=True)
+        if self.after:
+            rows = [row for row in rows if (row[1]["uploaded_at"], row[0]) < self.after]
+        for doc_id, data in rows[:self.count]:
+            yield FakeSnapshot(doc_id, {field: data[field] for field in self.projection if field in data})
+
+class TestGetVideoDocuments(unittest.TestCase):
+    """Test that a batch of video documents is read in one round trip"""
+    def test_single_get_all(self):
+        client = mock.Mock()
+        client.collection.return_value.document.side_effect = lambda video_id: f"ref-{video_id}"
+        missing = mock.Mock(exists=False)
+        client.get_all.return_value = [mock.Mock(id="a", exists=True, to_dict=lambda: {"status": "completed"}),
+                                       missing]
+        with mock.patch.object(video_service, "firestore_client", client):
+            documents = video_service.get_video_documents(["a", "b", "a"])
+
+        client.get_all.assert_called_once_with(["ref-a", "ref-b"])
+        self.assertEqual(documents, {"a": {"status": "completed"}})
+
+    def test_empty_batch(self):
+        client = mock.Mock()
+        with mock.patch.object(video_service, "firestore_client", client):
+            self.assertEqual(video_service.get_video_documents([]), {})
+        client.get_all.assert_not_called()
+
+class TestVideoList(unittest.TestCase):
+    """Test paging, filtering and projection of the video list"""
+    def setUp(self):
+        start = datetime(2025, 3, 1, tzinfo=timezone.utc)
+        self.docs = {
+            f"video-{i:02d}": {
+                "status": "completed" if i % 3 else "failed",
+                "uploaded_at": start + timedelta(hours=i // 2),  # Pairs share a timestamp
+                "file_name": f"videos/{i}.mp4",
+                "analysis_results": {"launch_angle": 20.0, "exit_velocity": 90.0}
+            }
+            for i in range(25)
+        }
+        client = mock.Mock()
+        client.collection.return_value = FakeQuery(self.docs)
+        patcher = mock.patch.object(video_service, "firestore_client", client)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def read_all(self, **options):
+        pages, cursor = [], None
+        while True:
+            page = list_videos_page(cursor=cursor, **options)
+            pages.append(list(page))
+            cursor = page.next_cursor
+            if cursor is None:
+                return pages
+
+    def test_pages_cover_every_video_once(self):
+        pages = self.read_all(page_size=4)
+        ids = [video["video_id"] for page in pages for video in page]
+        self.assertEqual(sorted(ids), sorted(self.docs))
+        self.assertEqual(len(ids), len(set(ids)))
+        self.assertEqual([len(page) for page in pages], [4] * 6 + [1])
+        uploaded = [video["uploaded_at"] for page in pages for video in page]
+        self.assertEqual(uploaded, sorted(uploaded, reverse=True))
+
+    def test_default_projection(self):
+        video = next(iter(list_videos_page(page_size=1)))
+        self.assertEqual(set(video), {"video_id", "status", "uploaded_at"})
+
+    def test_status_and_date_filters(self):
+        after = datetime(2025, 3, 1, 4)  # Naive datetimes are taken as UTC
+        pages = self.read_all(page_size=3, status="failed", uploaded_after=after)
+        ids = {video["video_id"] for page in pages for video in page}
+        expected = {doc_id for doc_id, data in self.docs.items()
+                    if data["status"] == "failed" and data["uploaded_at"] >= after.replace(tzinfo=timezone.utc)}
+        self.assertEqual(ids, expected)
+
+    def test_parse_fields(self):
+        self.assertEqual(parse_fields("video_id, file_name,status"), ("file_name", "status"))
+        with self.assertRaises(ValueError):
+            parse_fields("password")
+
+    def test_invalid_cursor_and_page_size(self):
+        with self.assertRaises(ValueError):
+            decode_cursor("not-a-cursor")
+        with self.assertRaises(ValueError):
+            list_videos_page(page_size=0)
+
+    def test_cursor_round_trip(self):
+        uploaded_at = datetime(2025, 3, 1, 12, 30, tzinfo=timezone.utc)
+        self.assertEqual(decode_cursor(encode_cursor(uploaded_at, "abc")), (uploaded_at, "abc"))
+
+    def test_streamed_json(self):
+        page = list_videos_page(page_size=5, fields=("file_name",))
+        body = json.loads("".join(stream_video_page(page)))
+        self.assertEqual(len(body["videos"]), 5)
+        self.assertEqual(set(body["videos"][0]), {"video_id", "file_name"})
+        self.assertIsNotNone(body["next_cursor"])
+
+    def test_list_route(self):
+        app = FastAPI()
+        app.include_router(video.router)
+        client = TestClient(app)
+
+        body = client.get("/videos", params={"limit": 5}).json()
+        self.assertEqual(len(body["videos"]), 5)
+        self.assertIsNotNone(body["next_cursor"])
+        empty = client.get("/videos", params={"status": "deleted"}).json()
+        self.assertEqual(empty, {"videos": [], "next_cursor": None})
+
+        # Query errors surface as a status code, not a truncated 200 body
+        with mock.patch.object(FakeQuery, "stream", side_effect=FailedPrecondition("The query requires an index")):
+            response = client.get("/videos", params={"status": "failed"})
+        self.assertEqual(response.status_code, 500)
+        self.assertIn("index", response.json()["detail"])
+        self.assertEqual(client.get("/videos", params={"cursor": "junk"}).status_code, 400)
+
+if __name__ == "__main__":
+    unittest.main()
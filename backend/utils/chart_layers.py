@@ -0,0 +1,241 @@
+"""
+Static layers of the analysis charts, built once per reference dataset.
+
+The MLB histogram, KDE curve, mean line, axes and grid of a chart do not
+depend on the swing being charted. Each chart type and season is rendered
+once into an RGBA background; a request draws only its own markers and
+legend on a transparent figure of the same size and composites the two.
+"""
+import io
+import threading
+import weakref
+import numpy as np
+from matplotlib.axes import Axes
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+from matplotlib.figure import Figure
+from matplotlib.lines import Line2D
+from PIL import Image
+from app.services.referenceData import ReferenceData, HISTOGRAM_BINS
+
+CHART_DPI = 300
+# Resolutions backgrounds are rendered at; other requests are snapped to the
+# nearest, so the background cache holds at most one copy per step
+CHART_DPIS = (72, 100, 150, 300, 600)
+CHART_SIZE = (6, 6)
+KDE_POINTS = 200
+
+# Output format -> content type. SVG charts are vector, so they skip the raster layers
+IMAGE_FORMATS = {"png": "image/png", "webp": "image/webp", "svg": "image/svg+xml"}
+RASTER_FORMATS = ("png", "webp")
+
+# chart type -> (metric, color) for the MLB distribution charts
+DISTRIBUTION_CHARTS = {
+    "exit_velocity": ("ExitVelocity", "blue"),
+    "launch_angle": ("LaunchAngle", "orange"),
+}
+CHART_TYPES = ("barrel_zone",) + tuple(DISTRIBUTION_CHARTS)
+
+# Barrel zone line and the fixed axes it is drawn on, as (launch angle, exit velocity)
+BARREL_ZONE = ([5, 25], [80, 110])
+BARREL_LIMITS = ((-10, 50), (40, 120))
+
+def metric_unit(metric: str) -> str:
+    return "mph" if metric == "ExitVelocity" else "°"
+
+def snap_dpi(dpi: int) -> int:
+    return min(CHART_DPIS, key=lambda step: (abs(step - dpi), step))
+
+def encode_image(image: Image.Image, image_format: str = "png") -> io.BytesIO:
+    """Encodes a rendered chart as PNG or lossless WebP."""
+    if image_format not in RASTER_FORMATS:
+        raise ValueError(f"Unsupported image format: {image_format}")
+    image_stream = io.BytesIO()
+    if image_format == "webp":
+        image.save(image_stream, format="WEBP", lossless=True, method=3)
+    else:
+        image.save(image_stream, format="PNG")
+    image_stream.seek(0)
+    return image_stream
+
+def kde_curve(values: np.ndarray, points: int, scale: float):
+    """
+    Gaussian KDE with Scott's bandwidth over the data range, scaled by
+    scale, matching the curve seaborn's histplot(kde=True) draws.
+    """
+    if len(values) < 2 or values.std() == 0:
+        return np.empty(0), np.empty(0)
+    bandwidth = values.std(ddof=1) * len(values) ** (-1 / 5)
+    grid = np.linspace(values.min(), values.max(), points)
+    density = np.zeros(points)
+    for start in range(0, len(values), 4096):
+        chunk = values[start:start + 4096]
+        density += np.exp(-0.5 * ((grid[:, None] - chunk[None, :]) / bandwidth) ** 2).sum(axis=1)
+    density /= len(values) * bandwidth * np.sqrt(2 * np.pi)
+    return grid, density * scale
+
+class DistributionLayer:
+    """Histogram and KDE curve of one metric, precomputed in counts."""
+    def __init__(self, values: np.ndarray, bins: int = HISTOGRAM_BINS, kde_points: int = KDE_POINTS):
+        values = np.asarray(values, dtype=np.float64)
+        values = values[~np.isnan(values)]
+        if not len(values):
+            raise ValueError("No MLB data to chart")
+
+        self.count = len(values)
+        self.mean = float(values.mean())
+        self.counts, self.edges = np.histogram(values, bins=bins)
+        bin_width = float(np.diff(self.edges).mean())
+        self.kde_x, self.kde_y = kde_curve(values, kde_points, self.count * bin_width)
+
+        margin = 0.05 * (self.edges[-1] - self.edges[0])
+        self.xlim = (float(self.edges[0] - margin), float(self.edges[-1] + margin))
+        # Headroom above the tallest bar keeps the legend clear of the data
+        top = max(self.counts.max(), self.kde_y.max() if len(self.kde_y) else 0)
+        self.ylim = (0.0, float(1.3 * top))
+
+    def draw(self, ax: Axes, color: str) -> None:
+        ax.bar(self.edges[:-1], self.counts, width=np.diff(self.edges), align="edge",
+               color=color, alpha=0.75, edgecolor="white", linewidth=0.5)
+        if len(self.kde_x):
+            ax.plot(self.kde_x, self.kde_y, color=color, linewidth=1.5)
+        ax.set_xlim(self.xlim)
+        ax.set_ylim(self.ylim)
+
+class ChartBackground:
+    """A rendered static layer plus the axes geometry its overlays must reuse."""
+    def __init__(self, image: Image.Image, axes_bounds, xlim, ylim, legend_loc: str, size, dpi: int):
+        self.image = image
+        self.axes_bounds = axes_bounds
+        self.xlim = xlim
+        self.ylim = ylim
+        self.legend_loc = legend_loc
+        self.size = size
+        self.dpi = dpi
+
+    def contains(self, x: float, y: float = None) -> bool:
+        """Whether a marker at (x, y) falls inside the cached axes limits."""
+        inside_x = self.xlim[0] <= x <= self.xlim[1]
+        return inside_x and (y is None or self.ylim[0] <= y <= self.ylim[1])
+
+    def composite(self, draw_overlay, image_format: str = "png") -> io.BytesIO:
+        """
+        Calls draw_overlay(ax) on a transparent figure with the background's
+        axes and limits, alpha-composites it over the background and
+        returns the result encoded as image_format.
+        """
+        fig = Figure(figsize=self.size, dpi=self.dpi, facecolor="none")
+        ax = fig.add_axes(self.axes_bounds)
+        ax.set_xlim(self.xlim)
+        ax.set_ylim(self.ylim)
+        ax.set_axis_off()
+        draw_overlay(ax)
+
+        canvas = FigureCanvasAgg(fig)
+        canvas.draw()
+        overlay = Image.frombuffer("RGBA", canvas.get_width_height(), canvas.buffer_rgba(), "raw", "RGBA", 0, 1)
+        return encode_image(Image.alpha_composite(self.image, overlay).convert("RGB"), image_format)
+
+class ChartLayers:
+    """
+    Precomputed distributions and rendered backgrounds for one reference
+    dataset, keyed by metric or chart type and season (None for every row).
+    Built on first use and shared by all requests.
+    """
+    def __init__(self, reference: ReferenceData):
+        self._reference = weakref.ref(reference)
+        self._distributions = {}
+        self._backgrounds = {}
+        self._lock = threading.Lock()
+        self._build_locks = {}
+
+    def _cached(self, cache: dict, key, build):
+        value = cache.get(key)
+        if value is not None:
+            return value
+        with self._lock:
+            build_lock = self._build_locks.setdefault(key, threading.Lock())
+        with build_lock:
+            value = cache.get(key)
+            if value is None:
+                value = cache[key] = build()
+        return value
+
+    def distribution(self, metric: str, season=None) -> DistributionLayer:
+        def build():
+            frame = self._reference().frame
+            if season is not None:
+                frame = frame[frame["season"] == int(season)]
+                if frame.empty:
+                    raise ValueError(f"No MLB data for season {season}")
+            return DistributionLayer(frame[metric].to_numpy())
+        return self._cached(self._distributions, ("distribution", metric, season), build)
+
+    def draw_static(self, ax: Axes, chart_type: str, season=None) -> str:
+        """Draws the parts of a chart shared by every swing; returns the legend location."""
+        if chart_type == "barrel_zone":
+            ax.set_title("Barrel Zone")
+            ax.set_xlabel("Launch Angle (degrees)")
+            ax.set_ylabel("Exit Velocity (mph)")
+            ax.plot(*BARREL_ZONE, color="blue", linewidth=2)
+            ax.set_xlim(BARREL_LIMITS[0])
+            ax.set_ylim(BARREL_LIMITS[1])
+            ax.grid(True)
+            return "upper left"
+
+        if chart_type not in DISTRIBUTION_CHARTS:
+            raise ValueError("Invalid chart type")
+        metric, color = DISTRIBUTION_CHARTS[chart_type]
+        layer = self.distribution(metric, season)
+        layer.draw(ax, color)
+        ax.axvline(layer.mean, color="red", linestyle="dashed", linewidth=2)
+
+        title = "Exit Velocity Distribution" if metric == "ExitVelocity" else "Launch Angle Distribution"
+        ax.set_title(title)
+        ax.set_xlabel(f"{metric.replace('Velocity', ' Velocity')} ({metric_unit(metric)})")
+        ax.set_ylabel("Frequency")
+        ax.grid(True)
+        # Keep the legend on the side away from the bulk of the distribution
+        return "upper left" if layer.mean > sum(layer.xlim) / 2 else "upper right"
+
+    def legend_handles(self, chart_type: str, season=None) -> list:
+        """Proxy artists for the legend entries of the static layer."""
+        if chart_type == "barrel_zone":
+            return [Line2D([], [], color="blue", linewidth=2, label="Optimal Barrel Zone")]
+        metric, _ = DISTRIBUTION_CHARTS[chart_type]
+        mean = self.distribution(metric, season).mean
+        return [Line2D([], [], color="red", linestyle="dashed", linewidth=2,
+                       label=f"MLB Mean: {mean:.1f}{metric_unit(metric)}")]
+
+    def background(self, chart_type: str, season=None, dpi: int = CHART_DPI) -> ChartBackground:
+        """The rendered static layer of a chart, at the CHART_DPIS step nearest to dpi."""
+        dpi = snap_dpi(dpi)
+
+        def build():
+            fig = Figure(figsize=CHART_SIZE, dpi=dpi)
+            ax = fig.add_subplot()
+            legend_loc = self.draw_static(ax, chart_type, season)
+            fig.tight_layout()
+
+            canvas = FigureCanvasAgg(fig)
+            canvas.draw()
+            image = Image.frombuffer("RGBA", canvas.get_width_height(), canvas.buffer_rgba(), "raw", "RGBA", 0, 1)
+            return ChartBackground(image.copy(), ax.get_position().bounds, ax.get_xlim(), ax.get_ylim(),
+                                   legend_loc, CHART_SIZE, dpi)
+        if chart_type not in CHART_TYPES:
+            raise ValueError("Invalid chart type")
+        return self._cached(self._backgrounds, ("background", chart_type, season, dpi), build)
+
+    def prebuild(self, season=None, dpi: int = CHART_DPI) -> None:
+        for chart_type in CHART_TYPES:
+            self.background(chart_type, season, dpi)
+
+_layers = weakref.WeakKeyDictionary()
+_layers_lock = threading.Lock()
+
+def get_chart_layers(reference: ReferenceData) -> ChartLayers:
+    """The layer cache of a reference dataset; dropped together with it on reload."""
+    with _layers_lock:
+        layers = _layers.get(reference)
+        if layers is None:
+            layers = _layers[reference] = ChartLayers(reference)
+        return layers
@@ -1,36 +1,56 @@
-import matplotlib.pyplot as plt
-import numpy as np
 import pandas as pd
-import seaborn as sns
 import io
 import os
-from pathlib import Path
 import uuid
-from google.cloud import storage
+from concurrent.futures import ThreadPoolExecutor
 from typing import Dict, Tuple, Optional
+from matplotlib.axes import Axes
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+from matplotlib.figure import Figure
+from PIL import Image
+from app.config import storage_client, get_resource
+from app.services.referenceData import ReferenceData, get_reference_data, chart_dataset_paths
+from app.services.percentileTable import ALL_SEASONS
+from app.services.progress_broker import publish_progress
+from utils.chart_layers import (CHART_DPI, CHART_SIZE, CHART_TYPES, DISTRIBUTION_CHARTS, IMAGE_FORMATS,
+                                encode_image, get_chart_layers, metric_unit, snap_dpi)
 
 BUCKET_NAME = "slugsei-baseball-coach-images"
-storage_client = storage.Client()
+
+# Defaults for the uploaded analysis charts; callers may ask for smaller output
+IMAGE_FORMAT = os.getenv("CHART_IMAGE_FORMAT", "png")
+IMAGE_DPI = int(os.getenv("CHART_DPI", str(CHART_DPI)))
+MIN_DPI, MAX_DPI = 50, 600
+
+# Charts are rendered and uploaded on this many threads; Agg drawing, PIL
+# encoding and the uploads all release the GIL for much of their time
+CHART_WORKERS = int(os.getenv("CHART_WORKERS", str(len(CHART_TYPES))))
 
 class MLBDataLoader:
     """Handles loading and preprocessing of MLB data"""
     @staticmethod
     def load_data() -> pd.DataFrame:
-        backend_dir = Path(__file__).parent.parent
-        default_path = backend_dir / "datasets" / "2024-mlb-homeruns.csv"
-        
-        dataset_path = os.getenv("MLB_DATASET_PATH", str(default_path))
-        
+        """Returns the process-wide reference DataFrame; treat it as read-only"""
+        return MLBDataLoader.load_reference().frame
+
+    @staticmethod
+    def load_reference() -> ReferenceData:
+        dataset_paths = chart_dataset_paths()
         try:
-            df = pd.read_csv(dataset_path)
-            return df.dropna(subset=["ExitVelocity", "LaunchAngle"])
+            return get_reference_data(dataset_paths)
         except Exception as e:
-            print(f"Error loading MLB data from {dataset_path}: {str(e)}")
+            print(f"Error loading MLB data from {dataset_paths[0]}: {str(e)}")
             raise ValueError(f"Failed to load MLB dataset: {str(e)}")
 
     @staticmethod
     def get_statistics(df: pd.DataFrame) -> Tuple[float, float, float, float]:
         """Calculate key statistics from the dataset"""
+        reference = MLBDataLoader.load_reference()
+        if df is reference.frame:
+            # Precomputed when the shared dataset was loaded
+            stats = reference.stats
+            return (stats["ExitVelocity"]["mean"], stats["ExitVelocity"]["mode"],
+                    stats["LaunchAngle"]["mean"], stats["LaunchAngle"]["mode"])
         ev_mean = df["ExitVelocity"].mean()
         ev_mode = df["ExitVelocity"].mode()[0]
         la_mean = df["LaunchAngle"].mean()
@@ -38,99 +58,153 @@ class MLBDataLoader:
         return ev_mean, ev_mode, la_mean, la_mode
 
 class ChartGenerator:
-    """Handles generation of various analysis charts"""
-    def __init__(self, launch_angle: float, exit_velocity: float):
+    """
+    Handles generation of various analysis charts. The MLB layers come from
+    the shared ChartLayers cache; only the swing's markers are drawn per call.
+    dpi is snapped to the nearest of CHART_DPIS, the resolutions those layers
+    are kept at.
+    """
+    def __init__(self, launch_angle: float, exit_velocity: float, season: Optional[int] = None,
+                 image_format: str = "png", dpi: int = CHART_DPI):
+        if image_format not in IMAGE_FORMATS:
+            raise ValueError(f"Unsupported image format: {image_format}. Use one of: {', '.join(IMAGE_FORMATS)}")
+        if not MIN_DPI <= dpi <= MAX_DPI:
+            raise ValueError(f"dpi must be between {MIN_DPI} and {MAX_DPI}")
         self.launch_angle = launch_angle
         self.exit_velocity = exit_velocity
-        self.mlb_data = MLBDataLoader.load_data()
+        self.season = season
+        self.image_format = image_format
+        self.dpi = snap_dpi(dpi)
+        self.reference = MLBDataLoader.load_reference()
+        self.mlb_data = self.reference.frame
+        self.layers = get_chart_layers(self.reference)
+
+    def _user_value(self, metric: str) -> float:
+        return self.exit_velocity if metric == "ExitVelocity" else self.launch_angle
+
+    def draw_overlay(self, ax: Axes, chart_type: str, legend_loc: str = "best") -> None:
+        """Draw the swing's markers and the legend on top of a chart's static layer"""
+        handles = self.layers.legend_handles(chart_type, self.season)
+        if chart_type == "barrel_zone":
+            handles.append(ax.scatter([self.launch_angle], [self.exit_velocity], color="red", s=100,
+                                      label="Your Swing"))
+        else:
+            metric, _ = DISTRIBUTION_CHARTS[chart_type]
+            user_val = self._user_value(metric)
+            percentile = self.reference.percentiles.percentile(metric, user_val, self.season or ALL_SEASONS)
+            rank_label = f" (percentile {percentile:.0f})" if percentile is not None else ""
+            handles.append(ax.axvline(user_val, color="green", linestyle="solid", linewidth=2,
+                                      label=f"Your {'EV' if metric == 'ExitVelocity' else 'LA'}: "
+                                            f"{user_val:.1f}{metric_unit(metric)}{rank_label}"))
+        ax.legend(handles=handles, loc=legend_loc)
+
+    def draw_chart(self, ax: Axes, chart_type: str) -> None:
+        """Draw a complete chart on ax, widening the cached limits to fit the swing"""
+        self.layers.draw_static(ax, chart_type, self.season)
+        if chart_type == "barrel_zone":
+            ax.set_xlim(_widen(ax.get_xlim(), self.launch_angle))
+            ax.set_ylim(_widen(ax.get_ylim(), self.exit_velocity))
+        else:
+            ax.set_xlim(_widen(ax.get_xlim(), self._user_value(DISTRIBUTION_CHARTS[chart_type][0])))
+        self.draw_overlay(ax, chart_type)
 
-    def create_barrel_zone(self, ax: plt.Axes) -> None:
+    def create_barrel_zone(self, ax: Axes) -> None:
         """Create barrel zone visualization"""
-        ax.set_title("Barrel Zone")
-        ax.set_xlabel("Launch Angle (degrees)")
-        ax.set_ylabel("Exit Velocity (mph)")
-        ax.plot([5, 25], [80, 110], label="Optimal Barrel Zone", color="blue", linewidth=2)
-        ax.scatter([self.launch_angle], [self.exit_velocity], color="red", s=100, label="Your Swing")
-        ax.legend()
-
-    def create_distribution_plot(self, ax: plt.Axes, metric: str, color: str) -> None:
+        self.draw_chart(ax, "barrel_zone")
+
+    def create_distribution_plot(self, ax: Axes, metric: str, color: str = None) -> None:
         """Create distribution plot for either exit velocity or launch angle"""
-        data = self.mlb_data[metric]
-        mean_val = data.mean()
-        user_val = self.exit_velocity if metric == "ExitVelocity" else self.launch_angle
-        unit = "mph" if metric == "ExitVelocity" else "°"
-
-        sns.histplot(data, bins=30, kde=True, ax=ax, color=color)
-        ax.axvline(mean_val, color="red", linestyle="dashed", linewidth=2, 
-                   label=f"MLB Mean: {mean_val:.1f}{unit}")
-        ax.axvline(user_val, color="green", linestyle="solid", linewidth=2,
-                   label=f"Your {'EV' if metric == 'ExitVelocity' else 'LA'}: {user_val:.1f}{unit}")
-        
-        title = "Exit Velocity Distribution" if metric == "ExitVelocity" else "Launch Angle Distribution"
-        ax.set_title(title)
-        ax.set_xlabel(f"{metric.replace('Velocity', ' Velocity')} ({unit})")
-        ax.set_ylabel("Frequency")
-        ax.legend()
+        self.draw_chart(ax, "exit_velocity" if metric == "ExitVelocity" else "launch_angle")
 
     def generate_single_chart(self, chart_type: str) -> io.BytesIO:
-        """Generate a single chart based on the specified type"""
-        fig, ax = plt.subplots(figsize=(6, 6))
-        
-        if chart_type == "barrel_zone":
-            self.create_barrel_zone(ax)
-        elif chart_type == "exit_velocity":
-            self.create_distribution_plot(ax, "ExitVelocity", "blue")
-        elif chart_type == "launch_angle":
-            self.create_distribution_plot(ax, "LaunchAngle", "orange")
-        else:
+        """Generate a single chart based on the specified type, encoded as self.image_format"""
+        if chart_type not in CHART_TYPES:
             raise ValueError("Invalid chart type")
-
-        plt.grid(True)
-        image_stream = io.BytesIO()
-        plt.savefig(image_stream, format="png", dpi=300, bbox_inches="tight")
-        image_stream.seek(0)
-        plt.close()
-        return image_stream
+        if self.image_format != "svg":
+            background = self.layers.background(chart_type, self.season, self.dpi)
+            if chart_type == "barrel_zone":
+                fits = background.contains(self.launch_angle, self.exit_velocity)
+            else:
+                fits = background.contains(self._user_value(DISTRIBUTION_CHARTS[chart_type][0]))
+            if fits:
+                return background.composite(lambda ax: self.draw_overlay(ax, chart_type, background.legend_loc),
+                                            self.image_format)
+
+        # SVG, or the swing is off the cached axes: render the whole chart
+        fig = Figure(figsize=CHART_SIZE, dpi=self.dpi)
+        self.draw_chart(fig.add_subplot(), chart_type)
+        fig.tight_layout()
+        return _save_figure(fig, self.image_format)
 
     def create_analysis_plots(self) -> io.BytesIO:
         """Create combined analysis plots"""
-        sns.set_style("whitegrid")
-        fig, axes = plt.subplots(1, 2, figsize=(14, 5))
-        
-        self.create_distribution_plot(axes[0], "ExitVelocity", "blue")
-        self.create_distribution_plot(axes[1], "LaunchAngle", "orange")
-
-        plt.tight_layout()
+        fig = Figure(figsize=(14, 5), dpi=self.dpi)
+        axes = fig.subplots(1, 2)
+        self.draw_chart(axes[0], "exit_velocity")
+        self.draw_chart(axes[1], "launch_angle")
+        fig.tight_layout()
+        return _save_figure(fig, self.image_format)
+
+def _widen(limits: Tuple[float, float], value: float) -> Tuple[float, float]:
+    low, high = limits
+    if low <= value <= high:
+        return limits
+    margin = 0.05 * (max(high, value) - min(low, value))
+    return min(low, value - margin), max(high, value + margin)
+
+def _save_figure(fig: Figure, image_format: str) -> io.BytesIO:
+    if image_format == "svg":
         image_stream = io.BytesIO()
-        plt.savefig(image_stream, format="png", dpi=300, bbox_inches="tight")
+        fig.savefig(image_stream, format="svg")
         image_stream.seek(0)
-        plt.close()
         return image_stream
+    canvas = FigureCanvasAgg(fig)
+    canvas.draw()
+    image = Image.frombuffer("RGBA", canvas.get_width_height(), canvas.buffer_rgba(), "raw", "RGBA", 0, 1)
+    return encode_image(image.convert("RGB"), image_format)
+
+def get_images_bucket():
+    """The charts bucket on the shared storage client, whose HTTP session pools connections"""
+    return get_resource("images_bucket", lambda: storage_client.bucket(BUCKET_NAME))
+
+def get_chart_pool() -> ThreadPoolExecutor:
+    return get_resource("chart_pool", lambda: ThreadPoolExecutor(max_workers=CHART_WORKERS,
+                                                                 thread_name_prefix="charts"))
 
 class GCSUploader:
     """Handles uploading images to Google Cloud Storage"""
     @staticmethod
-    def upload_image(image_stream: io.BytesIO, chart_type: str, video_id: str) -> str:
-        bucket = storage_client.bucket(BUCKET_NAME)
-        blob_name = f"analysis_images/{video_id}/{chart_type}_{uuid.uuid4().hex}.png"
-        blob = bucket.blob(blob_name)
-        blob.upload_from_file(image_stream, content_type="image/png")
+    def upload_image(image_stream: io.BytesIO, chart_type: str, video_id: str, image_format: str = "png") -> str:
+        blob_name = f"analysis_images/{video_id}/{chart_type}_{uuid.uuid4().hex}.{image_format}"
+        blob = get_images_bucket().blob(blob_name)
+        blob.upload_from_file(image_stream, content_type=IMAGE_FORMATS[image_format])
         return f"https://storage.googleapis.com/{BUCKET_NAME}/{blob_name}"
 
-def generate_and_upload_images(video_id: str, launch_angle: float, exit_velocity: float) -> Dict[str, str]:
-    """Main function to generate and upload all analysis images"""
+def _render_and_upload(generator: ChartGenerator, uploader: GCSUploader, chart_type: str, video_id: str) -> str:
+    stream = generator.generate_single_chart(chart_type)
+    return uploader.upload_image(stream, chart_type, video_id, generator.image_format)
+
+def generate_and_upload_images(video_id: str, launch_angle: float, exit_velocity: float,
+                               image_format: str = IMAGE_FORMAT, dpi: int = IMAGE_DPI) -> Dict[str, str]:
+    """
+    Main function to generate and upload all analysis images. Each chart is
+    rendered and uploaded as its own task on the chart pool, so the total
+    time is close to that of the slowest chart.
+    """
     try:
-        chart_generator = ChartGenerator(launch_angle, exit_velocity)
+        chart_generator = ChartGenerator(launch_angle, exit_velocity, image_format=image_format, dpi=dpi)
         uploader = GCSUploader()
-        images = {}
-
-        for chart_type in ["barrel_zone", "exit_velocity", "launch_angle"]:
-            stream = chart_generator.generate_single_chart(chart_type)
-            images[chart_type] = uploader.upload_image(stream, chart_type, video_id)
+        pool = get_chart_pool()
+        futures = {
+            chart_type: pool.submit(_render_and_upload, chart_generator, uploader, chart_type, video_id)
+            for chart_type in CHART_TYPES
+        }
 
         # analysis_stream = chart_generator.create_analysis_plots()
         # images["performance_analysis"] = uploader.upload_image(analysis_stream, "performance_analysis", video_id)
 
+        images = {chart_type: future.result() for chart_type, future in futures.items()}
+        publish_progress(video_id, "charts_uploaded", images=images)
         return images
 
     except Exception as e: